@@ -2,23 +2,31 @@
 #   backend
 #   *******
 from __future__ import print_function
+import cgi
 import sys
 import traceback
+from io import BytesIO
 
 from twisted.application import service
 from twisted.internet import reactor, defer
 from twisted.python.log import ILogObserver
 from twisted.web import server
+from twisted.web.http import parse_qs
 
 from globaleaks.db import create_db, init_db, update_db, \
     sync_refresh_memory_variables, sync_clean_untracked_files, sync_initialize_snimap
+from globaleaks.handlers.l10n import L10NCache
+from globaleaks.handlers.staticfile import get_asset_table
+from globaleaks.rest import errors
 from globaleaks.rest.api import APIResourceWrapper
 from globaleaks.settings import Settings
 from globaleaks.state import State
 from globaleaks.utils.log import log, openLogFile, logFormatter, logFormatter, LogObserver
 from globaleaks.utils.process import disable_swap
+from globaleaks.utils.securetempfile import SecureTemporaryFile
 from globaleaks.utils.sock import listen_tcp_on_sock, listen_tls_on_sock, reserve_port_for_ip
 from globaleaks.utils.tls import TLSServerContextFactory
+from globaleaks.utils.upload import MultipartParser
 from globaleaks.utils.utility import fix_file_permissions, drop_privileges
 
 
@@ -30,9 +38,100 @@ def fail_startup(excep):
         reactor.stop()
 
 
+def get_upload_size_limit():
+    """
+    Return the maximum size in bytes of the uploads accepted by any tenant
+
+    The tenant of a request is known only after the whole body has been
+    received; the limit of each tenant is then enforced by the handlers.
+    """
+    return max([tenant.get('maximum_filesize', 0) for tenant in State.tenant_cache.values()] + [0]) * 1024 * 1024
+
+
 class Request(server.Request):
     current_user = None
     log_ip_and_ua = False
+    upload = None
+    upload_error = None
+
+    def gotLength(self, length):
+        """
+        Parse the multipart/form-data bodies of the uploads while they are
+        received so that the uploaded files are written to disk without
+        being buffered
+        """
+        ctype = self.requestHeaders.getRawHeaders(b'content-type')
+        if ctype is not None and self.is_upload():
+            key, pdict = cgi.parse_header(ctype[0].decode('iso-8859-1'))
+            if key == 'multipart/form-data' and pdict.get('boundary'):
+                self.content = BytesIO()
+                self.upload = MultipartParser(pdict['boundary'].encode('iso-8859-1'),
+                                              get_upload_size_limit(),
+                                              self.open_upload_file)
+                return
+
+        server.Request.gotLength(self, length)
+
+    def is_upload(self):
+        """
+        Return True if the request is a POST to a handler accepting uploads
+        """
+        # The method and the path are set on the request only by
+        # requestReceived, once the whole body has been received; until
+        # then they are kept on the channel by Twisted (16.0 to 17.9, the
+        # versions in requirements). If they are not found the body is
+        # buffered and parsed by Twisted as usual.
+        command = getattr(self.channel, '_command', None)
+        path = getattr(self.channel, '_path', None)
+
+        return command == b'POST' and path is not None and self.site.resource.is_upload_path(path)
+
+    def open_upload_file(self, args):
+        """
+        Return the file where to write the chunk of a flow.js upload
+
+        Every chunk is written to a file of the request and is merged in the
+        file of the flow by the handler only once the request is accepted.
+        """
+        return SecureTemporaryFile(Settings.tmp_path)
+
+    def handleContentChunk(self, data):
+        if self.upload is None:
+            return server.Request.handleContentChunk(self, data)
+
+        if self.upload_error is None:
+            try:
+                self.upload.feed(data)
+            except errors.GLException as e:
+                self.upload_error = e
+
+    def requestReceived(self, command, path, version):
+        if self.upload is None:
+            return server.Request.requestReceived(self, command, path, version)
+
+        if self.upload_error is None:
+            try:
+                self.upload.finish()
+            except errors.GLException as e:
+                self.upload_error = e
+
+        self.method, self.uri = command, path
+        self.clientproto = version
+
+        self.path, _, argstring = self.uri.partition(b'?')
+        self.args = parse_qs(argstring, 1)
+        self.args.update(self.upload.args)
+
+        self.client = self.channel.getPeer()
+        self.host = self.channel.getHost()
+
+        self.process()
+
+    def connectionLost(self, reason):
+        if self.upload is not None:
+            self.upload.abort()
+
+        server.Request.connectionLost(self, reason)
 
 
 class Site(server.Site):
@@ -104,6 +203,10 @@ class Service(service.Service):
 
             self._shutdown = True
             self.state.orm_tp.stop()
+            self.state.orm_write_tp.stop()
+            self.state.delivery_tp.stop()
+            self.state.kdf_tp.stop()
+            self.state.export_tp.stop()
             d.callback(None)
 
         reactor.callLater(30, _shutdown, None)
@@ -153,7 +256,17 @@ class Service(service.Service):
         sync_refresh_memory_variables()
         sync_initialize_snimap()
 
+        get_asset_table(Settings.client_path)
+        L10NCache.load()
+
         self.state.orm_tp.start()
+        self.state.orm_write_tp.start()
+        self.state.delivery_tp.adjustPoolsize(maxthreads=self.state.settings.delivery_workers)
+        self.state.delivery_tp.start()
+        self.state.kdf_tp.adjustPoolsize(maxthreads=self.state.settings.kdf_workers)
+        self.state.kdf_tp.start()
+        self.state.export_tp.adjustPoolsize(maxthreads=self.state.settings.export_workers)
+        self.state.export_tp.start()
 
         reactor.addSystemEventTrigger('before', 'shutdown', self.shutdown)
 
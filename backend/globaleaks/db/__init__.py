@@ -13,7 +13,7 @@ from globaleaks.db.appdata import db_load_default_questionnaires, db_load_defaul
 from globaleaks.models import Config
 from globaleaks.models.config import ConfigFactory
 from globaleaks.models.config_desc import ConfigFilters
-from globaleaks.orm import transact, transact_sync, get_session, make_db_uri
+from globaleaks.orm import get_session, make_db_uri, transact_ro, transact_sync
 from globaleaks.sessions import Session
 from globaleaks.settings import Settings
 from globaleaks.state import State, TenantState
@@ -75,11 +75,14 @@ def create_db():
 
 @transact_sync
 def init_db(session):
+    from globaleaks.db.migration import get_data_fingerprint
     from globaleaks.handlers.admin import tenant
     tenant.db_create(session, {'mode': 'default', 'label': 'root'})
     db_load_default_questionnaires(session)
     db_load_default_fields(session)
 
+    ConfigFactory(session, 1).set_val(u'data_fingerprint', get_data_fingerprint())
+
 
 def update_db():
     """
@@ -202,6 +205,13 @@ def db_refresh_tenant_cache(session, tid_list):
     for redirect in session.query(models.Redirect).filter(models.Redirect.tid.in_(tid_list)):
         State.tenant_cache[tid]['redirects'][redirect.path1] = redirect.path2
 
+    for tid in tid_list:
+        State.tenant_cache[tid]['receipt_hash_algorithms'] = set()
+
+    for tid, hash_alg in session.query(models.WhistleblowerTip.tid, models.WhistleblowerTip.hash_alg) \
+                                .filter(models.WhistleblowerTip.tid.in_(tid_list)).distinct():
+        State.tenant_cache[tid]['receipt_hash_algorithms'].add(hash_alg)
+
 
 def db_refresh_memory_variables(session, to_refresh=None):
     tenant_map = {tenant.id: tenant for tenant in session.query(models.Tenant).filter(models.Tenant.active == True)}
@@ -278,7 +288,7 @@ def db_refresh_memory_variables(session, to_refresh=None):
         State.tenant_hostname_id_map.update({h: tid for h in hostnames + onionnames})
 
 
-@transact
+@transact_ro
 def refresh_memory_variables(session, to_refresh=None):
     return db_refresh_memory_variables(session, to_refresh)
 
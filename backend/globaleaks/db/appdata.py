@@ -1,7 +1,11 @@
 # -*- coding: utf-8
 # datainit.py: database initialization
 #   ******************
+import hashlib
+import json
 import os
+import threading
+
 from sqlalchemy import not_
 
 from globaleaks import models
@@ -11,8 +15,104 @@ from globaleaks.settings import Settings
 from globaleaks.utils.utility import read_json_file
 
 
+class AppData(object):
+    """
+    Content of the appdata file of the client
+
+    The content is shared by the whole process and must not be modified;
+    the texts of a group in a language are sliced on first use and kept
+    for the following uses.
+    """
+    def __init__(self, data, digest=None):
+        self.data = data
+        self.digest = digest
+        self.slices = {}
+        self.lock = threading.Lock()
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get_texts(self, group, lang):
+        """
+        Return the texts of a group in a language
+
+        :param group: the group of texts, like node or templates
+        :param lang: the language code
+        :return: a dictionary of the texts by variable name
+        """
+        key = (group, lang)
+
+        with self.lock:
+            texts = self.slices.get(key)
+            if texts is None:
+                texts = self.slices[key] = {k: v[lang] for k, v in self.data[group].items()}
+
+            return texts
+
+
+class AppDataCache(object):
+    """
+    Cache of the parsed appdata files
+
+    A file is parsed again only if its content changes, that is checked
+    via its modification time and size and then via its hash.
+    """
+    entries = {}
+
+    # The cache is accessed by the threads of the ORM pool and the lock
+    # ensures that a file is parsed only once
+    lock = threading.Lock()
+
+    stats = {
+        'hits': 0,
+        'loads': 0
+    }
+
+    @classmethod
+    def get(cls, path):
+        st = os.stat(path)
+        version = (st.st_mtime, st.st_size)
+
+        with cls.lock:
+            entry = cls.entries.get(path)
+            if entry is not None and entry[0] == version:
+                cls.stats['hits'] += 1
+                return entry[2]
+
+            with open(path, 'rb') as f:
+                data = f.read()
+
+            digest = hashlib.sha256(data).digest()
+
+            if entry is not None and entry[1] == digest:
+                cls.stats['hits'] += 1
+                appdata = entry[2]
+            else:
+                cls.stats['loads'] += 1
+                appdata = AppData(json.loads(data.decode('utf-8')), digest)
+
+            cls.entries[path] = (version, digest, appdata)
+
+            return appdata
+
+    @classmethod
+    def invalidate(cls):
+        with cls.lock:
+            cls.entries.clear()
+
+    @classmethod
+    def get_stats(cls):
+        with cls.lock:
+            ret = dict(cls.stats)
+            ret['entries'] = len(cls.entries)
+            return ret
+
+
 def load_appdata():
-    return read_json_file(Settings.appdata_file)
+    return AppDataCache.get(Settings.appdata_file)
 
 
 def db_load_default_questionnaires(session):
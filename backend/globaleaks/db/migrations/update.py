@@ -69,7 +69,7 @@ class MigrationBase(object):
         if var_name in template_list:
             # check needed to preserve funtionality if templates will be altered in the future
             if var_name in templates_dict:
-                template_text = templates_dict[var_name]
+                template_text = dict(templates_dict[var_name])
             else:
                 template_text = every_language_dict()
 
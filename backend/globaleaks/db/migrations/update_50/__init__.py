@@ -0,0 +1,87 @@
+# -*- coding: UTF-8
+from globaleaks.db.migrations.update import MigrationBase
+
+from globaleaks.models import Model
+from globaleaks.models.properties import *
+from globaleaks.utils.utility import datetime_now, datetime_null
+
+
+class Comment_v_49(Model):
+    __tablename__ = 'comment'
+    id = Column(UnicodeText(36), primary_key=True, default=uuid4, nullable=False)
+    creation_date = Column(DateTime, default=datetime_now, nullable=False)
+    internaltip_id = Column(UnicodeText(36), nullable=False)
+    author_id = Column(UnicodeText(36))
+    content = Column(UnicodeText, nullable=False)
+    type = Column(UnicodeText, nullable=False)
+    new = Column(Boolean, default=True, nullable=False)
+
+
+class InternalFile_v_49(Model):
+    __tablename__ = 'internalfile'
+    id = Column(UnicodeText(36), primary_key=True, default=uuid4)
+    creation_date = Column(DateTime, default=datetime_now, nullable=False)
+    internaltip_id = Column(UnicodeText(36), nullable=False)
+    name = Column(UnicodeText, nullable=False)
+    filename = Column(UnicodeText(255), unique=True, nullable=False)
+    content_type = Column(UnicodeText, nullable=False)
+    size = Column(Integer, nullable=False)
+    new = Column(Boolean, default=True, nullable=False)
+    submission = Column(Integer, default=False, nullable=False)
+
+
+class Message_v_49(Model):
+    __tablename__ = 'message'
+    id = Column(UnicodeText(36), primary_key=True, default=uuid4)
+    creation_date = Column(DateTime, default=datetime_now, nullable=False)
+    receivertip_id = Column(UnicodeText(36), nullable=False)
+    content = Column(UnicodeText, nullable=False)
+    type = Column(UnicodeText, nullable=False)
+    new = Column(Boolean, default=True, nullable=False)
+
+
+class ReceiverFile_v_49(Model):
+    __tablename__ = 'receiverfile'
+    id = Column(UnicodeText(36), primary_key=True, default=uuid4)
+    internalfile_id = Column(UnicodeText(36), nullable=False)
+    receivertip_id = Column(UnicodeText(36), nullable=False)
+    filename = Column(UnicodeText(255), nullable=False)
+    downloads = Column(Integer, default=0, nullable=False)
+    last_access = Column(DateTime, default=datetime_null, nullable=False)
+    new = Column(Boolean, default=True, nullable=False)
+    status = Column(UnicodeText, default=u'processing', nullable=False)
+
+
+class ReceiverTip_v_49(Model):
+    __tablename__ = 'receivertip'
+    id = Column(UnicodeText(36), primary_key=True, default=uuid4)
+    internaltip_id = Column(UnicodeText(36), nullable=False)
+    receiver_id = Column(UnicodeText(36), nullable=False)
+    last_access = Column(DateTime, default=datetime_null, nullable=False)
+    access_counter = Column(Integer, default=0, nullable=False)
+    label = Column(UnicodeText, default=u'', nullable=False)
+    can_access_whistleblower_identity = Column(Boolean, default=False, nullable=False)
+    new = Column(Boolean, default=True, nullable=False)
+    enable_notifications = Column(Boolean, default=True, nullable=False)
+    crypto_tip_prv_key = Column(LargeBinary(72), default=b'', nullable=False)
+
+    binary_keys = ['crypto_tip_prv_key']
+
+
+class WhistleblowerFile_v_49(Model):
+    __tablename__ = 'whistleblowerfile'
+    id = Column(UnicodeText(36), primary_key=True, default=uuid4)
+    receivertip_id = Column(UnicodeText(36), nullable=False)
+    name = Column(UnicodeText, nullable=False)
+    filename = Column(UnicodeText(255), unique=True, nullable=False)
+    size = Column(Integer, nullable=False)
+    content_type = Column(UnicodeText, nullable=False)
+    downloads = Column(Integer, default=0, nullable=False)
+    creation_date = Column(DateTime, default=datetime_now, nullable=False)
+    last_access = Column(DateTime, default=datetime_null, nullable=False)
+    description = Column(UnicodeText, nullable=False)
+    new = Column(Boolean, default=True, nullable=False)
+
+
+class MigrationScript(MigrationBase):
+    pass
@@ -12,7 +12,7 @@ from globaleaks.handlers.admin.modelimgs import db_get_model_img
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.operation import OperationHandler
 from globaleaks.models import fill_localized_keys, get_localized_values
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests, errors
 
 
@@ -63,7 +63,7 @@ def admin_serialize_context(session, context, language):
     return get_localized_values(ret_dict, context, context.localized_keys, language)
 
 
-@transact
+@transact_ro
 def get_context_list(session, tid, language):
     """
     Returns the context list.
@@ -94,7 +94,7 @@ def db_associate_context_receivers(session, tid, context, receiver_ids):
                                             'receiver_id': receiver_id,
                                             'presentation_order': i}))
 
-@transact
+@transact_ro
 def get_context(session, tid, context_id, language):
     """
     Returns:
@@ -206,6 +206,7 @@ class ContextsCollection(OperationHandler):
     check_roles = 'admin'
     cache_resource = True
     invalidate_cache = True
+    propagate_cache_invalidation = False
 
     def get(self):
         """
@@ -231,6 +232,7 @@ class ContextsCollection(OperationHandler):
 class ContextInstance(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    propagate_cache_invalidation = False
 
     def put(self, context_id):
         """
@@ -8,9 +8,10 @@ from sqlalchemy.sql.expression import not_
 
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.handlers.public import get_trigger_model_by_type, serialize_field
+from globaleaks.handlers.public import db_prepare_fields_serialization, get_trigger_model_by_type, serialize_field
+from globaleaks.handlers.submission import QuestionnaireSchemaCache
 from globaleaks.models import fill_localized_keys
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import errors, requests
 from globaleaks.settings import Settings
 from globaleaks.utils.utility import read_json_file
@@ -118,6 +119,8 @@ def db_create_field(session, tid, field_dict, language):
 
     check_field_association(session, tid, field_dict)
 
+    QuestionnaireSchemaCache.invalidate()
+
     if field_dict.get('template_id', '') != '':
         if field_dict['template_id'] == 'whistleblower_identity':
             if field_dict.get('step_id', '') == '':
@@ -186,6 +189,8 @@ def db_update_field(session, tid, field_id, field_dict, language):
 
     check_field_association(session, tid, field_dict)
 
+    QuestionnaireSchemaCache.invalidate()
+
     fill_localized_keys(field_dict, models.Field.localized_keys, language)
 
     db_update_fieldattrs(session, field.id, field_dict['attrs'], language)
@@ -241,6 +246,8 @@ def delete_field(session, tid, field_id):
     if field.instance == 'template' and session.query(models.Field).filter(models.Field.tid == tid, models.Field.template_id == field.id).count():
         raise errors.InputValidationError("Cannot remove the field template as it is used by one or more questionnaires")
 
+    QuestionnaireSchemaCache.invalidate()
+
     session.delete(field)
 
 
@@ -254,16 +261,18 @@ def fieldtree_ancestors(session, id):
         yield fieldtree_ancestors(session, field.fieldgroup_id)
 
 
-@transact
+@transact_ro
 def get_fieldtemplate_list(session, tid, language):
     """
     Serialize all the field templates localizing their content depending on the language.
     """
     templates = session.query(models.Field).filter(models.Field.tid.in_(set([1, tid])),
                                                    models.Field.instance == u'template',
-                                                   models.Field.fieldgroup_id == None)
+                                                   models.Field.fieldgroup_id == None).all()
+
+    data = db_prepare_fields_serialization(session, templates)
 
-    return [serialize_field(session, tid, f, language) for f in templates]
+    return [serialize_field(session, tid, f, language, data) for f in templates]
 
 
 class FieldTemplatesCollection(BaseHandler):
@@ -12,13 +12,13 @@ from twisted.internet.defer import inlineCallbacks, returnValue
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.user import can_edit_general_settings_or_raise
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import errors
 from globaleaks.utils.fs import directory_traversal_check
 from globaleaks.utils.utility import uuid4
 
 
-@transact
+@transact_ro
 def get_files(session, tid):
     ret = []
 
@@ -60,7 +60,7 @@ def db_get_file(session, tid, id):
     return file_obj.data if file_obj is not None else ''
 
 
-@transact
+@transact_ro
 def get_file(session, tid, id):
     return db_get_file(session, tid, id)
 
@@ -15,11 +15,12 @@ from twisted.internet.defer import inlineCallbacks, returnValue
 
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
+from globaleaks.handlers.l10n import L10NCache
 from globaleaks.handlers.user import can_edit_general_settings_or_raise
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 
 
-@transact
+@transact_ro
 def get(session, tid, lang):
     texts = session.query(models.CustomTexts).filter(models.CustomTexts.tid == tid, models.CustomTexts.lang == lang).one_or_none()
     if texts is None:
@@ -40,7 +41,6 @@ def update(session, tid, lang, request):
 
 class AdminL10NHandler(BaseHandler):
     check_roles =  {'admin', 'receiver', 'custodian'}
-    invalidate_cache = True
 
     @inlineCallbacks
     def get(self, lang):
@@ -56,10 +56,12 @@ class AdminL10NHandler(BaseHandler):
             content = content.decode('utf-8')
 
         result = yield update(self.request.tid, lang, json.loads(content))
+        L10NCache.invalidate(self.request.tid, lang)
         returnValue(result)
 
     @inlineCallbacks
     def delete(self, lang):
         yield can_edit_general_settings_or_raise(self)
         result = yield models.delete(models.CustomTexts, models.CustomTexts.tid == self.request.tid, models.CustomTexts.lang == lang)
+        L10NCache.invalidate(self.request.tid, lang)
         returnValue(result)
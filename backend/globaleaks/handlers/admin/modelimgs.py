@@ -4,7 +4,7 @@ import base64
 
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 
 model_map = {
   'users': models.UserImg,
@@ -21,7 +21,7 @@ def db_get_model_img(session, obj_key, obj_id):
     return img.data
 
 
-@transact
+@transact_ro
 def get_model_img(session, obj_key, obj_id):
     return db_get_model_img(session, obj_key, obj_id)
 
@@ -57,14 +57,12 @@ def db_update_enabled_languages(session, tid, languages_enabled, default_languag
     if default_language not in new_enabled_langs:
         raise errors.InputValidationError("Invalid lang code for chosen default_language")
 
-    appdata = None
+    appdata = load_appdata()
     for lang_code in new_enabled_langs:
         if lang_code not in LANGUAGES_SUPPORTED_CODES:
             raise errors.InputValidationError("Invalid lang code: %s" % lang_code)
 
         if lang_code not in cur_enabled_langs:
-            if appdata is None:
-                appdata = load_appdata()
             log.debug("Adding a new lang %s" % lang_code)
             models.config.add_new_lang(session, tid, lang_code, appdata)
 
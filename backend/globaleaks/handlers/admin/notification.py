@@ -11,7 +11,7 @@ from globaleaks.orm import transact, tw
 from globaleaks.rest import requests
 from globaleaks.state import State
 from globaleaks.utils.sets import merge_dicts
-from globaleaks.utils.templating import Templating
+from globaleaks.utils.templating import Templating, TemplateCache
 
 
 def admin_serialize_notification(session, tid, language):
@@ -48,6 +48,8 @@ def update_notification(session, tid, request, language):
 
     db_refresh_memory_variables(session, [tid])
 
+    TemplateCache.invalidate()
+
     return admin_serialize_notification(session, tid, language)
 
 
@@ -14,20 +14,23 @@ from twisted.internet.defer import inlineCallbacks, returnValue
 from globaleaks import models, QUESTIONNAIRE_EXPORT_VERSION
 from globaleaks.handlers.admin.step import db_create_step
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.handlers.public import serialize_questionnaire
+from globaleaks.handlers.public import db_prepare_questionnaires_serialization, serialize_questionnaire
+from globaleaks.handlers.submission import QuestionnaireSchemaCache
 from globaleaks.models import fill_localized_keys
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests
 from globaleaks.utils.utility import datetime_to_ISO8601, datetime_now
 
 
 def db_get_questionnaire_list(session, tid, language):
-    questionnaires = session.query(models.Questionnaire).filter(models.Questionnaire.tid.in_(set([1, tid])))
+    questionnaires = session.query(models.Questionnaire).filter(models.Questionnaire.tid.in_(set([1, tid]))).all()
 
-    return [serialize_questionnaire(session, tid, questionnaire, language) for questionnaire in questionnaires]
+    data = db_prepare_questionnaires_serialization(session, questionnaires)
 
+    return [serialize_questionnaire(session, tid, questionnaire, language, data) for questionnaire in questionnaires]
 
-@transact
+
+@transact_ro
 def get_questionnaire_list(session, tid, language):
     """
     Returns the questionnaire list.
@@ -49,7 +52,7 @@ def db_get_questionnaire(session, tid, questionnaire_id, language, serialize_tem
     return serialize_questionnaire(session, tid, questionnaire, language, serialize_templates=serialize_templates)
 
 
-@transact
+@transact_ro
 def get_questionnaire(session, tid, questionnaire_id, language, serialize_templates=True):
     return db_get_questionnaire(session, tid, questionnaire_id, language, serialize_templates=serialize_templates)
 
@@ -59,6 +62,8 @@ def db_update_questionnaire(session, questionnaire, request, language):
 
     questionnaire.update(request)
 
+    QuestionnaireSchemaCache.invalidate()
+
     return questionnaire
 
 
@@ -68,6 +73,8 @@ def db_create_questionnaire(session, tid, questionnaire_dict, language):
     questionnaire_dict['tid'] = tid
     q = models.db_forge_obj(session, models.Questionnaire, questionnaire_dict)
 
+    QuestionnaireSchemaCache.invalidate()
+
     for step in questionnaire_dict.get('steps', []):
         step['questionnaire_id'] = q.id
         db_create_step(session, tid, step, language)
@@ -234,7 +241,12 @@ class QuestionnaireInstance(BaseHandler):
         """
         Delete the specified questionnaire.
         """
-        return models.delete(models.Questionnaire, models.Questionnaire.tid == self.request.tid, models.Questionnaire.id == questionnaire_id)
+        d = models.delete(models.Questionnaire, models.Questionnaire.tid == self.request.tid, models.Questionnaire.id == questionnaire_id)
+
+        # The schemas are invalidated only once the deletion is committed
+        d.addCallback(lambda _: QuestionnaireSchemaCache.invalidate())
+
+        return d
 
     @inlineCallbacks
     def get(self, questionnaire_id):
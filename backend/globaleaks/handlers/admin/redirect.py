@@ -6,7 +6,7 @@
 #
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests
 
 
@@ -18,7 +18,7 @@ def serialize_redirect(redirect):
     }
 
 
-@transact
+@transact_ro
 def get_redirect_list(session, tid):
     return [serialize_redirect(redirect) for redirect in session.query(models.Redirect).filter(models.Redirect.tid == tid)]
 
@@ -34,6 +34,7 @@ class RedirectCollection(BaseHandler):
     check_roles = 'admin'
     cache_resource = True
     invalidate_cache = True
+    propagate_cache_invalidation = False
 
     def get(self):
         """
@@ -53,6 +54,7 @@ class RedirectCollection(BaseHandler):
 class RedirectInstance(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    propagate_cache_invalidation = False
 
     def delete(self, redirect_id):
         """
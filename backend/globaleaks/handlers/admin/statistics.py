@@ -4,10 +4,15 @@ import operator
 from datetime import timedelta
 
 from globaleaks.event import events_monitored
+from globaleaks.handlers import export
 from globaleaks.handlers.base import BaseHandler
+from globaleaks.handlers.submission import ArchivedSchemaCache, QuestionnaireSchemaCache
+from globaleaks.jobs import delivery, notification
 from globaleaks.models import Stats, Anomalies
-from globaleaks.orm import transact
+from globaleaks.orm import get_pool_stats, transact_ro
+from globaleaks.rest.cache import Cache
 from globaleaks.state import State
+from globaleaks.utils import kdf, upload
 from globaleaks.utils.utility import datetime_to_ISO8601, datetime_now, \
     iso_to_gregorian
 
@@ -24,7 +29,7 @@ def weekmap_to_heatmap(week_map):
     return retlist
 
 
-@transact
+@transact_ro
 def get_stats(session, tid, week_delta):
     """
     :param week_delta: commonly is 0, mean that you're taking this
@@ -108,7 +113,7 @@ def get_stats(session, tid, week_delta):
     }
 
 
-@transact
+@transact_ro
 def get_anomaly_history(session, tid, limit):
     anomalies = session.query(Anomalies).filter(Anomalies.tid == tid).order_by(Anomalies.date.desc())[:limit]
 
@@ -190,3 +195,39 @@ class JobsTiming(BaseHandler):
             })
 
         return response
+
+
+class CacheStats(BaseHandler):
+    """
+    This handler return the usage statistics of the API cache
+    """
+    check_roles = 'admin'
+    root_tenant_only = True
+
+    def get(self):
+        return Cache.get_stats()
+
+
+class PerformanceStats(BaseHandler):
+    """
+    This handler return the usage statistics of the caches, the thread
+    pools and the queues of the platform
+    """
+    check_roles = 'admin'
+    root_tenant_only = True
+
+    def get(self):
+        uploads = upload.monitor.get_stats()
+        uploads.update(self.state.TempUploadFiles.get_stats())
+
+        return {
+            'orm': get_pool_stats(),
+            'questionnaires': QuestionnaireSchemaCache.get_stats(),
+            'schemas': ArchivedSchemaCache.get_stats(),
+            'delivery': delivery.executor.get_stats(),
+            'kdf': kdf.executor.get_stats(),
+            'uploads': uploads,
+            'exports': export.monitor.get_stats(),
+            'mails': notification.spooler.get_stats(),
+            'triggers': notification.generation.get_stats()
+        }
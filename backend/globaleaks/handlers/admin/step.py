@@ -11,6 +11,7 @@ from globaleaks.handlers.admin.field import db_create_field, db_update_field, db
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.operation import OperationHandler
 from globaleaks.handlers.public import serialize_step
+from globaleaks.handlers.submission import QuestionnaireSchemaCache
 from globaleaks.models import fill_localized_keys
 from globaleaks.orm import transact
 from globaleaks.rest import requests, errors
@@ -27,6 +28,8 @@ def db_create_step(session, tid, step_dict, language):
 
     step = models.db_forge_obj(session, models.Step, step_dict)
 
+    QuestionnaireSchemaCache.invalidate()
+
     for trigger in step_dict.get('triggered_by_options', []):
         db_create_trigger(session, tid, trigger['option'], 'step', step.id, trigger.get('sufficient', True))
 
@@ -64,6 +67,8 @@ def db_update_step(session, tid, step_id, step_dict, language):
 
     step.update(step_dict)
 
+    QuestionnaireSchemaCache.invalidate()
+
     for child in step_dict['children']:
         db_update_field(session, tid, child['id'], child, language)
 
@@ -82,6 +87,8 @@ def update_step(session, tid, step_id, request, language):
 
 @transact
 def delete_step(session, tid, step_id):
+    QuestionnaireSchemaCache.invalidate()
+
     q_ids = session.query(models.Questionnaire.id).filter(models.Questionnaire.tid == tid)
 
     session.query(models.Step).filter(models.Step.id == step_id,
@@ -104,6 +111,8 @@ def order_elements(session, handler, req_args, *args, **kwargs):
     for i, step_id in enumerate(ids):
         id_dict[step_id].presentation_order = i
 
+    QuestionnaireSchemaCache.invalidate()
+
 
 class StepCollection(OperationHandler):
     """
@@ -9,7 +9,7 @@ from globaleaks.rest import errors
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.operation import OperationHandler
 from globaleaks.models import fill_localized_keys, get_localized_values
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests
 
 
@@ -74,7 +74,7 @@ def db_retrieve_all_submission_statuses(session, tid, language):
     return submission_statuses
 
 
-@transact
+@transact_ro
 def retrieve_all_submission_statuses(session, tid, language):
     """Transact version of db_retrieve_all_submission_statuses"""
     return db_retrieve_all_submission_statuses(session, tid, language)
@@ -92,7 +92,7 @@ def db_retrieve_specific_submission_status(session, tid, submission_status_id, l
     return serialize_submission_status(session, status, language)
 
 
-@transact
+@transact_ro
 def retrieve_specific_submission_status(session, tid, submission_status_id, language):
     """Transact version of db_retrieve_specific_submission_status"""
     return db_retrieve_specific_submission_status(session, tid, submission_status_id, language)
@@ -250,6 +250,7 @@ class SubmissionStatusCollection(OperationHandler):
     """Handles submission statuses on the backend"""
     check_roles = 'admin'
     invalidate_cache = True
+    propagate_cache_invalidation = False
 
     def get(self):
         return retrieve_all_submission_statuses(self.request.tid, self.request.language)
@@ -270,6 +271,7 @@ class SubmissionStatusInstance(BaseHandler):
     """Manipulates a specific submission status"""
     check_roles = 'admin'
     invalidate_cache = True
+    propagate_cache_invalidation = False
 
     def put(self, submission_status_id):
         request = self.validate_message(self.request.content.read(),
@@ -287,6 +289,7 @@ class SubmissionSubStatusCollection(OperationHandler):
     """Manages substatuses for a given status"""
     check_roles = 'admin'
     invalidate_cache = True
+    propagate_cache_invalidation = False
 
     @inlineCallbacks
     def get(self, submission_status_id):
@@ -310,6 +313,7 @@ class SubmissionSubStatusInstance(BaseHandler):
     """Manipulates a specific submission status"""
     check_roles = 'admin'
     invalidate_cache = True
+    propagate_cache_invalidation = False
 
     def put(self, submission_status_id, submission_substatus_id):
         request = self.validate_message(self.request.content.read(),
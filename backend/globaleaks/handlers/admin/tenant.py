@@ -12,7 +12,8 @@ from globaleaks.db import db_refresh_memory_variables
 from globaleaks.db.appdata import load_appdata
 from globaleaks.handlers.admin import file
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.orm import transact
+from globaleaks.handlers.l10n import L10NCache
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests
 from globaleaks.settings import Settings
 from globaleaks.state import State
@@ -108,12 +109,12 @@ def db_get_tenant_list(session):
                                                                   .outerjoin(models.Signup, models.Tenant.id == models.Signup.tid)]
 
 
-@transact
+@transact_ro
 def get_tenant_list(session):
     return db_get_tenant_list(session)
 
 
-@transact
+@transact_ro
 def get(session, id):
     return serialize_tenant(session, models.db_get(session, models.Tenant, models.Tenant.id == id))
 
@@ -192,4 +193,4 @@ class TenantInstance(BaseHandler):
 
         log.info('Removing tenant with id: %d', tenant_id, tid=self.request.tid)
 
-        return delete(tenant_id)
+        return delete(tenant_id).addCallback(lambda _: L10NCache.invalidate(tenant_id))
@@ -15,7 +15,7 @@ from globaleaks.handlers.user import db_get_user, \
                                      serialize_usertenant_association
 
 from globaleaks.models import fill_localized_keys
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests, errors
 from globaleaks.state import State
 from globaleaks.utils.crypto import GCE
@@ -144,7 +144,7 @@ def db_get_admin_users(session, tid):
     return [user_serialize_user(session, user, State.tenant_cache[tid].default_language) for user in users]
 
 
-@transact
+@transact_ro
 def get_receiver_list(session, tid, language):
     """
     Returns:
@@ -157,7 +157,7 @@ def get_receiver_list(session, tid, language):
     return [user_serialize_user(session, user, language) for user in users]
 
 
-@transact
+@transact_ro
 def get_user_list(session, tid, language):
     """
     Returns:
@@ -8,12 +8,13 @@ from globaleaks.handlers.admin.node import db_admin_serialize_node
 from globaleaks.handlers.admin.notification import db_get_notification
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.models import InternalTip, User, UserTenant, WhistleblowerTip
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import errors, requests
 from globaleaks.sessions import Sessions
 from globaleaks.settings import Settings
 from globaleaks.state import State
 from globaleaks.twofactor import TwoFactorTokens
+from globaleaks.utils import kdf
 from globaleaks.utils.crypto import GCE
 from globaleaks.utils.ip import check_ip
 from globaleaks.utils.log import log
@@ -60,68 +61,103 @@ def connection_check(client_ip, tid, role, client_using_tor):
         raise errors.TorNetworkRequired
 
 
+@transact_ro
+def get_whistleblower_tip(session, tid, receipt_hash):
+    """
+    Return the id and the private key of the tip matching the receipt
+
+    The lookup is read only so that the failed attempts do not queue on
+    the writer thread.
+    """
+    return session.query(WhistleblowerTip.id, WhistleblowerTip.crypto_prv_key) \
+                  .filter(WhistleblowerTip.receipt_hash == receipt_hash,
+                          WhistleblowerTip.tid == tid).one_or_none()
+
+
 @transact
-def login_whistleblower(session, tid, receipt):
+def access_whistleblower_tip(session, tid, wbtip_id):
+    session.query(InternalTip) \
+           .filter(InternalTip.id == wbtip_id,
+                   InternalTip.tid == tid).update({'wb_last_access': datetime_now()})
+
+
+@inlineCallbacks
+def login_whistleblower(tid, receipt):
     """
     login_whistleblower returns a session
+
+    The receipt is hashed with the current algorithm and only in case of a
+    miss with the legacy algorithms still in use by the tenant.
     """
-    x = None
+    salt = State.tenant_cache[tid].receipt_salt
 
-    algorithms = [x[0] for x in session.query(WhistleblowerTip.hash_alg).filter(WhistleblowerTip.tid == tid).distinct()]
-    if algorithms:
-        hashes = []
-        for alg in algorithms:
-            hashes.append(GCE.hash_password(receipt, State.tenant_cache[tid].receipt_salt, alg))
+    algorithms = [GCE.HASH]
+    algorithms.extend(sorted(State.tenant_cache[tid].get('receipt_hash_algorithms', set()) - {GCE.HASH}))
 
-        x  = session.query(WhistleblowerTip, InternalTip) \
-                    .filter(WhistleblowerTip.receipt_hash.in_(hashes),
-                            WhistleblowerTip.tid == tid,
-                            InternalTip.id == WhistleblowerTip.id,
-                            InternalTip.tid == WhistleblowerTip.tid).one_or_none()
+    x = None
+    for alg in algorithms:
+        receipt_hash = yield kdf.executor.run(State.kdf_tp, GCE.hash_password, receipt, salt, alg)
+        x = yield get_whistleblower_tip(tid, receipt_hash)
+        if x is not None:
+            break
 
     if x is None:
         log.debug("Whistleblower login: Invalid receipt")
         Settings.failed_login_attempts += 1
         raise errors.InvalidAuthentication
 
-    wbtip = x[0]
-    itip = x[1]
+    wbtip_id, wbtip_crypto_prv_key = x
 
-    itip.wb_last_access = datetime_now()
+    yield access_whistleblower_tip(tid, wbtip_id)
 
     crypto_prv_key = ''
-    if State.tenant_cache[1].encryption and wbtip.crypto_prv_key:
-        user_key = GCE.derive_key(receipt.encode('utf-8'), State.tenant_cache[tid].receipt_salt)
-        crypto_prv_key = GCE.symmetric_decrypt(user_key, wbtip.crypto_prv_key)
+    if State.tenant_cache[1].encryption and wbtip_crypto_prv_key:
+        user_key = yield kdf.executor.run(State.kdf_tp, GCE.derive_key, receipt.encode('utf-8'), salt)
+        crypto_prv_key = GCE.symmetric_decrypt(user_key, wbtip_crypto_prv_key)
 
-    return Sessions.new(tid, wbtip.id, 'whistleblower', False, crypto_prv_key)
+    returnValue(Sessions.new(tid, wbtip_id, 'whistleblower', False, crypto_prv_key))
 
 
-@transact
-def login(session, tid, username, password, authcode, client_using_tor, client_ip):
+@transact_ro
+def get_user_credentials(session, tid, username):
+    return [(u.id, u.hash_alg, u.salt, u.password) for u in
+            session.query(User).filter(User.username == username,
+                                       User.state != u'disabled',
+                                       UserTenant.user_id == User.id,
+                                       UserTenant.tenant_id == tid).distinct()]
+
+
+def check_credentials(credentials, password):
     """
-    login returns a session
+    Return the credentials of the user matching the password
+
+    :param credentials: a list of (id, hash_alg, salt, password) tuples
+    :param password: the password to be checked
     """
-    user = None
+    for credential in credentials:
+        _, hash_alg, salt, user_password = credential
 
-    users = session.query(User).filter(User.username == username,
-                                       User.state != u'disabled',
-                                       UserTenant.user_id == User.id,
-                                       UserTenant.tenant_id == tid).distinct()
-    for u in users:
-        if GCE.check_password(u.hash_alg, password, u.salt, u.password):
-            user = u
-            break
+        if GCE.check_password(hash_alg, password, salt, user_password):
+            return credential
 
         # Fix for issue: https://github.com/globaleaks/GlobaLeaks/issues/2563
         if State.tenant_cache[1].creation_date < 1551740400:
-            u_password = 'b\'' + u.password + '\''
-            if GCE.check_password(u.hash_alg, password, u.salt, u_password):
-                user = u
-                break
+            u_password = 'b\'' + user_password + '\''
+            if GCE.check_password(hash_alg, password, salt, u_password):
+                return credential
 
-    if user is None:
-        log.debug("Login: Invalid credentials")
+
+@transact
+def access_user(session, tid, credential, authcode, client_using_tor, client_ip):
+    user_id, hash_alg, salt, password = credential
+
+    user = session.query(User).filter(User.id == user_id,
+                                      User.state != u'disabled').one_or_none()
+
+    # The password is checked out of this transaction and in the meantime
+    # the user could have been disabled or its password changed
+    if user is None or (user.hash_alg, user.salt, user.password) != (hash_alg, salt, password):
+        log.debug("Login: Credentials changed during the login")
         Settings.failed_login_attempts += 1
         raise errors.InvalidAuthentication
 
@@ -155,12 +191,38 @@ def login(session, tid, username, password, authcode, client_using_tor, client_i
 
     user.last_login = datetime_now()
 
+    return user.role, user.password_change_needed, user.salt, user.crypto_prv_key
+
+
+@inlineCallbacks
+def login(tid, username, password, authcode, client_using_tor, client_ip):
+    """
+    login returns a session
+
+    The login is split in a short read of the credentials, the check of the
+    password on the kdf thread pool and a short write updating the user.
+    """
+    credentials = yield get_user_credentials(tid, username)
+
+    credential = None
+    if credentials:
+        credential = yield kdf.executor.run(State.kdf_tp, check_credentials, credentials, password)
+
+    if credential is None:
+        log.debug("Login: Invalid credentials")
+        Settings.failed_login_attempts += 1
+        raise errors.InvalidAuthentication
+
+    user_id = credential[0]
+
+    role, pcn, salt, user_crypto_prv_key = yield access_user(tid, credential, authcode, client_using_tor, client_ip)
+
     crypto_prv_key = ''
-    if State.tenant_cache[1].encryption and user.crypto_prv_key:
-        user_key = GCE.derive_key(password.encode('utf-8'), user.salt)
-        crypto_prv_key = GCE.symmetric_decrypt(user_key, user.crypto_prv_key)
+    if State.tenant_cache[1].encryption and user_crypto_prv_key:
+        user_key = yield kdf.executor.run(State.kdf_tp, GCE.derive_key, password.encode('utf-8'), salt)
+        crypto_prv_key = GCE.symmetric_decrypt(user_key, user_crypto_prv_key)
 
-    return Sessions.new(tid, user.id, user.role, user.password_change_needed, crypto_prv_key)
+    returnValue(Sessions.new(tid, user_id, role, pcn, crypto_prv_key))
 
 
 @transact
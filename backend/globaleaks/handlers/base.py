@@ -49,6 +49,7 @@ class BaseHandler(object):
     uniform_answer_time = False
     cache_resource = False
     invalidate_cache = False
+    propagate_cache_invalidation = True
     bypass_basic_auth = False
     root_tenant_only = False
     upload_handler = False
@@ -62,6 +63,12 @@ class BaseHandler(object):
         self.request = request
         self.request.start_time = datetime.now()
 
+    def get_cache_resource(self):
+        """
+        Return the key used to cache the snapshot of the resource
+        """
+        return self.request.path
+
     def basic_auth(self):
         msg = None
         if b"authorization" in self.request.headers:
@@ -326,28 +333,53 @@ class BaseHandler(object):
             return self.state.api_token_session
 
     def process_file_upload(self):
+        upload_error = getattr(self.request, 'upload_error', None)
+        if upload_error is not None:
+            log.err("File upload request rejected: %s", upload_error.reason, tid=self.request.tid)
+            raise upload_error
+
         if b'flowFilename' not in self.request.args:
             return
 
+        maximum_filesize = self.state.tenant_cache[self.request.tid].maximum_filesize
+
         total_file_size = int(self.request.args[b'flowTotalSize'][0])
         flow_identifier = self.request.args[b'flowIdentifier'][0]
 
-        chunk_size = len(self.request.args[b'file'][0])
-        if ((chunk_size / (1024 * 1024)) > self.state.tenant_cache[self.request.tid].maximum_filesize or
-            (total_file_size / (1024 * 1024)) > self.state.tenant_cache[self.request.tid].maximum_filesize):
-            log.err("File upload request rejected: file too big", tid=self.request.tid)
-            raise errors.FileTooBig(self.state.tenant_cache[self.request.tid].maximum_filesize)
+        f = self.state.TempUploadFiles.get(flow_identifier)
 
-        if flow_identifier not in self.state.TempUploadFiles:
-            self.state.TempUploadFiles.set(flow_identifier, SecureTemporaryFile(Settings.tmp_path))
+        chunk = self.request.args[b'file'][0]
+        if isinstance(chunk, SecureTemporaryFile):
+            # The chunk has been already written by the streaming parser to
+            # a file of the request that is now appended to the flow
+            if f is None:
+                f = chunk
+                self.state.TempUploadFiles.set(flow_identifier, f)
+            else:
+                with chunk.open('w'):
+                    chunk.finalize_write()
+
+                with chunk.open('r'), f.open('w'):
+                    for data in iter(lambda: chunk.read(abstract.FileDescriptor.bufferSize), b''):
+                        f.write(data)
+        else:
+            if f is None:
+                f = SecureTemporaryFile(Settings.tmp_path)
+                self.state.TempUploadFiles.set(flow_identifier, f)
 
-        f = self.state.TempUploadFiles[flow_identifier]
-        with f.open('w') as f:
-            f.write(self.request.args[b'file'][0])
+            with f.open('w'):
+                f.write(chunk)
+
+        if ((f.size / (1024 * 1024)) > maximum_filesize or
+            (total_file_size / (1024 * 1024)) > maximum_filesize):
+            log.err("File upload request rejected: file too big", tid=self.request.tid)
+            self.state.TempUploadFiles.delete(flow_identifier)
+            raise errors.FileTooBig(maximum_filesize)
 
-            if self.request.args[b'flowChunkNumber'][0] != self.request.args[b'flowTotalChunks'][0]:
-                return None
+        if self.request.args[b'flowChunkNumber'][0] != self.request.args[b'flowTotalChunks'][0]:
+            return None
 
+        with f.open('w'):
             f.finalize_write()
 
         mime_type, _ = mimetypes.guess_type(text_type(self.request.args[b'flowFilename'][0], 'utf-8'))
@@ -1,12 +1,17 @@
 # -*- coding: utf-8 -*-
 #
 # API handling export of submissions
+import json
 import os
+import threading
+import time
 
+from collections import OrderedDict, deque
 from io import BytesIO
 from six import text_type
-from twisted.internet import abstract
+from twisted.internet import abstract, reactor
 from twisted.internet.defer import Deferred, inlineCallbacks
+from twisted.internet.threads import deferToThreadPool
 
 from globaleaks import models
 from globaleaks.handlers.admin.context import admin_serialize_context
@@ -15,15 +20,18 @@ from globaleaks.handlers.admin.notification import db_get_notification
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.rtip import db_access_rtip, serialize_rtip
 from globaleaks.handlers.user import user_serialize_user
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
+from globaleaks.rest import errors
+from globaleaks.rest.cache import etagdata
 from globaleaks.settings import Settings
 from globaleaks.utils.crypto import GCE
+from globaleaks.utils.log import log
 from globaleaks.utils.templating import Templating
 from globaleaks.utils.utility import msdos_encode, datetime_now
-from globaleaks.utils.zipstream import ZipStream
+from globaleaks.utils.zipstream import ZipStream, ZIP_STORED
 
 
-@transact
+@transact_ro
 def get_tip_export(session, tid, user_id, rtip_id, language):
     rtip, itip = db_access_rtip(session, tid, user_id, rtip_id)
 
@@ -46,18 +54,11 @@ def get_tip_export(session, tid, user_id, rtip_id, language):
         'context': admin_serialize_context(session, context, language),
         'comments': rtip_dict['comments'],
         'messages': rtip_dict['messages'],
-        'files': []
+        'files': [],
+        'date': itip.creation_date.timetuple()[0:6]
     }
 
-    export_template = Templating().format_template(export_dict['notification']['export_template'], export_dict).encode('utf-8')
-
-    export_template = msdos_encode(text_type(export_template, 'utf-8')).encode('utf-8')
-
-    export_dict['files'].append({'fo': BytesIO(export_template), 'name': 'data.txt', 'forged': True})
-
     for rfile in session.query(models.ReceiverFile).filter(models.ReceiverFile.receivertip_id == rtip_id):
-        rfile.last_access = datetime_now()
-        rfile.downloads += 1
         file_dict = models.serializers.serialize_rfile(session, tid, rfile)
         file_dict['name'] = 'files/' + file_dict['name']
         file_dict['path'] = os.path.join(Settings.attachments_path, file_dict['filename'])
@@ -76,46 +77,292 @@ def get_tip_export(session, tid, user_id, rtip_id, language):
     return export_dict
 
 
+@transact
+def count_tip_export_downloads(session, tid, rtip_id):
+    """
+    Account the download of the files of an export
+    """
+    for rfile in session.query(models.ReceiverFile).filter(models.ReceiverFile.receivertip_id == rtip_id,
+                                                           models.ReceiverFile.receivertip_id == models.ReceiverTip.id,
+                                                           models.ReceiverTip.internaltip_id == models.InternalTip.id,
+                                                           models.InternalTip.tid == tid):
+        rfile.last_access = datetime_now()
+        rfile.downloads += 1
+
+
+class ExportMonitor(object):
+    """
+    Keep track of the exports being streamed and of their throughput
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.active = 0
+        self.count = 0
+        self.resumed = 0
+        self.bytes = 0
+        self.time = 0.0
+        self.last_throughput = 0.0
+
+    def start(self, resumed):
+        self.active += 1
+        if resumed:
+            self.resumed += 1
+
+    def stop(self, size, duration):
+        self.active -= 1
+        self.count += 1
+        self.bytes += size
+        self.time += duration
+        self.last_throughput = size / duration if duration else 0.0
+
+    def get_stats(self):
+        return {
+            'active': self.active,
+            'count': self.count,
+            'resumed': self.resumed,
+            'bytes': self.bytes,
+            'throughput': self.bytes / self.time if self.time else 0.0,
+            'last_throughput': self.last_throughput
+        }
+
+
+monitor = ExportMonitor()
+
+
+class CRCCache(object):
+    """
+    In memory LRU cache of the CRCs of the files exported
+
+    The CRCs are needed to resume an export from an offset following the
+    content of a file without decrypting it again; the files are never
+    modified so that the entries do not need invalidation.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.memory_cache_dict = OrderedDict()
+
+        # The cache is accessed by the threads of the export pool
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            crc = self.memory_cache_dict.pop(key, None)
+            if crc is not None:
+                self.memory_cache_dict[key] = crc
+
+            return crc
+
+    def __setitem__(self, key, crc):
+        with self.lock:
+            self.memory_cache_dict.pop(key, None)
+            self.memory_cache_dict[key] = crc
+
+            while len(self.memory_cache_dict) > self.size:
+                self.memory_cache_dict.popitem(last=False)
+
+
+crc_cache = CRCCache(4096)
+
+
+def prepare_tip_export(cc, tip_export):
+    """
+    Render the export template and open the files of the export
+
+    The files are STORED in the archive as the attachments are usually
+    already compressed; this makes the size of the archive known before
+    reading them and the archive seekable for resuming the downloads.
+
+    :return: the ZipStream of the export and its ETag
+    """
+    export_template = Templating().format_template(tip_export['notification']['export_template'], tip_export).encode('utf-8')
+
+    export_template = msdos_encode(text_type(export_template, 'utf-8')).encode('utf-8')
+
+    files = [{'fo': BytesIO(export_template), 'name': 'data.txt', 'size': len(export_template)}]
+
+    tip_prv_key = None
+    if tip_export['crypto_tip_prv_key']:
+        tip_prv_key = GCE.asymmetric_decrypt(cc, tip_export['crypto_tip_prv_key'])
+
+    for file_dict in tip_export['files']:
+        f = {'name': file_dict['name'], 'path': file_dict['path']}
+
+        if file_dict['forged'] or tip_prv_key is None:
+            f['size'] = os.path.getsize(file_dict['path'])
+        else:
+            f['fo'] = GCE.streaming_encryption_open('DECRYPT', tip_prv_key, file_dict['path'])
+            f['size'] = GCE.streaming_encryption_size(file_dict['path'])
+
+        files.append(f)
+
+    manifest = json.dumps([tip_export['date'], [(f['name'], f['size']) for f in files]])
+
+    etag = etagdata(export_template + manifest.encode())
+
+    return ZipStream(files, ZIP_STORED, tip_export['date'], crc_cache), etag
+
+
+def parse_range(header, size):
+    """
+    Parse the value of a Range header
+
+    Only single byte ranges are supported; the header is ignored otherwise.
+
+    :return: the first and the last byte of the range or None
+    """
+    if header is None or not header.startswith(b'bytes=') or b',' in header:
+        return None
+
+    first, _, last = header[6:].strip().partition(b'-')
+
+    try:
+        if not first:
+            # suffix range: the last bytes of the resource
+            first, last = max(size - int(last), 0), size - 1
+        else:
+            first, last = int(first), int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if first >= size:
+        raise errors.RangeNotSatisfiable()
+
+    if first > last:
+        return None
+
+    return first, min(last, size - 1)
+
+
 class ZipStreamProducer(object):
-    """Streaming producter for ZipStream"""
+    """
+    Streaming producer for ZipStream
 
-    def __init__(self, handler, zipstreamObject):
+    The chunks of the archive are generated by the threads of a pool while
+    the producer writes them; the chunks generated in advance are limited
+    to read_ahead.
+    """
+    read_ahead = 4
+
+    def __init__(self, handler, zipstream, offset, thread_pool, length):
         self.finish = Deferred()
         self.handler = handler
-        self.zipstreamObject = zipstreamObject
+        self.zipstream = zipstream
+        self.zipstreamObject = zipstream.iterate(offset)
+        self.thread_pool = thread_pool
+        self.length = length
+        self.generated = 0
+        self.written = 0
+        self.start_time = 0
+
+        self.chunks = deque()
+        self.eof = False
+        self.wanted = False
+        self.fetching = False
 
     def start(self):
+        self.start_time = time.time()
         self.handler.request.registerProducer(self, False)
+        self.fetch()
         return self.finish
 
+    def fetch(self):
+        if self.handler is None or self.fetching or self.eof or len(self.chunks) >= self.read_ahead:
+            return
+
+        self.fetching = True
+        d = deferToThreadPool(reactor, self.thread_pool, self.zip_chunk)
+        d.addCallbacks(self.chunk_ready, self.chunk_failed)
+
+    def chunk_ready(self, data):
+        self.fetching = False
+
+        if self.handler is None:
+            self.close()
+            return
+
+        if data:
+            self.chunks.append(data)
+        else:
+            self.eof = True
+
+        if self.wanted:
+            self.resumeProducing()
+
+        self.fetch()
+
+    def chunk_failed(self, failure):
+        self.fetching = False
+
+        if self.handler is not None:
+            # the response cannot be concluded correctly once started
+            self.handler.request.loseConnection()
+            self.stop()
+        else:
+            self.close()
+
+        log.err("Unable to generate the export: %s", failure.getErrorMessage())
+
     def resumeProducing(self):
         if not self.handler:
             return
 
-        data = self.zip_chunk()
-        if data:
+        if self.chunks:
+            self.wanted = False
+            data = self.chunks.popleft()
+            self.written += len(data)
             self.handler.request.write(data)
+            self.fetch()
+        elif self.eof:
+            self.handler.request.unregisterProducer()
+            self.handler.request.finish()
+            self.stop()
         else:
-            self.stopProducing()
+            self.wanted = True
 
     def stopProducing(self):
-        self.handler.request.unregisterProducer()
-        self.handler.request.finish()
+        self.stop()
+
+    def stop(self):
+        if self.handler is None:
+            return
+
         self.handler = None
+        monitor.stop(self.written, time.time() - self.start_time)
+
+        # The files are closed only once the chunk being generated, if
+        # any, is ready
+        if not self.fetching:
+            self.close()
+
         self.finish.callback(None)
 
+    def close(self):
+        # Closing the generator closes the file being archived, if any
+        self.zipstreamObject.close()
+        self.zipstream.close()
+
     def zip_chunk(self):
         chunk = []
         chunk_size = 0
 
+        # the chunks are generated one at a time by the threads of the pool
+        remaining = self.length - self.generated
+        if remaining <= 0:
+            return b''
+
         for data in self.zipstreamObject:
-            if data:
-                chunk_size += len(data)
-                chunk.append(data)
-                if chunk_size >= abstract.FileDescriptor.bufferSize:
-                    return b''.join(chunk)
+            chunk_size += len(data)
+            chunk.append(data)
+            if chunk_size >= abstract.FileDescriptor.bufferSize:
+                break
 
-        return b''.join(chunk)
+        # the chunk is truncated to the end of the range requested
+        data = b''.join(chunk)[:remaining]
+        self.generated += len(data)
+
+        return data
 
 
 class ExportHandler(BaseHandler):
@@ -129,19 +376,43 @@ class ExportHandler(BaseHandler):
                                           rtip_id,
                                           self.request.language)
 
-        if tip_export['crypto_tip_prv_key']:
-            for file_dict in tip_export['files']:
-                if file_dict['forged']:
-                    continue
+        zip_stream, etag = yield deferToThreadPool(reactor, self.state.export_tp,
+                                                   prepare_tip_export, self.current_user.cc, tip_export)
 
-                tip_prv_key = GCE.asymmetric_decrypt(self.current_user.cc, tip_export['crypto_tip_prv_key'])
-                file_dict['fo'] = GCE.streaming_encryption_open('DECRYPT', tip_prv_key, file_dict['path'])
-                del file_dict['path']
+        size = zip_stream.size()
 
         self.request.setHeader(b'X-Download-Options', b'noopen')
         self.request.setHeader(b'Content-Type', b'application/octet-stream')
         self.request.setHeader(b'Content-Disposition', b'attachment; filename="submission.zip"')
+        self.request.setHeader(b'Accept-Ranges', b'bytes')
+        self.request.setHeader(b'ETag', etag)
+
+        byte_range = None
+
+        # a range is served only if the export did not change since the
+        # previous request as the client could have to combine the responses
+        if_range = self.request.headers.get(b'if-range')
+        if if_range is None or if_range == etag:
+            try:
+                byte_range = parse_range(self.request.headers.get(b'range'), size)
+            except errors.RangeNotSatisfiable:
+                zip_stream.close()
+                self.request.setHeader(b'Content-Range', b'bytes */%d' % size)
+                raise
+
+        if byte_range is None:
+            first, last = 0, size - 1
+        else:
+            first, last = byte_range
+            self.request.setResponseCode(206)
+            self.request.setHeader(b'Content-Range', b'bytes %d-%d/%d' % (first, last, size))
+
+        self.request.setHeader(b'Content-Length', b'%d' % (last - first + 1))
+
+        # The requests resuming an export are not accounted as new downloads
+        if first == 0:
+            yield count_tip_export_downloads(self.request.tid, rtip_id)
 
-        self.zip_stream = iter(ZipStream(tip_export['files']))
+        monitor.start(first > 0)
 
-        yield ZipStreamProducer(self, self.zip_stream).start()
+        yield ZipStreamProducer(self, zip_stream, first, self.state.export_tp, last - first + 1).start()
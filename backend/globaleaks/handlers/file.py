@@ -8,7 +8,7 @@ from twisted.internet import defer
 
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.orm import transact
+from globaleaks.orm import transact_ro
 
 
 def db_mark_file_for_secure_deletion(session, directory, filename):
@@ -21,7 +21,7 @@ def db_mark_file_for_secure_deletion(session, directory, filename):
     session.add(secure_file_delete)
 
 
-@transact
+@transact_ro
 def get_file_id(session, tid, name):
     return models.db_get(session, models.File, models.File.tid == tid, models.File.name == text_type(name)).id
 
@@ -1,13 +1,18 @@
 # -*- coding: utf-8 -*-
 #
 # Handlers dealing with download of texts translations and customiations
+import json
 import os
+import threading
 
-from globaleaks import models
+from twisted.internet.defer import inlineCallbacks, returnValue
+
+from globaleaks import models, LANGUAGES_SUPPORTED_CODES
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.models.config import ConfigFactory
-from globaleaks.orm import transact
+from globaleaks.orm import transact_ro
 from globaleaks.rest import errors
+from globaleaks.rest.cache import etagdata, gzipdata
+from globaleaks.rest.decorators import serve_cache_entry
 from globaleaks.settings import Settings
 from globaleaks.utils.fs import directory_traversal_check
 from globaleaks.utils.utility import read_json_file
@@ -17,33 +22,166 @@ def langfile_path(lang):
     return os.path.abspath(os.path.join(Settings.client_path, 'l10n', '%s.json' % lang))
 
 
-@transact
-def get_l10n(session, tid, lang):
-    if tid != 1:
-        config = ConfigFactory(session, 1)
-
-        if config.get_val(u'mode') != u'default':
-            tid = 1
-
+def load_langfile(lang):
     path = langfile_path(lang)
     directory_traversal_check(Settings.client_path, path)
 
     if not os.path.exists(path):
         raise errors.ResourceNotFound()
 
-    texts = read_json_file(path)
+    return read_json_file(path)
+
 
+@transact_ro
+def get_custom_texts(session, tid, lang):
     custom_texts = session.query(models.CustomTexts).filter(models.CustomTexts.lang == lang, models.CustomTexts.tid == tid).one_or_none()
-    custom_texts = custom_texts.texts if custom_texts is not None else {}
 
-    texts.update(custom_texts)
+    return custom_texts.texts if custom_texts is not None else {}
+
+
+class L10NCache(object):
+    """
+    In memory cache of the texts of the client
+
+    The translations shipped with the client are parsed once and shared by
+    all the tenants, while the customizations of every tenant are kept as
+    the small set of texts they override; the merged texts of a tenant and
+    language are serialized and compressed once and are invalidated only
+    when the customizations of that tenant and language change.
+    """
+    base = {}
+    overlays = {}
+    entries = {}
+
+    # The generation of every tenant and language is increased at every
+    # invalidation so that the customizations loaded before it are discarded
+    generations = {}
+
+    lock = threading.Lock()
+
+    stats = {
+        'hits': 0,
+        'misses': 0
+    }
+
+    @classmethod
+    def load(cls):
+        """
+        Parse the translations of all the languages supported
+        """
+        for lang in LANGUAGES_SUPPORTED_CODES:
+            if os.path.exists(langfile_path(lang)):
+                cls.get_base(lang)
+
+    @classmethod
+    def get_base(cls, lang):
+        texts = cls.base.get(lang)
+        if texts is None:
+            texts = cls.base[lang] = load_langfile(lang)
+
+        return texts
+
+    @classmethod
+    def get(cls, tid, lang):
+        """
+        Return the cache entry of the texts of a tenant and a language
+
+        :return: a tuple (content_type, gzipped data, etag) or None if the
+                 customizations of the tenant need to be loaded
+        """
+        key = (tid, lang)
+
+        with cls.lock:
+            entry = cls.entries.get(key)
+            if entry is not None:
+                cls.stats['hits'] += 1
+                return entry
+
+            cls.stats['misses'] += 1
+
+            overlay = cls.overlays.get(key)
+            if overlay is None:
+                return None
+
+        texts = dict(cls.get_base(lang))
+        texts.update(overlay)
 
-    return texts
+        data = json.dumps(texts, separators=(',', ':')).encode()
+
+        entry = (b'application/json', gzipdata(data), etagdata(data))
+
+        with cls.lock:
+            if cls.overlays.get(key) is overlay:
+                cls.entries[key] = entry
+
+        return entry
+
+    @classmethod
+    def get_generation(cls, tid, lang):
+        with cls.lock:
+            return cls.generations.get((tid, lang), 0)
+
+    @classmethod
+    def set_overlay(cls, tid, lang, texts, generation):
+        key = (tid, lang)
+
+        with cls.lock:
+            if cls.generations.get(key, 0) == generation:
+                cls.overlays[key] = texts
+
+    @classmethod
+    def invalidate(cls, tid=None, lang=None):
+        """
+        Invalidate the texts of a tenant, of all the tenants if tid is None,
+        in a language or in all the languages if lang is None
+        """
+        with cls.lock:
+            keys = set(cls.overlays) | set(cls.entries) | set(cls.generations)
+            if tid is not None and lang is not None:
+                keys.add((tid, lang))
+
+            for key in keys:
+                if (tid is None or key[0] == tid) and (lang is None or key[1] == lang):
+                    cls.overlays.pop(key, None)
+                    cls.entries.pop(key, None)
+                    cls.generations[key] = cls.generations.get(key, 0) + 1
+
+    @classmethod
+    def get_stats(cls):
+        with cls.lock:
+            ret = dict(cls.stats)
+            ret['languages'] = len(cls.base)
+            ret['entries'] = len(cls.entries)
+            return ret
+
+
+@inlineCallbacks
+def get_l10n(tid, lang):
+    entry = L10NCache.get(tid, lang)
+
+    while entry is None:
+        # the translations are checked before accessing the database
+        L10NCache.get_base(lang)
+
+        generation = L10NCache.get_generation(tid, lang)
+        texts = yield get_custom_texts(tid, lang)
+        L10NCache.set_overlay(tid, lang, texts, generation)
+
+        entry = L10NCache.get(tid, lang)
+
+    returnValue(entry)
 
 
 class L10NHandler(BaseHandler):
     check_roles = '*'
-    cache_resource = True
 
+    @inlineCallbacks
     def get(self, lang):
-        return get_l10n(self.request.tid, lang)
+        tid = self.request.tid
+
+        if tid != 1 and self.state.tenant_cache[1].mode != u'default':
+            tid = 1
+
+        entry = yield get_l10n(tid, lang)
+
+        returnValue(serve_cache_entry(self.request, entry, True))
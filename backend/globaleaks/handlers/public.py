@@ -1,8 +1,7 @@
 # -*- coding: utf-8 -*-
 #
 # Handlers dealing with public API exporting main platform configuration/resources
-import copy
-
+from six import binary_type
 from sqlalchemy import or_
 from twisted.internet.defer import inlineCallbacks, returnValue
 
@@ -12,7 +11,7 @@ from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.admin.submission_statuses import db_retrieve_all_submission_statuses
 from globaleaks.models import get_localized_values
 from globaleaks.models.config import ConfigFactory, ConfigL10NFactory
-from globaleaks.orm import transact
+from globaleaks.orm import transact_ro
 from globaleaks.state import State
 from globaleaks.utils.ip import check_ip
 from globaleaks.utils.sets import merge_dicts
@@ -28,16 +27,23 @@ def get_trigger_model_by_type(type):
         return models.FieldOptionTriggerStep
 
 
-def db_get_triggers_by_type(session, type, object_id):
-    ret = []
+def db_prepare_triggers_serialization(session, type, objects_ids):
+    ret = {}
+
+    if not objects_ids:
+        return ret
 
     m = get_trigger_model_by_type(type)
-    for x in session.query(models.FieldOption.field_id, models.FieldOption.id, m.sufficient) \
-                    .filter(models.FieldOption.id == m.option_id, m.object_id == object_id):
-        ret.append({'field': x[0], 'option': x[1], 'sufficient': x[2]})
+    for x in session.query(models.FieldOption.field_id, models.FieldOption.id, m.sufficient, m.object_id) \
+                    .filter(models.FieldOption.id == m.option_id, m.object_id.in_(objects_ids)):
+        if x[3] not in ret:
+            ret[x[3]] = []
+
+        ret[x[3]].append({'field': x[0], 'option': x[1], 'sufficient': x[2]})
 
     return ret
 
+
 def db_prepare_contexts_serialization(session, contexts):
     data = {'imgs': {}, 'receivers': {}}
 
@@ -69,37 +75,57 @@ def db_prepare_receivers_serialization(session, receivers):
 
 
 def db_prepare_fields_serialization(session, fields):
+    """
+    Load in memory the graph of a set of fields with their children, templates,
+    attributes, options and triggers.
+
+    The number of queries performed depends only on the depth of the graph.
+    The children are indexed by the id of the parent field or step.
+    """
     ret = {
         'fields': {},
+        'templates': {},
         'attrs': {},
-        'options': {}
+        'options': {},
+        'triggers': {}
     }
 
-    fields_ids = []
-    for f in fields:
-        fields_ids.append(f.id)
-        if f.template_id is not None:
-            fields_ids.append(f.template_id)
-        if f.template_override_id is not None:
-            fields_ids.append(f.template_override_id)
-
-    tmp = copy.deepcopy(fields_ids)
+    tmp = list(fields)
     while tmp:
-        fs = session.query(models.Field).filter(models.Field.fieldgroup_id.in_(tmp))
+        parents_ids = set()
+        templates_ids = set()
+
+        for f in tmp:
+            if f.id in ret['templates']:
+                continue
+
+            ret['templates'][f.id] = f
+            parents_ids.add(f.id)
+
+            for template_id in [f.template_id, f.template_override_id]:
+                if template_id is not None:
+                    templates_ids.add(template_id)
+
+        templates_ids -= set(ret['templates'])
+
+        conditions = []
+        if parents_ids:
+            conditions.append(models.Field.fieldgroup_id.in_(parents_ids))
+
+        if templates_ids:
+            conditions.append(models.Field.id.in_(templates_ids))
 
         tmp = []
-        for f in fs:
-            tmp.append(f.id)
-            if f.template_id is not None:
-                tmp.append(f.template_id)
-            if f.template_override_id is not None:
-                tmp.append(f.template_override_id)
+        if conditions:
+            for f in session.query(models.Field).filter(or_(*conditions)):
+                if f.fieldgroup_id in parents_ids:
+                    if f.fieldgroup_id not in ret['fields']:
+                        ret['fields'][f.fieldgroup_id] = []
+                    ret['fields'][f.fieldgroup_id].append(f)
 
-            if f.fieldgroup_id not in ret['fields']:
-                ret['fields'][f.fieldgroup_id] = []
-            ret['fields'][f.fieldgroup_id].append(f)
+                tmp.append(f)
 
-        fields_ids.extend(tmp)
+    fields_ids = list(ret['templates'])
 
     if fields_ids:
         objs = session.query(models.FieldAttr).filter(models.FieldAttr.field_id.in_(fields_ids))
@@ -116,6 +142,45 @@ def db_prepare_fields_serialization(session, fields):
                 ret['options'][obj.field_id] = []
             ret['options'][obj.field_id].append(obj)
 
+    ret['triggers'] = db_prepare_triggers_serialization(session, 'field', fields_ids)
+
+    return ret
+
+
+def db_prepare_steps_serialization(session, steps):
+    steps_ids = [s.id for s in steps]
+
+    fields = []
+    if steps_ids:
+        fields = session.query(models.Field).filter(models.Field.step_id.in_(steps_ids)).all()
+
+    ret = db_prepare_fields_serialization(session, fields)
+
+    for f in fields:
+        if f.step_id not in ret['fields']:
+            ret['fields'][f.step_id] = []
+        ret['fields'][f.step_id].append(f)
+
+    ret['triggers'].update(db_prepare_triggers_serialization(session, 'step', steps_ids))
+
+    return ret
+
+
+def db_prepare_questionnaires_serialization(session, questionnaires):
+    questionnaires_ids = [q.id for q in questionnaires]
+
+    steps = []
+    if questionnaires_ids:
+        steps = session.query(models.Step).filter(models.Step.questionnaire_id.in_(questionnaires_ids)).all()
+
+    ret = db_prepare_steps_serialization(session, steps)
+
+    ret['steps'] = {}
+    for s in steps:
+        if s.questionnaire_id not in ret['steps']:
+            ret['steps'][s.questionnaire_id] = []
+        ret['steps'][s.questionnaire_id].append(s)
+
     return ret
 
 
@@ -201,18 +266,20 @@ def serialize_context(session, context, language, data=None):
     return get_localized_values(ret_dict, context, context.localized_keys, language)
 
 
-def serialize_questionnaire(session, tid, questionnaire, language, serialize_templates=True):
+def serialize_questionnaire(session, tid, questionnaire, language, data=None, serialize_templates=True):
     """
     Serialize a questionnaire.
     """
-    steps = session.query(models.Step).filter(models.Step.questionnaire_id == questionnaire.id,
-                                              models.Questionnaire.id == questionnaire.id)
+    if data is None:
+        data = db_prepare_questionnaires_serialization(session, [questionnaire])
+
+    steps = data['steps'].get(questionnaire.id, [])
 
     ret_dict = {
         'id': questionnaire.id,
         'editable': questionnaire.editable and questionnaire.tid == tid,
         'name': questionnaire.name,
-        'steps': sorted([serialize_step(session, tid, s, language, serialize_templates=serialize_templates) for s in steps],
+        'steps': sorted([serialize_step(session, tid, s, language, data, serialize_templates=serialize_templates) for s in steps],
                         key=lambda x: x['presentation_order'])
     }
 
@@ -261,15 +328,15 @@ def serialize_field(session, tid, field, language, data=None, serialize_template
 
     f_to_serialize = field
     if field.template_override_id is not None and serialize_templates is True:
-        f_to_serialize = session.query(models.Field).filter(models.Field.id == field.template_override_id).one_or_none()
+        f_to_serialize = data['templates'].get(field.template_override_id)
     elif field.template_id is not None and serialize_templates is True:
-        f_to_serialize = session.query(models.Field).filter(models.Field.id == field.template_id).one_or_none()
+        f_to_serialize = data['templates'].get(field.template_id)
 
     attrs = {}
     for attr in data['attrs'].get(field.id, {}):
         attrs[attr.name] = serialize_field_attr(attr, language)
 
-    children = [serialize_field(session, tid, f, language) for f in data['fields'].get(f_to_serialize.id, [])]
+    children = [serialize_field(session, tid, f, language, data) for f in data['fields'].get(f_to_serialize.id, [])]
     children.sort(key=lambda f:(f['y'], f['x']))
 
     ret_dict = {
@@ -290,7 +357,7 @@ def serialize_field(session, tid, field, language, data=None, serialize_template
         'y': field.y,
         'width': field.width,
         'triggered_by_score': field.triggered_by_score,
-        'triggered_by_options': db_get_triggers_by_type(session, 'field', field.id),
+        'triggered_by_options': data['triggers'].get(field.id, []),
         'options': [serialize_field_option(o, language) for o in data['options'].get(f_to_serialize.id, [])],
         'children': children
     }
@@ -298,15 +365,14 @@ def serialize_field(session, tid, field, language, data=None, serialize_template
     return get_localized_values(ret_dict, field, field.localized_keys, language)
 
 
-def serialize_step(session, tid, step, language, serialize_templates=True):
+def serialize_step(session, tid, step, language, data=None, serialize_templates=True):
     """
     Serialize a step.
     """
-    children = session.query(models.Field).filter(models.Field.step_id == step.id)
-
-    data = db_prepare_fields_serialization(session, children)
+    if data is None:
+        data = db_prepare_steps_serialization(session, [step])
 
-    children = [serialize_field(session, tid, f, language, data, serialize_templates=serialize_templates) for f in children]
+    children = [serialize_field(session, tid, f, language, data, serialize_templates=serialize_templates) for f in data['fields'].get(step.id, [])]
     children.sort(key=lambda f:(f['y'], f['x']))
 
     ret_dict = {
@@ -314,7 +380,7 @@ def serialize_step(session, tid, step, language, serialize_templates=True):
         'questionnaire_id': step.questionnaire_id,
         'presentation_order': step.presentation_order,
         'triggered_by_score': step.triggered_by_score,
-        'triggered_by_options': db_get_triggers_by_type(session, 'step', step.id),
+        'triggered_by_options': data['triggers'].get(step.id, []),
         'children': children
     }
 
@@ -357,9 +423,11 @@ def db_get_questionnaire_list(session, tid, language):
                                                                 or_(models.Context.questionnaire_id == models.Questionnaire.id,
                                                                     models.Context.additional_questionnaire_id == models.Questionnaire.id),
                                                                 models.Context.status > 0,
-                                                                models.Context.tid == tid)
+                                                                models.Context.tid == tid).all()
+
+    data = db_prepare_questionnaires_serialization(session, questionnaires)
 
-    return [serialize_questionnaire(session, tid, questionnaire, language) for questionnaire in questionnaires]
+    return [serialize_questionnaire(session, tid, questionnaire, language, data) for questionnaire in questionnaires]
 
 
 def db_get_public_receiver_list(session, tid, language):
@@ -380,7 +448,7 @@ def db_get_public_receiver_list(session, tid, language):
     return ret
 
 
-@transact
+@transact_ro
 def get_public_resources(session, tid, language):
     return {
         'node': db_serialize_node(session, tid, language),
@@ -395,6 +463,23 @@ class PublicResource(BaseHandler):
     check_roles = '*'
     cache_resource = True
 
+    def accept_submissions(self):
+        tenant_cache = self.state.tenant_cache[self.request.tid]
+
+        if tenant_cache['ip_filter_whistleblower_enable'] and \
+           not check_ip(tenant_cache['ip_filter_whistleblower'], self.request.client_ip):
+            return False
+
+        return State.accept_submissions
+
+    def get_cache_resource(self):
+        # The snapshot served to clients excluded by the IP filter is kept separated
+        path = self.request.path
+        if isinstance(path, binary_type):
+            path = path.decode('utf-8')
+
+        return u'%s?accept_submissions=%d' % (path, int(self.accept_submissions()))
+
     @inlineCallbacks
     def get(self):
         """
@@ -402,10 +487,6 @@ class PublicResource(BaseHandler):
         """
         ret = yield get_public_resources(self.request.tid, self.request.language)
 
-        ret['node']['accept_submissions'] = State.accept_submissions
-
-        if (self.state.tenant_cache[self.request.tid]['ip_filter_whistleblower_enable'] and
-            not check_ip(self.state.tenant_cache[self.request.tid]['ip_filter_whistleblower'], self.request.client_ip)):
-            ret['node']['accept_submissions'] = False
+        ret['node']['accept_submissions'] = self.accept_submissions()
 
         returnValue(ret)
@@ -6,9 +6,9 @@ from sqlalchemy.sql.expression import func, distinct
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.rtip import db_postpone_expiration_date, db_delete_itip
-from globaleaks.handlers.submission import db_serialize_archived_preview_schema
+from globaleaks.handlers.submission import ArchivedSchemaCache
 from globaleaks.handlers.user import db_get_user, db_user_update_user, user_serialize_user
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests, errors
 from globaleaks.state import State
 from globaleaks.utils.utility import datetime_to_ISO8601
@@ -34,7 +34,7 @@ def receiver_serialize_receiver(session, tid, user, language):
     return ret_dict
 
 
-@transact
+@transact_ro
 def get_receiver_settings(session, tid, user_id, language):
     user = db_get_user(session, tid, user_id)
 
@@ -48,7 +48,7 @@ def update_receiver_settings(session, tid, user_session, request, language):
     return receiver_serialize_receiver(session, tid, user, language)
 
 
-@transact
+@transact_ro
 def get_receivertip_list(session, tid, receiver_id, language):
     rtip_summary_list = []
 
@@ -62,18 +62,17 @@ def get_receivertip_list(session, tid, receiver_id, language):
         return []
 
     itips_by_id = {}
-    aqs_by_itip = {}
+    hash_by_itip = {}
     comments_by_itip = {}
     internalfiles_by_itip = {}
     messages_by_rtip = {}
 
-    for itip, archivedschema in session.query(models.InternalTip, models.ArchivedSchema) \
-                                       .filter(models.InternalTip.id.in_(itips_ids),
-                                               models.ArchivedSchema.hash == models.InternalTipAnswers.questionnaire_hash,
-                                               models.InternalTipAnswers.internaltip_id == models.InternalTip.id,
-                                               models.InternalTip.tid == tid):
+    for itip, questionnaire_hash in session.query(models.InternalTip, models.InternalTipAnswers.questionnaire_hash) \
+                                          .filter(models.InternalTip.id.in_(itips_ids),
+                                                  models.InternalTipAnswers.internaltip_id == models.InternalTip.id,
+                                                  models.InternalTip.tid == tid):
         itips_by_id[itip.id] = itip
-        aqs_by_itip[itip.id] = archivedschema
+        hash_by_itip[itip.id] = questionnaire_hash
 
     result = session.query(models.ReceiverTip.id, func.count(distinct(models.Message.id))) \
                     .filter(models.ReceiverTip.receiver_id == receiver_id,
@@ -96,7 +95,6 @@ def get_receivertip_list(session, tid, receiver_id, language):
 
     for rtip in rtips:
         internaltip = itips_by_id[rtip.internaltip_id]
-        archivedschema = aqs_by_itip[rtip.internaltip_id]
 
         rtip_summary_list.append({
             'id': rtip.id,
@@ -113,7 +111,7 @@ def get_receivertip_list(session, tid, receiver_id, language):
             'comment_count': comments_by_itip.get(internaltip.id, 0),
             'message_count': messages_by_rtip.get(rtip.id, 0),
             'https': internaltip.https,
-            'preview_schema': db_serialize_archived_preview_schema(archivedschema.preview, language),
+            'preview_schema': ArchivedSchemaCache.get_preview(session, hash_by_itip[rtip.internaltip_id], language),
             'preview': internaltip.preview,
             'score': internaltip.total_score,
             'label': rtip.label,
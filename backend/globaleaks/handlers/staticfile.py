@@ -1,12 +1,169 @@
 # -*- coding: utf-8 -*-
 #
 # Handler exposing application files
+import gzip
+import hashlib
+import mimetypes
 import os
+import re
 
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.rest import errors
+from globaleaks.rest.cache import etag_match, gzipdata
 from globaleaks.utils.fs import directory_traversal_check
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# The quoted relative paths in index.html, like the src and href attributes
+# and the argument of the loadjsfile calls
+reference_regexp = re.compile(r'(["\'])([a-zA-Z0-9_\-\.]+/[a-zA-Z0-9_\-\./]+)(["\'])')
+
+
+class Asset(object):
+    """
+    File of the client held in memory with its compressed variants
+    """
+    __slots__ = ('content_type', 'version', 'variants')
+
+    def __init__(self, filename, data):
+        self.content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        self.version = hashlib.sha256(data).hexdigest()[:16]
+
+        # Every variant is a tuple (data, etag) stored by content encoding
+        self.variants = {'identity': (data, ('"%s"' % self.version).encode())}
+
+    def add_variant(self, encoding, data):
+        if len(data) < len(self.variants['identity'][0]):
+            self.variants[encoding] = (data, ('"%s-%s"' % (self.version, encoding)).encode())
+
+
+class AssetTable(object):
+    """
+    In memory table of the files of the client
+
+    The files are loaded once with their gzip and brotli variants and are
+    served with strong ETags; the files referenced by index.html are
+    versioned with the hash of their content so that the browsers can
+    store them without revalidation.
+
+    The requests not versioned keep the no-store policy of the API so that
+    index.html is never stored in the cache on disk of the browsers.
+    """
+    max_file_size = 16 * 1024 * 1024
+
+    # Quality of the brotli variants compressed at startup; the default
+    # quality 11 is too slow to be used on all the files of the client
+    brotli_quality = 5
+
+    def __init__(self, root):
+        self.root = root
+        self.assets = {}
+
+        self.load()
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def load(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+
+                if os.path.getsize(path) > self.max_file_size:
+                    continue
+
+                if name.endswith('.gz') or name.endswith('.br'):
+                    if os.path.exists(path[:-3]):
+                        # the variant is loaded with the file
+                        continue
+
+                    if name.endswith('.br'):
+                        continue
+
+                    name = name[:-3]
+                    with gzip.open(path, 'rb') as f:
+                        data = f.read()
+                else:
+                    data = self.read(path)
+
+                self.add(name, data)
+
+        index = self.assets.get('index.html')
+        if index is not None:
+            self.add('index.html', self.version_references(index.variants['identity'][0]))
+
+    def add(self, name, data):
+        asset = Asset(name, data)
+
+        path = os.path.join(self.root, name)
+
+        if os.path.exists(path + '.gz') and name != 'index.html':
+            asset.add_variant('gzip', self.read(path + '.gz'))
+        else:
+            asset.add_variant('gzip', gzipdata(data))
+
+        if os.path.exists(path + '.br') and name != 'index.html':
+            asset.add_variant('br', self.read(path + '.br'))
+        elif brotli is not None:
+            asset.add_variant('br', brotli.compress(data, quality=self.brotli_quality))
+
+        self.assets[name] = asset
+
+    def version_references(self, data):
+        def replace(match):
+            asset = self.assets.get(match.group(2))
+            if asset is None:
+                return match.group(0)
+
+            return match.group(1) + match.group(2) + '?v=' + asset.version + match.group(3)
+
+        return reference_regexp.sub(replace, data.decode('utf-8')).encode('utf-8')
+
+    def get(self, name):
+        return self.assets.get(name)
+
+
+asset_tables = {}
+
+
+def get_asset_table(root):
+    root = os.path.abspath(root)
+    if root not in asset_tables:
+        asset_tables[root] = AssetTable(root)
+
+    return asset_tables[root]
+
+
+def get_accepted_encodings(header):
+    """
+    Parse the value of an Accept-Encoding header
+    """
+    ret = set(['identity'])
+
+    for value in (header or b'').decode('utf-8', 'replace').split(','):
+        encoding, _, params = value.partition(';')
+        encoding = encoding.strip().lower()
+
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    ret.discard(encoding)
+                    continue
+            except ValueError:
+                continue
+
+        if encoding:
+            ret.add(encoding)
+
+    return ret
+
 
 class StaticFileHandler(BaseHandler):
     check_roles = '*'
@@ -21,6 +178,10 @@ class StaticFileHandler(BaseHandler):
         if not filename:
             filename = 'index.html'
 
+        asset = get_asset_table(self.root).get(filename)
+        if asset is not None:
+            return self.write_asset(asset)
+
         abspath = os.path.abspath(os.path.join(self.root, filename))
 
         directory_traversal_check(self.root, abspath)
@@ -31,3 +192,34 @@ class StaticFileHandler(BaseHandler):
             return self.write_file(filename, abspath)
 
         raise errors.ResourceNotFound()
+
+    def write_asset(self, asset):
+        accepted_encodings = get_accepted_encodings(self.request.headers.get(b'accept-encoding'))
+
+        for encoding in ['br', 'gzip', 'identity']:
+            if encoding in accepted_encodings and encoding in asset.variants:
+                break
+
+        data, etag = asset.variants[encoding]
+
+        # The versioned references never change content and could be stored
+        # by the browsers
+        if self.request.args.get(b'v', [None])[0] == asset.version.encode():
+            self.request.responseHeaders.removeHeader(b'Pragma')
+            self.request.responseHeaders.removeHeader(b'Expires')
+            self.request.setHeader(b'Cache-control', b'public, max-age=31536000, immutable')
+
+        self.request.setHeader(b'ETag', etag)
+        self.request.setHeader(b'Vary', b'Accept-Encoding')
+
+        if etag_match(self.request.headers.get(b'if-none-match'), etag):
+            self.request.setResponseCode(304)
+            return
+
+        if encoding != 'identity':
+            self.request.setHeader(b'Content-encoding', encoding.encode())
+
+        self.request.setHeader(b'Content-Type', asset.content_type.encode())
+        self.request.setHeader(b'Content-Length', b'%d' % len(data))
+
+        self.request.write(data)
@@ -4,17 +4,21 @@
 import base64
 import copy
 import json
+import threading
 
+from collections import OrderedDict
 from six import text_type
+from twisted.internet.defer import DeferredList, inlineCallbacks, returnValue
 
 from globaleaks import models
-from globaleaks.handlers.admin.questionnaire import db_get_questionnaire
 from globaleaks.handlers.admin.submission_statuses import db_get_id_for_system_status
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.models import get_localized_values
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import errors, requests
+from globaleaks.settings import Settings
 from globaleaks.state import State
+from globaleaks.utils import kdf
 from globaleaks.utils.crypto import sha256, GCE
 from globaleaks.utils.log import log
 from globaleaks.utils.utility import get_expiration, \
@@ -116,6 +120,137 @@ def db_serialize_archived_preview_schema(preview_schema, language):
     return preview
 
 
+class ArchivedSchemaCache(object):
+    """
+    In memory LRU cache of the localized serializations of the archived
+    questionnaire schemas
+
+    Archived schemas are stored by the hash of their content and never change,
+    so their serializations are cached by (hash, type, language) with no need
+    of invalidation. The entries are shared by all the requests and must not
+    be modified.
+    """
+    memory_cache_dict = OrderedDict()
+    size = 0
+
+    # The cache is accessed by the threads of the ORM pool
+    lock = threading.Lock()
+
+    stats = {
+        'hits': 0,
+        'misses': 0,
+        'evictions': 0
+    }
+
+    serializers = {
+        'questionnaire': (models.ArchivedSchema.schema, db_serialize_archived_questionnaire_schema),
+        'preview': (models.ArchivedSchema.preview, db_serialize_archived_preview_schema)
+    }
+
+    @classmethod
+    def get(cls, session, hash, type, language):
+        key = (hash, type, language)
+
+        with cls.lock:
+            entry = cls.memory_cache_dict.pop(key, None)
+            if entry is not None:
+                cls.memory_cache_dict[key] = entry
+                cls.stats['hits'] += 1
+                return entry[0]
+
+            cls.stats['misses'] += 1
+
+        column, serializer = cls.serializers[type]
+
+        schema = session.query(column).filter(models.ArchivedSchema.hash == hash).scalar()
+
+        entry = (serializer(schema, language), len(json.dumps(schema)))
+
+        with cls.lock:
+            if key not in cls.memory_cache_dict and entry[1] <= Settings.archived_schema_cache_size:
+                cls.memory_cache_dict[key] = entry
+                cls.size += entry[1]
+
+                while cls.size > Settings.archived_schema_cache_size:
+                    cls.size -= cls.memory_cache_dict.popitem(last=False)[1][1]
+                    cls.stats['evictions'] += 1
+
+        return entry[0]
+
+    @classmethod
+    def get_questionnaire(cls, session, hash, language):
+        return cls.get(session, hash, 'questionnaire', language)
+
+    @classmethod
+    def get_preview(cls, session, hash, language):
+        return cls.get(session, hash, 'preview', language)
+
+    @classmethod
+    def clear(cls):
+        with cls.lock:
+            cls.memory_cache_dict.clear()
+            cls.size = 0
+
+    @classmethod
+    def get_stats(cls):
+        with cls.lock:
+            ret = dict(cls.stats)
+            lookups = ret['hits'] + ret['misses']
+            ret.update({
+                'entries': len(cls.memory_cache_dict),
+                'size': cls.size,
+                'max_size': Settings.archived_schema_cache_size,
+                'hit_rate': float(ret['hits']) / lookups if lookups else 0.0
+            })
+
+        return ret
+
+
+class QuestionnaireSchemaCache(object):
+    """
+    Cache of the schemas of the questionnaires as archived by the submissions
+
+    Every entry is a tuple (hash, steps) stored by (tid, questionnaire_id).
+    The cache is cleared by the admin handlers changing questionnaires, steps
+    and fields; these changes are serialized with the submissions by the
+    writer transaction so that a submission never uses a stale schema.
+    """
+    memory_cache_dict = {}
+
+    lock = threading.Lock()
+
+    stats = {
+        'hits': 0,
+        'misses': 0
+    }
+
+    @classmethod
+    def get(cls, tid, questionnaire_id):
+        with cls.lock:
+            entry = cls.memory_cache_dict.get((tid, questionnaire_id))
+            cls.stats['hits' if entry is not None else 'misses'] += 1
+
+        return entry
+
+    @classmethod
+    def set(cls, tid, questionnaire_id, questionnaire_hash, steps):
+        with cls.lock:
+            cls.memory_cache_dict[(tid, questionnaire_id)] = (questionnaire_hash, steps)
+
+    @classmethod
+    def invalidate(cls):
+        with cls.lock:
+            cls.memory_cache_dict.clear()
+
+    @classmethod
+    def get_stats(cls):
+        with cls.lock:
+            ret = dict(cls.stats)
+            ret['entries'] = len(cls.memory_cache_dict)
+
+        return ret
+
+
 def db_save_questionnaire_answers(session, tid, internaltip_id, entries):
     ret = []
 
@@ -182,6 +317,27 @@ def db_archive_questionnaire_schema(session, questionnaire):
     return hash
 
 
+def db_get_questionnaire_schema(session, tid, questionnaire_id):
+    """
+    Return the hash and the steps of the schema of a questionnaire archiving
+    it if it has been changed since its last use
+    """
+    from globaleaks.handlers.admin.questionnaire import db_get_questionnaire
+
+    entry = QuestionnaireSchemaCache.get(tid, questionnaire_id)
+    if entry is not None:
+        return entry
+
+    steps = db_get_questionnaire(session, tid, questionnaire_id, None)['steps']
+    questionnaire_hash = db_archive_questionnaire_schema(session, steps)
+
+    # The schema is cached only once archived by a committed transaction
+    if not any(isinstance(obj, models.ArchivedSchema) for obj in session.new):
+        QuestionnaireSchemaCache.set(tid, questionnaire_id, questionnaire_hash, steps)
+
+    return questionnaire_hash, steps
+
+
 def db_get_itip_receiver_list(session, itip):
     ret = []
 
@@ -199,14 +355,13 @@ def db_get_itip_receiver_list(session, itip):
 
 
 def serialize_itip(session, internaltip, language):
-    x = session.query(models.InternalTipAnswers, models.ArchivedSchema) \
-               .filter(models.ArchivedSchema.hash == models.InternalTipAnswers.questionnaire_hash,
-                       models.InternalTipAnswers.internaltip_id == internaltip.id)
+    x = session.query(models.InternalTipAnswers) \
+               .filter(models.InternalTipAnswers.internaltip_id == internaltip.id)
 
     questionnaires = []
-    for ita, aqs in x:
+    for ita in x:
         questionnaires.append({
-            'steps': db_serialize_archived_questionnaire_schema(aqs.schema, language),
+            'steps': ArchivedSchemaCache.get_questionnaire(session, ita.questionnaire_hash, language),
             'answers': ita.answers
         })
 
@@ -265,7 +420,7 @@ def db_create_receivertip(session, receiver, internaltip, can_access_whistleblow
     session.add(receivertip)
 
 
-def db_create_submission(session, tid, request, token, client_using_tor):
+def db_create_submission(session, tid, request, token, client_using_tor, receipt, receipt_hash, wb_key):
     if not request['receivers']:
         raise errors.InputValidationError("need at least one recipient")
 
@@ -279,8 +434,7 @@ def db_create_submission(session, tid, request, token, client_using_tor):
     if not context:
         raise errors.ModelNotFound(models.Context)
 
-    steps = db_get_questionnaire(session, tid, questionnaire.id, None)['steps']
-    questionnaire_hash = db_archive_questionnaire_schema(session, steps)
+    questionnaire_hash, steps = db_get_questionnaire_schema(session, tid, questionnaire.id)
 
     itip = models.InternalTip()
     itip.tid = tid
@@ -339,31 +493,23 @@ def db_create_submission(session, tid, request, token, client_using_tor):
         if crypto_is_available:
             crypto_tip_prv_key, itip.crypto_tip_pub_key = GCE.generate_keypair()
 
-    # Evaluate if the whistleblower tip should be generated
-    if ((not State.tenant_cache[tid].enable_scoring_system) or
-        (context.score_threshold_receipt == 0) or
-        (context.score_threshold_receipt == 1 and itip.total_score >= 2) or
-        (context.score_threshold_receipt == 2 and itip.total_score == 3)):
-        receipt = GCE.generate_receipt()
-        receipt_salt = State.tenant_cache[tid].receipt_salt
+    # The whistleblower tip is generated only if a receipt has been issued
+    if receipt:
         wbtip = models.WhistleblowerTip()
         wbtip.id = itip.id
         wbtip.tid = tid
         wbtip.hash_alg = GCE.HASH
-        wbtip.receipt_hash = GCE.hash_password(receipt, receipt_salt)
+        wbtip.receipt_hash = receipt_hash
 
         # Evaluate if the whistleblower tip should be encrypted
         if crypto_is_available:
             crypto_tip_prv_key, itip.crypto_tip_pub_key = GCE.generate_keypair()
-            wb_key = GCE.derive_key(receipt.encode(), receipt_salt)
             wb_prv_key, wb_pub_key = GCE.generate_keypair()
             wbtip.crypto_prv_key = GCE.symmetric_encrypt(wb_key, wb_prv_key)
             wbtip.crypto_pub_key = wb_pub_key
             wbtip.crypto_tip_prv_key = GCE.asymmetric_encrypt(wb_pub_key, crypto_tip_prv_key)
 
         session.add(wbtip)
-    else:
-        receipt = ''
 
     # Apply special handling to the whistleblower identity question
     if itip.enable_whistleblower_identity and request['identity_provided'] and answers[whistleblower_identity.id]:
@@ -423,9 +569,65 @@ def db_create_submission(session, tid, request, token, client_using_tor):
     }
 
 
+def is_receipt_needed(tid, score_threshold_receipt, total_score):
+    """
+    Evaluate if a receipt should be issued given the score of a submission
+    """
+    return ((not State.tenant_cache[tid].enable_scoring_system) or
+            (score_threshold_receipt == 0) or
+            (score_threshold_receipt == 1 and total_score >= 2) or
+            (score_threshold_receipt == 2 and total_score == 3))
+
+
+@transact_ro
+def get_score_threshold_receipt(session, context_id):
+    x = session.query(models.Context.score_threshold_receipt) \
+               .filter(models.Context.id == context_id).one_or_none()
+
+    return x[0] if x is not None else 0
+
+
 @transact
-def create_submission(session, tid, request, token, client_using_tor):
-    return db_create_submission(session, tid, request, token, client_using_tor)
+def store_submission(session, tid, request, token, client_using_tor, receipt, receipt_hash, wb_key):
+    return db_create_submission(session, tid, request, token, client_using_tor, receipt, receipt_hash, wb_key)
+
+
+@inlineCallbacks
+def create_submission(tid, request, token, client_using_tor):
+    """
+    Create a submission
+
+    The receipt hash and the key of the whistleblower are derived on the kdf
+    thread pool before opening the transaction storing the submission and
+    only if a receipt is issued for the submission.
+    """
+    receipt, receipt_hash, wb_key = '', None, None
+
+    score_threshold_receipt = 0
+    if State.tenant_cache[tid].enable_scoring_system:
+        score_threshold_receipt = yield get_score_threshold_receipt(request['context_id'])
+
+    if is_receipt_needed(tid, score_threshold_receipt, request['total_score']):
+        receipt = GCE.generate_receipt()
+        receipt_salt = State.tenant_cache[tid].receipt_salt
+
+        # The two derivations are scheduled together to be run concurrently
+        dl = [kdf.executor.run(State.kdf_tp, GCE.hash_password, receipt, receipt_salt)]
+        if State.tenant_cache[1].encryption:
+            dl.append(kdf.executor.run(State.kdf_tp, GCE.derive_key, receipt.encode(), receipt_salt))
+
+        d = DeferredList(dl, fireOnOneErrback=True, consumeErrors=True)
+        d.addErrback(lambda failure: failure.value.subFailure)
+
+        results = yield d
+
+        receipt_hash = results[0][1]
+        if len(results) > 1:
+            wb_key = results[1][1]
+
+    ret = yield store_submission(tid, request, token, client_using_tor, receipt, receipt_hash, wb_key)
+
+    returnValue(ret)
 
 
 class SubmissionInstance(BaseHandler):
@@ -7,7 +7,7 @@ from globaleaks import models
 from globaleaks.handlers.admin.modelimgs import db_get_model_img
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.models import get_localized_values
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import errors, requests
 from globaleaks.state import State
 from globaleaks.utils.pgp import PGPContext
@@ -101,7 +101,7 @@ def db_get_user(session, tid, user_id):
     return user
 
 
-@transact
+@transact_ro
 def get_user(session, tid, user_id, language):
     user = db_get_user(session, tid, user_id)
 
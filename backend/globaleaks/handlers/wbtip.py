@@ -11,7 +11,7 @@ from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.rtip import serialize_comment, serialize_message, db_get_itip_comment_list, WBFileHandler
 from globaleaks.handlers.submission import serialize_usertip, \
     db_save_questionnaire_answers, decrypt_tip, \
-    db_set_internaltip_answers, db_get_questionnaire, db_archive_questionnaire_schema, db_set_internaltip_data
+    db_set_internaltip_answers, db_get_questionnaire_schema, db_set_internaltip_data
 from globaleaks.orm import transact
 from globaleaks.rest import errors, requests
 from globaleaks.state import State
@@ -182,8 +182,7 @@ def store_additional_questionnaire_answers(session, tid, tip_id, answers, langua
     if not internaltip.additional_questionnaire_id:
         return
 
-    steps = db_get_questionnaire(session, tid, internaltip.additional_questionnaire_id, None)['steps']
-    questionnaire_hash = db_archive_questionnaire_schema(session, steps)
+    questionnaire_hash, _ = db_get_questionnaire_schema(session, tid, internaltip.additional_questionnaire_id)
 
     db_save_questionnaire_answers(session, tid, internaltip.id, answers)
 
@@ -14,6 +14,7 @@ from globaleaks.handlers.admin.node import db_admin_serialize_node
 from globaleaks.handlers.admin.notification import db_get_notification
 from globaleaks.handlers.file import db_mark_file_for_secure_deletion
 from globaleaks.handlers.rtip import db_delete_itips
+from globaleaks.handlers.submission import QuestionnaireSchemaCache
 from globaleaks.handlers.user import user_serialize_user
 from globaleaks.jobs.job import DailyJob
 from globaleaks.orm import transact
@@ -122,6 +123,9 @@ class Cleaning(DailyJob):
         if hashes:
             session.query(models.ArchivedSchema).filter(not_(models.ArchivedSchema.hash.in_(hashes))).delete(synchronize_session='fetch')
 
+            # the schemas of the questionnaires in use need to be archived again
+            QuestionnaireSchemaCache.invalidate()
+
     @transact
     def get_files_to_secure_delete(self, session):
         return [x[0] for x in session.query(models.SecureFileDelete.filepath)]
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 import os
+import threading
+import time
 
-from twisted.internet import abstract
+from twisted.internet import abstract, defer, reactor
 from twisted.internet.defer import inlineCallbacks
+from twisted.internet.threads import deferToThreadPool
 
 from globaleaks import models
 from globaleaks.jobs.job import LoopingJob
@@ -10,7 +13,7 @@ from globaleaks.orm import transact
 from globaleaks.settings import Settings
 from globaleaks.utils.crypto import generateRandomKey, GCE
 from globaleaks.utils.log import log
-from globaleaks.utils.pgp import PGPContext
+from globaleaks.utils.utility import datetime_now, datetime_null
 
 __all__ = ['Delivery']
 
@@ -74,7 +77,6 @@ def file_delivery_planning(session):
                                         models.ReceiverTip.id == models.WhistleblowerFile.receivertip_id,
                                         models.InternalTip.id == models.ReceiverTip.internaltip_id):
 
-        wbfile.new = False
         whistleblowerfiles_maps[wbfile.id] = {
             'crypto_tip_pub_key': itip.crypto_tip_pub_key,
             'id': wbfile.id,
@@ -84,125 +86,409 @@ def file_delivery_planning(session):
     return receiverfiles_maps, whistleblowerfiles_maps
 
 
-def encrypt_file_with_pgp(state, fd, key, fingerprint, dest_path):
+class PlaintextFileSink(object):
     """
-    Encrypt the file for a specific key
+    Sink writing the plaintext of a file to the filesystem
     """
-    pgpctx = PGPContext(state.settings.tmp_path)
+    def __init__(self, dest_path):
+        self.dest_path = dest_path
+        self.error = None
+        self.fd = open(dest_path, 'a+b')
 
-    pgpctx.load_key(key)
+    def write(self, chunk):
+        self.fd.write(chunk)
 
-    pgpctx.encrypt_file(fingerprint, fd, dest_path)
+    def close(self):
+        self.fd.close()
 
 
-def write_plaintext_file(sf, dest_path):
-    try:
-        with sf.open('rb') as encrypted_file, open(dest_path, "a+b") as plaintext_file:
-            while True:
-                chunk = encrypted_file.read(abstract.FileDescriptor.bufferSize)
-                if not chunk:
-                    break
-                plaintext_file.write(chunk)
+class EncryptedFileSink(object):
+    """
+    Sink encrypting a file with the public key of a tip
+    """
+    def __init__(self, key, dest_path):
+        self.dest_path = dest_path
+        self.error = None
+        self.seo = GCE.streaming_encryption_open('ENCRYPT', key, dest_path)
+        self.chunk = None
+
+    def write(self, chunk):
+        # The last chunk is marked in the stream, so each chunk is
+        # encrypted only once the following one is available
+        if self.chunk is not None:
+            self.seo.encrypt_chunk(self.chunk, 0)
+
+        self.chunk = chunk
+
+    def close(self):
+        try:
+            self.seo.encrypt_chunk(self.chunk if self.chunk is not None else b'', 1)
+        finally:
+            self.seo.close()
+
+
+class PGPFileSink(object):
+    """
+    Sink encrypting a file with the PGP keys of a set of receivers
+
+    The data is fed through a pipe to a single GnuPG process running in a
+    dedicated thread, so that the plaintext can be read once and
+    written to many sinks.
+    """
+    def __init__(self, keyring, fingerprints, dest_path):
+        self.dest_path = dest_path
+        self.error = None
+        self.keyring = keyring
+
+        rfd, wfd = os.pipe()
+        self.input = os.fdopen(rfd, 'rb')
+        self.output = os.fdopen(wfd, 'wb')
+
+        self.thread = threading.Thread(target=self.encrypt, args=(fingerprints,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def encrypt(self, fingerprints):
+        try:
+            self.keyring.encrypt_file(fingerprints, self.input, self.dest_path)
+        except Exception as excep:
+            self.error = excep
+        finally:
+            # Closing the input lets the writer fail instead of blocking
+            # when GnuPG terminated before consuming all the data
+            self.input.close()
+
+    def write(self, chunk):
+        self.output.write(chunk)
+
+    def close(self):
+        try:
+            self.output.close()
+        except Exception:
+            pass
+
+        self.thread.join()
+
+        if self.error is not None:
+            raise self.error
+
+
+def stream_file(sf, sinks):
+    """
+    Read the plaintext of a file once and write it to all the sinks
+
+    A failure of a sink is recorded on the sink itself and does not
+    affect the other sinks.
 
-    except Exception as excep:
-        log.err("Unable to create plaintext file %s: %s", dest_path, excep)
+    @param sf: the SecureTemporaryFile to be read
+    @param sinks: the list of sinks
+    @return: the number of bytes read
+    """
+    size = 0
+    active = list(sinks)
+
+    with sf.open('rb') as plaintext_file:
+        while active:
+            chunk = plaintext_file.read(abstract.FileDescriptor.bufferSize)
+            if not chunk:
+                break
+
+            size += len(chunk)
+
+            for sink in list(active):
+                try:
+                    sink.write(chunk)
+                except Exception as excep:
+                    sink.error = excep
+                    active.remove(sink)
+
+    for sink in sinks:
+        try:
+            sink.close()
+        except Exception as excep:
+            if sink.error is None:
+                sink.error = excep
+
+        if sink.error is not None:
+            log.err("Unable to create file %s: %s", sink.dest_path, sink.error)
 
+    return size
 
-def write_encrypted_file(key, sf, dest_path):
+
+def process_receiverfile(receiverfiles_map, sf, allow_unencrypted, keyring):
+    """
+    Create on the filesystem the files of the receivers of an InternalFile
+
+    All the receivers having a PGP key share a single file encrypted
+    for all of their keys.
+
+    @param receiverfiles_map: the mapping of the ifile/rfiles to be created
+    @param sf: the SecureTemporaryFile holding the uploaded file
+    @param allow_unencrypted: a boolean telling if plaintext files are allowed
+    @param keyring: the PGPKeyring used to encrypt the files
+    @return: the number of bytes processed
+    """
+    key = receiverfiles_map['crypto_tip_pub_key']
+    filename = receiverfiles_map['filename']
+    filecode = filename.split('.')[0]
+    plaintext_name = "%s.plain" % filecode
+    encrypted_name = "%s.encrypted" % filecode
+    plaintext_path = os.path.abspath(os.path.join(Settings.attachments_path, plaintext_name))
+    encrypted_path = os.path.abspath(os.path.join(Settings.attachments_path, encrypted_name))
+
+    sinks = []
+    pgp_rfiles = []
+    pinned = []
+
+    if key:
+        receiverfiles_map['filename'] = encrypted_name
+        for rf in receiverfiles_map['rfiles']:
+            rf['filename'] = encrypted_name
+
+        sinks.append(EncryptedFileSink(key, encrypted_path))
+    else:
+        for rcounter, rfileinfo in enumerate(receiverfiles_map['rfiles']):
+            if rfileinfo['receiver']['pgp_key_public']:
+                try:
+                    k = keyring.load_key(rfileinfo['receiver']['pgp_key_public'])
+                    pinned.append(k['fingerprint'])
+
+                    if datetime_null() < k['expiration'] < datetime_now():
+                        raise Exception("expired key")
+
+                    pgp_rfiles.append((rcounter, rfileinfo, k['fingerprint']))
+                except Exception as excep:
+                    log.err("%d# Unable to complete PGP encrypt for %s on %s: %s. marking the file as unavailable.",
+                            rcounter, rfileinfo['receiver']['name'], rfileinfo['filename'], excep)
+                    rfileinfo['status'] = u'unavailable'
+            elif allow_unencrypted:
+                receiverfiles_map['plaintext_file_needed'] = True
+                rfileinfo['filename'] = plaintext_name
+                rfileinfo['status'] = u'reference'
+            else:
+                rfileinfo['status'] = u'nokey'
+
+    # The keys loaded stay pinned in the keyring until the file is encrypted
     try:
-        with sf.open('rb') as encrypted_file, \
-             GCE.streaming_encryption_open('ENCRYPT', key, dest_path) as seo:
-            chunk = encrypted_file.read(abstract.FileDescriptor.bufferSize)
-            while True:
-                x = encrypted_file.read(abstract.FileDescriptor.bufferSize)
-                if not x:
-                    seo.encrypt_chunk(chunk, 1)
-                    break
+        if pgp_rfiles:
+            pgp_name = "pgp_encrypted-%s" % generateRandomKey(16)
+            pgp_path = os.path.abspath(os.path.join(Settings.attachments_path, pgp_name))
+            pgp_sink = PGPFileSink(keyring, [x[2] for x in pgp_rfiles], pgp_path)
+            sinks.append(pgp_sink)
+
+            for _, rfileinfo, _ in pgp_rfiles:
+                rfileinfo['filename'] = pgp_name
+                rfileinfo['status'] = u'encrypted'
+
+        if receiverfiles_map['plaintext_file_needed']:
+            plaintext_sink = PlaintextFileSink(plaintext_path)
+            sinks.append(plaintext_sink)
+
+        size = stream_file(sf, sinks)
+    finally:
+        for fingerprint in pinned:
+            keyring.release_key(fingerprint)
+
+    if key:
+        if sinks[0].error is not None:
+            raise sinks[0].error
+
+        return size
+
+    if pgp_rfiles and pgp_sink.error is not None:
+        for rcounter, rfileinfo, _ in pgp_rfiles:
+            log.err("%d# Unable to complete PGP encrypt for %s on %s: %s. marking the file as unavailable.",
+                    rcounter, rfileinfo['receiver']['name'], rfileinfo['filename'], pgp_sink.error)
+            rfileinfo['status'] = u'unavailable'
+
+    if receiverfiles_map['plaintext_file_needed'] and plaintext_sink.error is not None:
+        for rfileinfo in receiverfiles_map['rfiles']:
+            if rfileinfo['status'] == u'reference':
+                rfileinfo['status'] = u'unavailable'
+
+    return size
+
+
+def process_whistleblowerfile(whistleblowerfiles_map, sf):
+    """
+    Create on the filesystem the file of a WhistleblowerFile
+
+    @param whistleblowerfiles_map: the descriptor of the file to be created
+    @param sf: the SecureTemporaryFile holding the uploaded file
+    @return: the number of bytes processed
+    """
+    key = whistleblowerfiles_map['crypto_tip_pub_key']
+    filename = whistleblowerfiles_map['filename']
+    filecode = filename.split('.')[0]
+    plaintext_name = "%s.plain" % filecode
+    encrypted_name = "%s.encrypted" % filecode
+    plaintext_path = os.path.abspath(os.path.join(Settings.attachments_path, plaintext_name))
+    encrypted_path = os.path.abspath(os.path.join(Settings.attachments_path, encrypted_name))
+
+    if key:
+        whistleblowerfiles_map['filename'] = encrypted_name
+        sink = EncryptedFileSink(key, encrypted_path)
+    else:
+        whistleblowerfiles_map['filename'] = plaintext_name
+        sink = PlaintextFileSink(plaintext_path)
+
+    size = stream_file(sf, [sink])
+
+    if sink.error is not None:
+        # The partial file is removed so that the delivery can be retried
+        try:
+            os.remove(sink.dest_path)
+        except OSError:
+            pass
 
-                seo.encrypt_chunk(chunk, 0)
+        raise sink.error  # pylint: disable=raising-bad-type
 
-                chunk = x
-    except Exception as excep:
-        log.err("Unable to create plaintext file %s: %s", dest_path, excep)
+    return size
+
+
+class DeliveryExecutor(object):
+    """
+    Executor running the file deliveries on a dedicated thread pool
+
+    The executor keeps track of the number of files waiting for a worker
+    and of the throughput of the deliveries.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.queued = 0
+            self.running = 0
+            self.files = 0
+            self.bytes = 0
+            self.time = 0.0
+            self.last_throughput = 0.0
+
+    def run(self, thread_pool, function, *args):
+        with self.lock:
+            self.queued += 1
+
+        return deferToThreadPool(reactor, thread_pool, self._run, function, *args)
+
+    def _run(self, function, *args):
+        with self.lock:
+            self.queued -= 1
+            self.running += 1
+
+        start = time.time()
+        size = 0
+
+        try:
+            size = function(*args)
+        finally:
+            elapsed = time.time() - start
+            throughput = size / elapsed if elapsed > 0 else 0.0
+
+            with self.lock:
+                self.running -= 1
+                self.files += 1
+                self.bytes += size
+                self.time += elapsed
+                self.last_throughput = throughput
+
+            log.debug("Delivered file of %d bytes in %.3f seconds (%.0f B/s)", size, elapsed, throughput)
+
+        return size
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'queued': self.queued,
+                'running': self.running,
+                'files': self.files,
+                'bytes': self.bytes,
+                'time': self.time,
+                'throughput': self.bytes / self.time if self.time > 0 else 0.0,
+                'last_throughput': self.last_throughput
+            }
+
+
+executor = DeliveryExecutor()
+
+
+def gather_results(ids, dl):
+    """
+    @return: a deferred returning the list of the tuples (id, success, result)
+             of the processing of every file
+    """
+    return defer.DeferredList(dl, consumeErrors=True).addCallback(
+        lambda results: [(id, success, result) for id, (success, result) in zip(ids, results)])
 
 
 def process_receiverfiles(state, receiverfiles_maps):
     """
     @param receiverfiles_maps: the mapping of ifile/rfiles to be created on filesystem
-    @return: return None
+    @return: a deferred returning the outcome of the processing of every ifile
     """
+    ids = []
+    dl = []
+
     for id, receiverfiles_map in receiverfiles_maps.items():
-        key = receiverfiles_map['crypto_tip_pub_key']
-        filename = receiverfiles_map['filename']
-        filecode = filename.split('.')[0]
-        plaintext_name = "%s.plain" % filecode
-        encrypted_name = "%s.encrypted" % filecode
-        plaintext_path = os.path.abspath(os.path.join(Settings.attachments_path, plaintext_name))
-        encrypted_path = os.path.abspath(os.path.join(Settings.attachments_path, encrypted_name))
-
-        sf = state.get_tmp_file_by_name(filename)
-
-        if key:
-            receiverfiles_map['filename'] = encrypted_name
-            write_encrypted_file(key, sf, encrypted_path)
-            for rf in receiverfiles_map['rfiles']:
-                rf['filename'] = encrypted_name
-        else:
-            for rcounter, rfileinfo in enumerate(receiverfiles_map['rfiles']):
-                with sf.open('rb') as encrypted_file:
-                    if rfileinfo['receiver']['pgp_key_public']:
-                        try:
-                            pgp_name = "pgp_encrypted-%s" % generateRandomKey(16)
-                            pgp_path = os.path.abspath(os.path.join(Settings.attachments_path, pgp_name))
-                            encrypt_file_with_pgp(state,
-                                                  encrypted_file,
-                                                  rfileinfo['receiver']['pgp_key_public'],
-                                                  rfileinfo['receiver']['pgp_key_fingerprint'],
-                                                  pgp_path)
-                            rfileinfo['filename'] = pgp_name
-                            rfileinfo['status'] = u'encrypted'
-                        except Exception as excep:
-                            log.err("%d# Unable to complete PGP encrypt for %s on %s: %s. marking the file as unavailable.",
-                                    rcounter, rfileinfo['receiver']['name'], rfileinfo['filename'], excep)
-                            rfileinfo['status'] = u'unavailable'
-                    elif state.tenant_cache[receiverfiles_map['tid']].allow_unencrypted:
-                        receiverfiles_map['plaintext_file_needed'] = True
-                        rfileinfo['filename'] = plaintext_name
-                        rfileinfo['status'] = u'reference'
-                    else:
-                        rfileinfo['status'] = u'nokey'
+        sf = state.get_tmp_file_by_name(receiverfiles_map['filename'])
+        allow_unencrypted = state.tenant_cache[receiverfiles_map['tid']].allow_unencrypted
+        ids.append(id)
+        dl.append(executor.run(state.delivery_tp, process_receiverfile, receiverfiles_map, sf, allow_unencrypted, state.pgp_keyring))
 
-        if receiverfiles_map['plaintext_file_needed']:
-            write_plaintext_file(sf, plaintext_path)
+    return gather_results(ids, dl)
+
+
+def restore_tmp_file(failure, state, whistleblowerfiles_map, sf):
+    """
+    Put back the temporary file of a whistleblower file whose processing
+    failed so that it is retried at the next run
+    """
+    state.TempUploadFiles.set(os.path.basename(sf.filepath), sf)
+    whistleblowerfiles_map['retry'] = True
+    return failure
 
 
 def process_whistleblowerfiles(state, whistleblowerfiles_maps):
     """
     @param whistleblowerfiles_maps: descriptos of whistleblower files to be processed
-    @return: return None
+    @return: a deferred returning the outcome of the processing of every file
     """
+    ids = []
+    dl = []
+
     for id, whistleblowerfiles_map in whistleblowerfiles_maps.items():
-        key = whistleblowerfiles_map['crypto_tip_pub_key']
-        filename = whistleblowerfiles_map['filename']
-        filecode = filename.split('.')[0]
-        plaintext_name = "%s.plain" % filecode
-        encrypted_name = "%s.encrypted" % filecode
-        plaintext_path = os.path.abspath(os.path.join(Settings.attachments_path, plaintext_name))
-        encrypted_path = os.path.abspath(os.path.join(Settings.attachments_path, encrypted_name))
-
-        sf = state.get_tmp_file_by_name(filename)
-
-        if key:
-            whistleblowerfiles_map['filename'] = encrypted_name
-            write_encrypted_file(key, sf, encrypted_path)
-        else:
-            whistleblowerfiles_map['filename'] = plaintext_name
-            write_plaintext_file(sf, plaintext_path)
+        sf = state.get_tmp_file_by_name(whistleblowerfiles_map['filename'])
+        whistleblowerfiles_map['retry'] = False
+        ids.append(id)
+
+        d = executor.run(state.delivery_tp, process_whistleblowerfile, whistleblowerfiles_map, sf)
+        if sf is not None:
+            d.addErrback(restore_tmp_file, state, whistleblowerfiles_map, sf)
+
+        dl.append(d)
+
+    return gather_results(ids, dl)
 
 
 @transact
-def update_receiverfiles(session, receiverfiles_maps):
+def update_receiverfiles(session, receiverfiles_maps, failed_ids):
+    """
+    Store the outcome of the delivery of the files of the receivers
+
+    The files of the ifiles whose processing failed are marked as
+    unavailable keeping the reference to the original upload.
+    """
+    for id in failed_ids:
+        for rf in receiverfiles_maps[id]['rfiles']:
+            rfile = session.query(models.ReceiverFile).filter(models.ReceiverFile.id == rf['id']).one_or_none()
+            if rfile is not None:
+                rfile.status = u'unavailable'
+
     for id, receiverfiles_map in receiverfiles_maps.items():
+        if id in failed_ids:
+            continue
+
         ifile = session.query(models.InternalFile).filter(models.InternalFile.id == id).one_or_none()
         if ifile is None:
             continue
@@ -218,11 +504,26 @@ def update_receiverfiles(session, receiverfiles_maps):
 
 
 @transact
-def update_whistleblowerfiles(session, whistleblowerfiles_maps):
+def update_whistleblowerfiles(session, whistleblowerfiles_maps, failed_ids):
+    """
+    Store the outcome of the delivery of the files of the whistleblowers
+
+    The files failed are left new in order to be retried at the next run
+    unless their temporary file is not available anymore.
+    """
     for id, whistleblowerfiles_map in whistleblowerfiles_maps.items():
+        if id in failed_ids and whistleblowerfiles_map['retry']:
+            continue
+
         wbfile = session.query(models.WhistleblowerFile).filter(models.WhistleblowerFile.id == id).one_or_none()
-        if wbfile is not None:
-            wbfile.new = False
+        if wbfile is None:
+            continue
+
+        wbfile.new = False
+
+        if id in failed_ids:
+            log.err("Unable to deliver the whistleblower file %s: the uploaded file is not available", wbfile.name)
+        else:
             wbfile.filename = whistleblowerfiles_map['filename']
 
 
@@ -236,10 +537,23 @@ class Delivery(LoopingJob):
         This function creates receiver files
         """
         receiverfiles_maps, whistleblowerfiles_maps = yield file_delivery_planning()
+
+        # Files are all handed to the delivery workers before waiting
+        # for any of them so that the reactor is never blocked
+        # and the whistleblower files do not wait for the receiver ones
+        rfiles_d = process_receiverfiles(self.state, receiverfiles_maps)
+        wbfiles_d = process_whistleblowerfiles(self.state, whistleblowerfiles_maps)
+
+        # Only the files processed successfully are stored with their new
+        # names while the ones failed are never referenced
+        rfiles_results = yield rfiles_d
         if receiverfiles_maps:
-            process_receiverfiles(self.state, receiverfiles_maps)
-            yield update_receiverfiles(receiverfiles_maps)
+            yield update_receiverfiles(receiverfiles_maps, set(id for id, success, _ in rfiles_results if not success))
 
+        wbfiles_results = yield wbfiles_d
         if whistleblowerfiles_maps:
-            process_whistleblowerfiles(self.state, whistleblowerfiles_maps)
-            yield update_whistleblowerfiles(whistleblowerfiles_maps)
+            yield update_whistleblowerfiles(whistleblowerfiles_maps, set(id for id, success, _ in wbfiles_results if not success))
+
+        for _, success, result in rfiles_results + wbfiles_results:
+            if not success:
+                result.raiseException()
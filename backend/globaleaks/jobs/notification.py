@@ -1,20 +1,24 @@
 # -*- coding: utf-8 -*-
 # Implement the notification of new submissions
-import copy
+import time
 
+from datetime import timedelta
+
+from sqlalchemy import func, or_
 from twisted.internet import defer
 
 from globaleaks import models
-from globaleaks.handlers.admin.context import admin_serialize_context
 from globaleaks.handlers.admin.node import db_admin_serialize_node
 from globaleaks.handlers.admin.notification import db_get_notification
-from globaleaks.handlers.rtip import serialize_rtip, serialize_message, serialize_comment
-from globaleaks.handlers.user import user_serialize_user
+from globaleaks.handlers.submission import ArchivedSchemaCache
 from globaleaks.jobs.job import LoopingJob
+from globaleaks.models import get_localized_values
+from globaleaks.models.serializers import serialize_ifile
 from globaleaks.orm import transact
+from globaleaks.settings import Settings
 from globaleaks.utils.log import log
-from globaleaks.utils.pgp import PGPContext
 from globaleaks.utils.templating import Templating
+from globaleaks.utils.utility import datetime_now, datetime_to_ISO8601
 
 
 trigger_template_map = {
@@ -37,10 +41,38 @@ def gen_cache_key(*args):
     return '-'.join(['{}'.format(arg) for arg in args])
 
 
+def serialize_user(user):
+    return {
+        'id': user.id,
+        'name': user.name,
+        'language': user.language,
+        'mail_address': user.mail_address,
+        'pgp_key_public': user.pgp_key_public
+    }
+
+
+def serialize_event(obj):
+    return {
+        'id': obj.id,
+        'type': obj.type,
+        'creation_date': datetime_to_ISO8601(obj.creation_date),
+        'content': obj.content
+    }
+
+
 class MailGenerator(object):
+    """
+    Generate the mails of the pending notification triggers
+
+    The triggers of each type are loaded together with their users,
+    contexts and tips with a single query, and only the data referenced
+    by the mail templates is serialized.
+    """
     def __init__(self, state):
         self.state = state
         self.cache = {}
+        self.answers = {}
+        self.stats = {}
 
     def serialize_config(self, session, key, tid, language):
         cache_key = gen_cache_key(key, tid, language)
@@ -56,101 +88,95 @@ class MailGenerator(object):
 
         return self.cache[cache_key]
 
-    def serialize_obj(self, session, key, obj, tid, language):
-        obj_id = obj.id
-
-        cache_key = gen_cache_key(key, tid, obj_id, language)
-        cache_obj = None
+    def serialize_context(self, context, language):
+        cache_key = gen_cache_key('context', context.id, language)
 
         if cache_key not in self.cache:
-            if key == 'user':
-                cache_obj = user_serialize_user(session, obj, language)
-            elif key == 'context':
-                cache_obj = admin_serialize_context(session, obj, language)
-            elif key == 'tip':
-                itip = session.query(models.InternalTip).filter(models.InternalTip.id == obj.internaltip_id).one()
-                cache_obj = serialize_rtip(session, obj, itip, language)
-            elif key == 'message':
-                cache_obj = serialize_message(session, obj)
-            elif key == 'comment':
-                cache_obj = serialize_comment(session, obj)
-            elif key == 'file':
-                cache_obj = models.serializers.serialize_ifile(session, obj)
-
-            self.cache[cache_key] = cache_obj
+            self.cache[cache_key] = get_localized_values({'id': context.id}, context, ['name'], language)
 
         return self.cache[cache_key]
 
-    def process_ReceiverTip(self, session, rtip, data):
-        user, context = session.query(models.User, models.Context) \
-                               .filter(models.User.id == rtip.receiver_id,
-                                       models.InternalTip.id == rtip.internaltip_id,
-                                       models.Context.id == models.InternalTip.context_id).one()
+    def serialize_tip(self, session, rtip, itip, language):
+        cache_key = gen_cache_key('tip', rtip.id, language)
 
-        tid = context.tid
-
-        data['user'] = self.serialize_obj(session, 'user', user, tid, user.language)
-        data['tip'] = self.serialize_obj(session, 'tip', rtip, tid, user.language)
-        data['context'] = self.serialize_obj(session, 'context', context, tid, user.language)
+        if cache_key not in self.cache:
+            self.cache[cache_key] = {
+                'id': rtip.id,
+                'internaltip_id': itip.id,
+                'progressive': itip.progressive,
+                'label': rtip.label,
+                'creation_date': datetime_to_ISO8601(itip.creation_date),
+                'enable_notifications': bool(rtip.enable_notifications),
+                'questionnaires': [{
+                    'steps': ArchivedSchemaCache.get_questionnaire(session, hash, language),
+                    'answers': answers
+                } for hash, answers in self.answers.get(itip.id, [])]
+            }
 
-        self.process_mail_creation(session, tid, data)
+        return self.cache[cache_key]
 
-    def process_Message(self, session, message, data):
-        # if the message was created by a receiver do not generate mails
-        if message.type == u"receiver":
+    def db_load_answers(self, session, itips_ids):
+        itips_ids = set(itips_ids) - set(self.answers)
+        if not itips_ids:
             return
 
-        user, context, rtip = session.query(models.User, models.Context, models.ReceiverTip) \
-                                     .filter(models.User.id == models.ReceiverTip.receiver_id,
-                                             models.ReceiverTip.id == message.receivertip_id,
-                                             models.Context.id == models.InternalTip.context_id,
-                                             models.InternalTip.id == models.ReceiverTip.internaltip_id).one()
-
-        tid = context.tid
-
-        data['user'] = self.serialize_obj(session, 'user', user, tid, user.language)
-        data['tip'] = self.serialize_obj(session, 'tip', rtip, tid, user.language)
-        data['context'] = self.serialize_obj(session, 'context', context, tid, user.language)
-        data['message'] = self.serialize_obj(session, 'message', message, tid, user.language)
-
-        self.process_mail_creation(session, tid, data)
-
-    def process_Comment(self, session, comment, data):
-        for user, context, rtip in session.query(models.User, models.Context, models.ReceiverTip) \
-                                          .filter(models.User.id == models.ReceiverTip.receiver_id,
-                                                  models.ReceiverTip.internaltip_id == comment.internaltip_id,
-                                                  models.Context.id == models.InternalTip.context_id,
-                                                  models.InternalTip.id == comment.internaltip_id,
-                                                  models.ReceiverTip.internaltip_id == comment.internaltip_id,
-                                                  models.ReceiverTip.receiver_id != comment.author_id):
-            tid = context.tid
-
-            umsg = copy.deepcopy(data)
-            umsg['user'] = self.serialize_obj(session, 'user', user, tid, user.language)
-            umsg['tip'] = self.serialize_obj(session, 'tip', rtip, tid, user.language)
-            umsg['context'] = self.serialize_obj(session, 'context', context, tid, user.language)
-            umsg['comment'] = self.serialize_obj(session, 'comment', comment, tid, user.language)
-
-            self.process_mail_creation(session, tid, umsg)
-
-    def process_ReceiverFile(self, session, rfile, data):
-        user, context, rtip, ifile = session.query(models.User, models.Context, models.ReceiverTip, models.InternalFile) \
-                                            .filter(models.User.id == models.ReceiverTip.receiver_id,
-                                                    models.InternalFile.id == rfile.internalfile_id,
-                                                    models.InternalFile.submission == False,
-                                                    models.InternalTip.id == models.InternalFile.internaltip_id,
-                                                    models.ReceiverTip.id == rfile.receivertip_id,
-                                                    models.Context.id == models.InternalTip.context_id).one()
-
-        tid = context.tid
-
-        data['user'] = self.serialize_obj(session, 'user', user, tid, user.language)
-        data['tip'] = self.serialize_obj(session, 'tip', rtip, tid, user.language)
-        data['user'] = self.serialize_obj(session, 'user', user, tid, user.language)
-        data['context'] = self.serialize_obj(session, 'context', context, tid, user.language)
-        data['file'] = self.serialize_obj(session, 'file', ifile, tid, user.language)
-
-        self.process_mail_creation(session, tid, data)
+        for itip_id, hash, answers in session.query(models.InternalTipAnswers.internaltip_id,
+                                                    models.InternalTipAnswers.questionnaire_hash,
+                                                    models.InternalTipAnswers.answers) \
+                                             .filter(models.InternalTipAnswers.internaltip_id.in_(itips_ids)):
+            self.answers.setdefault(itip_id, []).append((hash, answers))
+
+    def db_load_ReceiverTip(self, session):
+        # the tip is itself the trigger
+        return session.query(models.ReceiverTip, models.ReceiverTip, models.InternalTip, models.User, models.Context) \
+                      .filter(models.ReceiverTip.new == True,
+                              models.InternalTip.id == models.ReceiverTip.internaltip_id,
+                              models.User.id == models.ReceiverTip.receiver_id,
+                              models.Context.id == models.InternalTip.context_id)
+
+    def db_load_Message(self, session):
+        # if the message was created by a receiver do not generate mails
+        return session.query(models.Message, models.ReceiverTip, models.InternalTip, models.User, models.Context) \
+                      .filter(models.Message.new == True,
+                              models.Message.type != u'receiver',
+                              models.ReceiverTip.id == models.Message.receivertip_id,
+                              models.InternalTip.id == models.ReceiverTip.internaltip_id,
+                              models.User.id == models.ReceiverTip.receiver_id,
+                              models.Context.id == models.InternalTip.context_id)
+
+    def db_load_Comment(self, session):
+        # the author of a comment is not notified about it
+        return session.query(models.Comment, models.ReceiverTip, models.InternalTip, models.User, models.Context) \
+                      .filter(models.Comment.new == True,
+                              models.ReceiverTip.internaltip_id == models.Comment.internaltip_id,
+                              or_(models.Comment.author_id == None,
+                                  models.ReceiverTip.receiver_id != models.Comment.author_id),
+                              models.InternalTip.id == models.Comment.internaltip_id,
+                              models.User.id == models.ReceiverTip.receiver_id,
+                              models.Context.id == models.InternalTip.context_id)
+
+    def db_load_ReceiverFile(self, session):
+        return session.query(models.InternalFile, models.ReceiverTip, models.InternalTip, models.User, models.Context) \
+                      .filter(models.ReceiverFile.new == True,
+                              models.InternalFile.id == models.ReceiverFile.internalfile_id,
+                              models.InternalFile.submission == False,
+                              models.ReceiverTip.id == models.ReceiverFile.receivertip_id,
+                              models.InternalTip.id == models.ReceiverTip.internaltip_id,
+                              models.User.id == models.ReceiverTip.receiver_id,
+                              models.Context.id == models.InternalTip.context_id)
+
+    def db_silence_tenants(self, session, tids):
+        """
+        Mark as notified the triggers of the tenants with notifications disabled
+        """
+        itips_ids = session.query(models.InternalTip.id).filter(models.InternalTip.tid.in_(tids)).subquery()
+        rtips_ids = session.query(models.ReceiverTip.id).filter(models.ReceiverTip.internaltip_id.in_(itips_ids)).subquery()
+
+        for model, condition in [(models.ReceiverTip, models.ReceiverTip.internaltip_id.in_(itips_ids)),
+                                 (models.Comment, models.Comment.internaltip_id.in_(itips_ids)),
+                                 (models.Message, models.Message.receivertip_id.in_(rtips_ids)),
+                                 (models.ReceiverFile, models.ReceiverFile.receivertip_id.in_(rtips_ids))]:
+            session.query(model).filter(model.new == True, condition).update({'new': False}, synchronize_session=False)
 
     def process_mail_creation(self, session, tid, data):
         user_id = data['user']['id']
@@ -158,7 +184,7 @@ class MailGenerator(object):
         # Do not spool emails if the receiver has opted out of ntfns for this tip.
         if not data['tip']['enable_notifications']:
             log.debug("Discarding emails for %s due to receiver's preference.", user_id)
-            return
+            return False
 
         # https://github.com/globaleaks/GlobaLeaks/issues/798
         # TODO: the current solution is global and configurable only by the admin
@@ -166,7 +192,7 @@ class MailGenerator(object):
         if sent_emails >= self.state.tenant_cache[tid].notification.notification_threshold_per_hour:
             log.debug("Discarding emails for receiver %s due to threshold already exceeded for the current hour",
                       user_id)
-            return
+            return False
 
         self.state.increment_mail_counter(user_id)
         if sent_emails >= self.state.tenant_cache[tid].notification.notification_threshold_per_hour:
@@ -191,9 +217,7 @@ class MailGenerator(object):
 
         # If the receiver has encryption enabled encrypt the mail body
         if data['user']['pgp_key_public']:
-            pgpctx = PGPContext(self.state.settings.tmp_path)
-            fingerprint = pgpctx.load_key(data['user']['pgp_key_public'])['fingerprint']
-            body = pgpctx.encrypt_message(fingerprint, body)
+            body = self.state.pgp_keyring.encrypt_message_with_key(data['user']['pgp_key_public'], body)
 
         session.add(models.Mail({
             'address': data['user']['mail_address'],
@@ -202,43 +226,127 @@ class MailGenerator(object):
             'tid': tid,
         }))
 
+        return True
+
+    def db_process_trigger(self, session, trigger):
+        model = trigger_model_map[trigger]
+        key = trigger_template_map[trigger]
+
+        triggers = getattr(self, 'db_load_%s' % trigger)(session).all()
+
+        # All the pending triggers, including the ones not requiring
+        # any mail, are marked as notified with a single statement
+        count = session.query(model).filter(model.new == True).update({'new': False}, synchronize_session=False)
+
+        self.db_load_answers(session, [itip.id for _, _, itip, _, _ in triggers])
+
+        mails = 0
+        for obj, rtip, itip, user, context in triggers:
+            tid = context.tid
+            language = user.language
+
+            data = {
+                'type': key,
+                'user': serialize_user(user),
+                'tip': self.serialize_tip(session, rtip, itip, language),
+                'context': self.serialize_context(context, language)
+            }
+
+            if trigger == 'ReceiverFile':
+                data['file'] = serialize_ifile(session, obj)
+            elif trigger != 'ReceiverTip':
+                data[key] = serialize_event(obj)
+
+            if self.process_mail_creation(session, tid, data):
+                mails += 1
+
+        return count, mails
+
     @transact
     def generate(self, session):
+        silent_tids = []
+        for tid, cache_item in self.state.tenant_cache.items():
+            if cache_item.notification.disable_receiver_notification_emails:
+                silent_tids.append(tid)
+
+        if silent_tids:
+            self.db_silence_tenants(session, silent_tids)
+
         for trigger in ['ReceiverTip', 'Comment', 'Message', 'ReceiverFile']:
-            model = trigger_model_map[trigger]
+            start = time.time()
+
+            count, mails = self.db_process_trigger(session, trigger)
+
+            self.stats[trigger] = {
+                'count': count,
+                'mails': mails,
+                'time': time.time() - start
+            }
+
+            if count:
+                log.debug("Generated %d mails for %d %s triggers in %.3f seconds",
+                          mails, count, trigger, self.stats[trigger]['time'])
+
+        return self.stats
+
+
+class MailSpooler(object):
+    """
+    Keeps track of the length of the mail queue and of the send latency
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0
+        self.time = 0.0
+        self.last_latency = 0.0
+
+    def record(self, sent, failed, elapsed):
+        self.sent += sent
+        self.failed += failed
+        self.time += elapsed
+        self.last_latency = elapsed / (sent + failed) if sent + failed else 0.0
 
-            silent_tids = []
-            for tid, cache_item in self.state.tenant_cache.items():
-                if cache_item.notification.disable_receiver_notification_emails:
-                    silent_tids.append(tid)
+    def get_stats(self):
+        attempts = self.sent + self.failed
 
-            if silent_tids:
-                for x in session.query(models.ReceiverTip).filter(models.ReceiverTip.internaltip_id == models.InternalTip.id,
-                                                                  models.InternalTip.tid.in_(silent_tids)):
-                    x.new = False
+        return {
+            'queued': self.queued,
+            'sent': self.sent,
+            'failed': self.failed,
+            'latency': self.time / attempts if attempts else 0.0,
+            'last_latency': self.last_latency
+        }
 
-                for x in session.query(models.Comment).filter(models.Comment.internaltip_id == models.InternalTip.id,
-                                                              models.InternalTip.tid.in_(silent_tids)):
-                    x.new = False
 
-                for x in session.query(models.Message).filter(models.Message.receivertip_id == models.ReceiverTip.id,
-                                                              models.ReceiverTip.internaltip_id == models.InternalTip.id,
-                                                              models.InternalTip.tid.in_(silent_tids)):
-                    x.new = False
+class MailGeneration(object):
+    """
+    Keeps track of the triggers processed and of the mails generated for
+    every type of trigger
+    """
+    def __init__(self):
+        self.reset()
 
-                for x in session.query(models.ReceiverFile).filter(models.ReceiverFile.receivertip_id == models.ReceiverTip.id,
-                                                                   models.ReceiverTip.internaltip_id == models.InternalTip.id,
-                                                                   models.InternalTip.tid.in_(silent_tids)):
-                    x.new = False
+    def reset(self):
+        self.triggers = {}
 
-            for element in session.query(model).filter(model.new == True):
-                element.new = False
+    def record(self, stats):
+        for trigger, x in stats.items():
+            y = self.triggers.setdefault(trigger, {'count': 0, 'mails': 0, 'time': 0.0, 'last_time': 0.0})
+            y['count'] += x['count']
+            y['mails'] += x['mails']
+            y['time'] += x['time']
+            y['last_time'] = x['time']
 
-                data = {
-                    'type': trigger_template_map[trigger]
-                }
+    def get_stats(self):
+        return {trigger: dict(x) for trigger, x in self.triggers.items()}
 
-                getattr(self, 'process_%s' % trigger)(session, element, data)
+
+spooler = MailSpooler()
+generation = MailGeneration()
 
 
 @transact
@@ -247,13 +355,26 @@ def delete_sent_mails(session, mail_ids):
 
 
 @transact
-def get_mails_from_the_pool(session):
+def postpone_failed_mails(session, mail_ids):
+    now = datetime_now()
+
+    for mail in session.query(models.Mail).filter(models.Mail.id.in_(mail_ids)):
+        mail.processing_attempts += 1
+        delay = min(Settings.notification_backoff * 2 ** (mail.processing_attempts - 1),
+                    Settings.notification_backoff_limit)
+        mail.next_attempt = now + timedelta(seconds=delay)
+
+
+@transact
+def get_mails_from_the_pool(session, limit):
     session.query(models.Mail).filter(models.Mail.processing_attempts > 9).delete(synchronize_session='fetch')
-    session.query(models.Mail).update({'processing_attempts': models.Mail.processing_attempts + 1})
 
     ret = []
 
-    for mail in session.query(models.Mail).order_by(models.Mail.creation_date):
+    for mail in session.query(models.Mail) \
+                       .filter(models.Mail.next_attempt <= datetime_now()) \
+                       .order_by(models.Mail.next_attempt) \
+                       .limit(limit):
         ret.append({
             'id': mail.id,
             'address': mail.address,
@@ -262,33 +383,50 @@ def get_mails_from_the_pool(session):
             'tid': mail.tid
         })
 
-    return ret
+    return ret, session.query(func.count(models.Mail.id)).scalar()
 
 
 class Notification(LoopingJob):
     interval = 5
     monitor_interval = 3 * 60
-    mails_to_delete = []
+
+    def sendmail(self, tid, mails):
+        return self.state.sendmail_batch(tid, mails)
 
     @defer.inlineCallbacks
-    def sendmail(self, mail):
-        success = yield self.state.sendmail(mail['tid'], mail['address'], mail['subject'], mail['body'])
-        if success:
-            self.mails_to_delete.append(mail['id'])
+    def send_batch(self, tid, mails):
+        start = time.time()
+
+        results = yield self.sendmail(tid, mails)
+
+        sent = [mail['id'] for mail in mails if results.get(mail['id'])]
+        failed = [mail['id'] for mail in mails if not results.get(mail['id'])]
+
+        if sent:
+            yield delete_sent_mails(sent)
+
+        if failed:
+            yield postpone_failed_mails(failed)
+
+        spooler.record(len(sent), len(failed), time.time() - start)
+        spooler.queued -= len(sent)
 
     @defer.inlineCallbacks
     def spool_emails(self):
-        mails = yield get_mails_from_the_pool()
+        mails, spooler.queued = yield get_mails_from_the_pool(self.state.settings.notification_page_size)
+
+        batches = {}
         for mail in mails:
-            yield self.sendmail(mail)
+            batches.setdefault(self.state.get_mail_tid(mail['tid']), []).append(mail)
+
+        semaphore = defer.DeferredSemaphore(self.state.settings.notification_concurrency)
 
-        if self.mails_to_delete:
-            yield delete_sent_mails(self.mails_to_delete)
+        yield defer.gatherResults([semaphore.run(self.send_batch, tid, batch) for tid, batch in batches.items()],
+                                  consumeErrors=True)
 
     @defer.inlineCallbacks
     def operation(self):
-        del self.mails_to_delete[:]
-
-        yield MailGenerator(self.state).generate()
+        stats = yield MailGenerator(self.state).generate()
+        generation.record(stats)
 
         yield self.spool_emails()
@@ -303,7 +303,9 @@ class _Comment(Model):
 
     @declared_attr
     def __table_args__(self):
-        return (ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),)
+        return (ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_comment_internaltip_id', 'internaltip_id'),
+                Index('idx_comment_new', 'new', sqlite_where=self.new == True))
 
 
 class _Config(Model):
@@ -788,7 +790,9 @@ class _InternalFile(Model):
 
     @declared_attr
     def __table_args__(self):
-        return (ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),)
+        return (ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_internalfile_internaltip_id', 'internaltip_id'),
+                Index('idx_internalfile_new', 'new', sqlite_where=self.new == True))
 
 
 class _InternalTip(Model):
@@ -882,12 +886,14 @@ class _Mail(Model):
     subject = Column(UnicodeText, nullable=False)
     body = Column(UnicodeText, nullable=False)
     processing_attempts = Column(Integer, default=0, nullable=False)
+    next_attempt = Column(DateTime, default=datetime_now, nullable=False)
 
     unicode_keys = ['address', 'subject', 'body']
 
     @declared_attr
     def __table_args__(self):
-        return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),)
+        return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_mail_next_attempt', 'next_attempt'))
 
 
 class _Message(Model):
@@ -908,7 +914,9 @@ class _Message(Model):
     @declared_attr
     def __table_args__(self):
         return (ForeignKeyConstraint(['receivertip_id'], ['receivertip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
-                CheckConstraint(self.type.in_(['receiver', 'whistleblower'])))
+                CheckConstraint(self.type.in_(['receiver', 'whistleblower'])),
+                Index('idx_message_receivertip_id', 'receivertip_id'),
+                Index('idx_message_new', 'new', sqlite_where=self.new == True))
 
 
 class _Questionnaire(Model):
@@ -971,7 +979,10 @@ class _ReceiverFile(Model):
     def __table_args__(self):
         return (ForeignKeyConstraint(['internalfile_id'], ['internalfile.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
                 ForeignKeyConstraint(['receivertip_id'], ['receivertip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
-                CheckConstraint(self.status.in_(['processing', 'reference', 'encrypted', 'unavailable', 'nokey'])))
+                CheckConstraint(self.status.in_(['processing', 'reference', 'encrypted', 'unavailable', 'nokey'])),
+                Index('idx_receiverfile_internalfile_id', 'internalfile_id'),
+                Index('idx_receiverfile_receivertip_id', 'receivertip_id'),
+                Index('idx_receiverfile_new', 'new', sqlite_where=self.new == True))
 
 
 class _ReceiverTip(Model):
@@ -1002,7 +1013,10 @@ class _ReceiverTip(Model):
     @declared_attr
     def __table_args__(self):
         return (ForeignKeyConstraint(['receiver_id'], ['user.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
-                ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'))
+                ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_receivertip_internaltip_id', 'internaltip_id'),
+                Index('idx_receivertip_receiver_id', 'receiver_id'),
+                Index('idx_receivertip_new', 'new', sqlite_where=self.new == True))
 
 
 class _SecureFileDelete(Model):
@@ -1342,7 +1356,9 @@ class _WhistleblowerFile(Model):
 
     @declared_attr
     def __table_args__(self):
-        return (ForeignKeyConstraint(['receivertip_id'], ['receivertip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),)
+        return (ForeignKeyConstraint(['receivertip_id'], ['receivertip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_whistleblowerfile_receivertip_id', 'receivertip_id'),
+                Index('idx_whistleblowerfile_new', 'new', sqlite_where=self.new == True))
 
 
 class _WhistleblowerIdentity(Model):
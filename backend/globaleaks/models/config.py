@@ -15,6 +15,12 @@ inherit_from_root_tenant = [
   'default_questionnaire'
 ]
 
+# The groups of the appdata file holding the defaults of the localized variables
+appdata_groups = {
+  'node': 'node',
+  'notification': 'templates'
+}
+
 
 def get_default(default):
     if callable(default):
@@ -66,9 +72,9 @@ class ConfigL10NFactory(object):
         self.session = session
         self.tid = tid
 
-    def initialize(self, keys, lang, data):
+    def initialize(self, keys, lang, texts):
         for key in keys:
-            value = data[key][lang] if key in data else ''
+            value = texts[key] if key in texts else ''
             self.session.add(ConfigL10N({'tid': self.tid, 'lang': lang, 'var_name': key, 'value': value}))
 
     def get_all(self, group, lang):
@@ -84,18 +90,27 @@ class ConfigL10NFactory(object):
         for key in (x for x in ConfigL10NFilters[group] if x in data):
             c_map[key].set_v(data[key])
 
-    def update_defaults(self, group, langs, data, reset=False):
+    def update_defaults(self, group, langs, appdata, reset=False):
+        if not langs:
+            return
+
         null = datetime_null()
 
-        for lang in langs:
-            old_keys = []
+        old_keys = set()
 
-            for cfg in self.get_all(group, lang):
-                old_keys.append(cfg.var_name)
-                if (cfg.update_date == null or reset) and cfg.var_name in data:
-                    cfg.value = data[cfg.var_name][lang]
+        # The variables of all the languages are loaded with a single query
+        # and only the values not customized that differ are updated
+        for cfg in self.session.query(ConfigL10N).filter(ConfigL10N.tid == self.tid, ConfigL10N.lang.in_(langs), ConfigL10N.var_name.in_(ConfigL10NFilters[group])):
+            old_keys.add((cfg.lang, cfg.var_name))
+            if cfg.update_date == null or reset:
+                texts = appdata.get_texts(appdata_groups[group], cfg.lang)
+                if cfg.var_name in texts and cfg.value != texts[cfg.var_name]:
+                    cfg.value = texts[cfg.var_name]
 
-            ConfigL10NFactory.initialize(self, list(set(ConfigL10NFilters[group]) - set(old_keys)), lang, data)
+        for lang in langs:
+            missing = [key for key in ConfigL10NFilters[group] if (lang, key) not in old_keys]
+            if missing:
+                ConfigL10NFactory.initialize(self, missing, lang, appdata.get_texts(appdata_groups[group], lang))
 
     def get_val(self, var_name, lang):
         cfg = self.session.query(ConfigL10N.value).filter(ConfigL10N.tid == self.tid, ConfigL10N.lang == lang, ConfigL10N.var_name == var_name).one_or_none()
@@ -108,9 +123,9 @@ class ConfigL10NFactory(object):
         cfg = self.session.query(ConfigL10N).filter(ConfigL10N.tid == self.tid, ConfigL10N.lang == lang, ConfigL10N.var_name == var_name).one()
         cfg.set_v(value)
 
-    def reset(self, group, data):
+    def reset(self, group, appdata):
         langs = EnabledLanguage.list(self.session, self.tid)
-        self.update_defaults(group, langs, data, reset=True)
+        self.update_defaults(group, langs, appdata, reset=True)
 
 
 def db_get_config_variable(session, tid, var):
@@ -143,11 +158,11 @@ def initialize_config(session, tid, mode):
         session.add(Config({'tid': tid, 'var_name': name, 'value': value}))
 
 
-def add_new_lang(session, tid, lang, appdata_dict):
+def add_new_lang(session, tid, lang, appdata):
     session.add(EnabledLanguage(tid, lang))
 
-    ConfigL10NFactory(session, tid).initialize(ConfigL10NFilters['node'], lang, appdata_dict['node'])
-    ConfigL10NFactory(session, tid).initialize(ConfigL10NFilters['notification'], lang, appdata_dict['templates'])
+    ConfigL10NFactory(session, tid).initialize(ConfigL10NFilters['node'], lang, appdata.get_texts('node', lang))
+    ConfigL10NFactory(session, tid).initialize(ConfigL10NFilters['notification'], lang, appdata.get_texts('templates', lang))
 
 
 def update_defaults(session, tid, appdata):
@@ -158,5 +173,5 @@ def update_defaults(session, tid, appdata):
     session.query(ConfigL10N).filter(ConfigL10N.tid == tid,
                                      not_(ConfigL10N.var_name.in_(list(set(ConfigL10NFilters['node']).union(ConfigL10NFilters['notification']))))).delete(synchronize_session='fetch')
 
-    ConfigL10NFactory(session, tid).update_defaults('node', langs, appdata['node'])
-    ConfigL10NFactory(session, tid).update_defaults('notification', langs, appdata['templates'])
+    ConfigL10NFactory(session, tid).update_defaults('node', langs, appdata)
+    ConfigL10NFactory(session, tid).update_defaults('notification', langs, appdata)
@@ -39,6 +39,7 @@ ConfigDescriptor = {
     u'version': Unicode(default=text_type(__version__)),
     u'version_db': Int(default=DATABASE_VERSION),
     u'latest_version': Unicode(default=text_type(__version__)),
+    u'data_fingerprint': Unicode(),
 
     u'acme': Bool(default=False),
     u'acme_accnt_key': Unicode(),
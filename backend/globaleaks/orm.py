@@ -1,21 +1,52 @@
 # -*- coding: utf-8
 import platform
 import random
+import threading
 import time
 
 from sqlalchemy import create_engine, event
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
-from twisted.internet import reactor
+from twisted.internet import defer, reactor
 from twisted.internet.threads import deferToThreadPool
 
+from globaleaks.rest import errors
+
 
 __DB_URI = 'sqlite:'
 __THREAD_POOL = None
+__WRITE_THREAD_POOL = None
+__WRITE_QUEUE = None
+__ENGINES = {}
+__ENGINES_LOCK = threading.Lock()
 
 TRANSACTION_RETRIES = 20
 
+# The connection pool is sized on the ORM thread pool so that every
+# worker thread can hold a connection without waiting for another one
+POOL_SIZE = 4
+POOL_MAX_OVERFLOW = 12
+
+# Maximum number of write transactions handed to the writer thread;
+# up to as many further write transactions wait on the reactor for a
+# free slot and the ones exceeding them are rejected
+WRITE_QUEUE_SIZE = 64
+
+# Pragmas applied once to every new pooled connection
+#
+# The write ahead log allows readers to proceed concurrently with the
+# single writer without ever waiting for its lock.
+#
+# secure_delete is a setting of the connection: it is set on every
+# connection of the pool so that the deleted data is overwritten
+# whatever the default of the SQLite library in use.
+PRAGMAS = [
+    'pragma journal_mode=WAL',
+    'pragma secure_delete=ON'
+]
+
 
 def make_db_uri(db_file):
     # ugly ugly hack to allow this to work properly on windows
@@ -39,6 +70,9 @@ def set_db_uri(db_uri):
     global __DB_URI
     __DB_URI = db_uri
 
+    # Connections opened against a previous database must not be reused
+    dispose_engines()
+
 
 def get_db_uri():
     global __DB_URI
@@ -59,7 +93,153 @@ def get_engine(db_uri=None, foreign_keys=True):
     return engine
 
 
-def get_session(db_uri=None, foreign_keys=True):
+class PoolStats(object):
+    """
+    Counters describing the pressure on the connection pool of an engine
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.connects = 0
+        self.connect_time = 0.0
+
+    def register_checkout(self, waited, elapsed):
+        with self.lock:
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+                self.wait_time += elapsed
+
+    def register_connect(self, elapsed):
+        with self.lock:
+            self.connects += 1
+            self.connect_time += elapsed
+
+    def serialize(self):
+        with self.lock:
+            return {
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_time': self.wait_time,
+                'connects': self.connects,
+                'connect_time': self.connect_time
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool keeping track of checkouts and of the time spent waiting for
+    a connection when all the connections of the pool are in use
+    """
+    def __init__(self, creator, pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW, **kwargs):
+        self.stats = PoolStats()
+        self.capacity = pool_size + max_overflow
+        QueuePool.__init__(self, creator, pool_size=pool_size, max_overflow=max_overflow, **kwargs)
+
+    def recreate(self):
+        pool = QueuePool.recreate(self)
+        pool.stats = self.stats
+        pool.capacity = self.capacity
+        return pool
+
+    def _create_connection(self):
+        start = time.time()
+
+        try:
+            return QueuePool._create_connection(self)
+        finally:
+            self.stats.register_connect(time.time() - start)
+
+    def _do_get(self):
+        waited = self.checkedout() >= self.capacity
+        start = time.time()
+
+        try:
+            return QueuePool._do_get(self)
+        finally:
+            self.stats.register_checkout(waited, time.time() - start)
+
+
+def _create_pooled_engine(db_uri, foreign_keys, readonly):
+    engine = create_engine(db_uri,
+                           connect_args={'timeout': 30, 'check_same_thread': False},
+                           poolclass=InstrumentedQueuePool,
+                           pool_size=POOL_SIZE,
+                           max_overflow=POOL_MAX_OVERFLOW,
+                           pool_timeout=30)
+
+    pragmas = list(PRAGMAS)
+
+    if foreign_keys:
+        pragmas.append('pragma foreign_keys=ON')
+
+    if readonly:
+        pragmas.append('pragma query_only=ON')
+
+    @event.listens_for(engine, "connect")
+    def do_connect(conn, connection_record):
+        for pragma in pragmas:
+            conn.execute(pragma)
+
+    return engine
+
+
+def get_pooled_engine(db_uri=None, foreign_keys=True, readonly=False):
+    """
+    Return the process wide engine registered for the database.
+
+    The engine is created at first usage and is then shared by all the
+    transactions so that connections and their pragmas are reused.
+    Read only engines use a separate set of connections that refuse writes.
+    """
+    if db_uri is None:
+        db_uri = get_db_uri()
+
+    key = (db_uri, foreign_keys, readonly)
+
+    with __ENGINES_LOCK:
+        engine = __ENGINES.get(key)
+        if engine is None:
+            engine = __ENGINES[key] = _create_pooled_engine(db_uri, foreign_keys, readonly)
+
+    return engine
+
+
+def dispose_engines():
+    """
+    Close all the connections of the registered engines
+    """
+    with __ENGINES_LOCK:
+        engines = list(__ENGINES.values())
+        __ENGINES.clear()
+
+    for engine in engines:
+        engine.dispose()
+
+
+def get_pool_stats():
+    """
+    Return the counters of the registered engines indexed by database uri
+    """
+    with __ENGINES_LOCK:
+        engines = list(__ENGINES.items())
+
+    ret = {}
+    for key, engine in engines:
+        ret.setdefault(key[0], {})['readonly' if key[2] else 'readwrite'] = engine.pool.stats.serialize()
+
+    return ret
+
+
+def get_session(db_uri=None, foreign_keys=True, readonly=False):
+    if db_uri is None:
+        return sessionmaker(bind=get_pooled_engine(foreign_keys=foreign_keys, readonly=readonly))()
+
     return sessionmaker(bind=get_engine(db_uri, foreign_keys))()
 
 
@@ -77,10 +257,39 @@ def get_thread_pool():
     return __THREAD_POOL
 
 
+def set_write_thread_pool(thread_pool):
+    global __WRITE_THREAD_POOL
+    __WRITE_THREAD_POOL = thread_pool
+
+
+def get_write_thread_pool():
+    """
+    Return the thread pool of the writer; when no dedicated writer is
+    configured write transactions share the ORM thread pool.
+    """
+    global __WRITE_THREAD_POOL
+    if __WRITE_THREAD_POOL is None:
+        return get_thread_pool()
+
+    return __WRITE_THREAD_POOL
+
+
+def get_write_queue():
+    global __WRITE_QUEUE
+    if __WRITE_QUEUE is None:
+        __WRITE_QUEUE = defer.DeferredSemaphore(WRITE_QUEUE_SIZE)
+
+    return __WRITE_QUEUE
+
+
 class transact(object):
     """
     Class decorator for managing transactions.
+
+    Transactions are serialized on the writer thread so that they never
+    contend among themselves for the database lock.
     """
+    readonly = False
 
     def __init__(self, method):
         self.method = method
@@ -94,18 +303,24 @@ class transact(object):
         return self.run(self._wrap, self.method, *args, **kwargs)
 
     def run(self, function, *args, **kwargs):
-        return deferToThreadPool(reactor,
-                                 get_thread_pool(),
-                                 function,
-                                 *args,
-                                 **kwargs)
+        queue = get_write_queue()
+
+        if len(queue.waiting) >= WRITE_QUEUE_SIZE:
+            return defer.fail(errors.ServiceOverloaded())
+
+        return queue.run(deferToThreadPool,
+                         reactor,
+                         get_write_thread_pool(),
+                         function,
+                         *args,
+                         **kwargs)
 
     def _wrap(self, function, *args, **kwargs):
         """
         Wrap provided function calling it inside a thread and
         passing the ORM session to it.
         """
-        session = get_session()
+        session = get_session(readonly=self.readonly)
         retries = 0
 
         try:
@@ -138,6 +353,23 @@ class transact(object):
             session.close()
 
 
+class transact_ro(transact):
+    """
+    Class decorator for managing read only transactions.
+
+    Read only transactions run concurrently on the ORM thread pool using
+    connections on which any write attempt fails.
+    """
+    readonly = True
+
+    def run(self, function, *args, **kwargs):
+        return deferToThreadPool(reactor,
+                                 get_thread_pool(),
+                                 function,
+                                 *args,
+                                 **kwargs)
+
+
 class transact_sync(transact):
     def run(self, function, *args, **kwargs):
         return function(*args, **kwargs)
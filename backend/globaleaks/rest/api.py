@@ -54,6 +54,7 @@ from globaleaks.handlers.admin import tenant as admin_tenant
 from globaleaks.handlers.admin import user as admin_user
 from globaleaks.handlers.admin import submission_statuses as admin_submission_statuses
 from globaleaks.rest import cache, decorators, requests, errors
+from globaleaks.rest.router import Router
 from globaleaks.settings import Settings
 from globaleaks.state import State, extract_exception_traceback_and_schedule_email
 
@@ -149,6 +150,8 @@ api_spec = [
     (r'/admin/activities/(summary|details)', admin_statistics.RecentEventsCollection),
     (r'/admin/anomalies', admin_statistics.AnomalyCollection),
     (r'/admin/jobs', admin_statistics.JobsTiming),
+    (r'/admin/cache', admin_statistics.CacheStats),
+    (r'/admin/performance', admin_statistics.PerformanceStats),
     (r'/admin/l10n/(' + '|'.join(LANGUAGES_SUPPORTED_CODES) + ')', admin_l10n.AdminL10NHandler),
     (r'/admin/files/(logo|favicon|css|homepage|script)', admin_file.FileInstance),
     (r'/admin/config', admin_operation.AdminOperationHandler),
@@ -185,14 +188,17 @@ api_spec = [
 ]
 
 
+tenant_path_regexp = re.compile(r'^/t/([0-9]+)(/.*)')
+
+
 class APIResourceWrapper(Resource):
-    _registry = None
+    router = None
     isLeaf = True
     method_map = {'get': 200, 'post': 201, 'put': 202, 'delete': 200}
 
     def __init__(self):
         Resource.__init__(self)
-        self._registry = []
+        self.router = Router()
         self.handler = None
 
         for tup in api_spec:
@@ -202,19 +208,32 @@ class APIResourceWrapper(Resource):
             else:
                 pattern, handler, args = tup
 
-            if not pattern.startswith("^"):
-                pattern = "^" + pattern
-
-            if not pattern.endswith("$"):
-                pattern += "$"
-
             if not hasattr(handler, '_decorated'):
                 handler._decorated = True
                 for m in ['get', 'put', 'post', 'delete']:
                     if hasattr(handler, m):
                         decorators.decorate_method(handler, m)
 
-            self._registry.append((re.compile(pattern), handler, args))
+            self.router.add(pattern, handler, args)
+
+    def is_upload_path(self, path):
+        """
+        Return True if the path is served by a handler accepting uploads
+
+        :param path: the raw path of a request
+        """
+        try:
+            path = path.partition(b'?')[0].decode('utf-8')
+        except UnicodeDecodeError:
+            return False
+
+        match = tenant_path_regexp.match(path)
+        if match is not None:
+            path = match.groups()[1]
+
+        match = self.router.match(path)
+
+        return match is not None and match[0].upload_handler
 
     def should_redirect_https(self, request):
         hostname = request.hostname
@@ -356,8 +375,8 @@ class APIResourceWrapper(Resource):
             self.redirect_https(request)
             return b''
 
-        if request.tid == 1:
-            match = re.match(r'^/t/([0-9]+)(/.*)', request.path)
+        if request.tid == 1 and request.path.startswith('/t/'):
+            match = tenant_path_regexp.match(request.path)
             if match is not None:
                 groups = match.groups()
                 request.tid, request.path = int(groups[0]), groups[1]
@@ -366,19 +385,13 @@ class APIResourceWrapper(Resource):
             request.redirect(State.tenant_cache[request.tid]['redirects'][request.path])
             return b''
 
-        match = None
-        for regexp, handler, args in self._registry:
-            try:
-                match = regexp.match(request.path)
-            except UnicodeDecodeError:
-                match = None
-            if match:
-                break
-
+        match = self.router.match(request.path)
         if match is None:
             self.handle_exception(errors.ResourceNotFound(), request)
             return b''
 
+        handler, args, groups = match
+
         method = request.method.lower().decode('utf-8')
 
         if method not in self.method_map.keys() or not hasattr(handler, method):
@@ -386,7 +399,7 @@ class APIResourceWrapper(Resource):
             return b''
 
         f = getattr(handler, method)
-        groups = [text_type(g) for g in match.groups()]
+        groups = [text_type(g) for g in groups]
 
         self.handler = handler(State, request, **args)
 
@@ -397,7 +410,12 @@ class APIResourceWrapper(Resource):
             return b''
 
         if self.handler.upload_handler and method == 'post':
-            self.handler.process_file_upload()
+            try:
+                self.handler.process_file_upload()
+            except errors.GLException as e:
+                self.handle_exception(e, request)
+                return b''
+
             if self.handler.uploaded_file is None:
                 return b''
 
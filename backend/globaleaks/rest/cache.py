@@ -1,51 +1,198 @@
 # -*- coding: utf-8 -*-
 import gzip
+import hashlib
 import io
 
+from collections import OrderedDict
 from six import text_type
 
+from globaleaks.settings import Settings
+
 
 def gzipdata(data):
     if isinstance(data, text_type):
         data = data.encode()
 
     fgz = io.BytesIO()
-    gzip_obj = gzip.GzipFile(mode='wb', fileobj=fgz)
+    gzip_obj = gzip.GzipFile(mode='wb', fileobj=fgz, mtime=0)
     gzip_obj.write(data)
     gzip_obj.close()
 
     return fgz.getvalue()
 
 
+def etagdata(data):
+    """
+    Return a strong ETag derived from the content so that an unchanged
+    resource keeps the same validator across cache rebuilds
+    """
+    if isinstance(data, text_type):
+        data = data.encode()
+
+    return ('"%s"' % hashlib.sha256(data).hexdigest()).encode()
+
+
+def etag_match(header, etag):
+    """
+    Check an If-None-Match header value against the ETag of a resource
+    """
+    if header is None:
+        return False
+
+    for value in header.split(b','):
+        value = value.strip()
+        if value == b'*':
+            return True
+
+        if value.startswith(b'W/'):
+            value = value[2:]
+
+        if value == etag:
+            return True
+
+    return False
+
+
 class Cache(object):
-    memory_cache_dict = {}
+    """
+    In memory LRU cache of immutable pre-gzipped snapshots of the API resources
+
+    Every entry is a tuple (content_type, gzipped_data, etag) stored by
+    (tid, resource, language). The memory used is accounted per tenant and
+    bounded both globally and per tenant by evicting the least recently
+    used entries.
+    """
+    memory_cache_dict = OrderedDict()
+    tenant_size = {}
+    size = 0
+
+    # Versions of the snapshots by tenant, incremented on every invalidation
+    # in order to discard snapshots built from data that has been changed
+    # in the meantime
+    version = {}
+
+    # Deferreds waiting for a snapshot being built keyed by (tid, resource, language)
+    pending = {}
+
+    stats = {
+        'hits': 0,
+        'misses': 0,
+        'coalesced': 0,
+        'evictions': 0
+    }
 
     @classmethod
     def get(cls, tid, resource, language):
-        if tid in cls.memory_cache_dict \
-           and resource in cls.memory_cache_dict[tid] \
-           and language in cls.memory_cache_dict[tid][resource]:
-            return cls.memory_cache_dict[tid][resource][language]
+        key = (tid, resource, language)
+
+        entry = cls.memory_cache_dict.pop(key, None)
+        if entry is None:
+            cls.stats['misses'] += 1
+            return None
+
+        cls.memory_cache_dict[key] = entry
+        cls.stats['hits'] += 1
+
+        return entry
 
     @classmethod
-    def set(cls, tid, resource, language, content_type, data):
-        data = gzipdata(data)
+    def set(cls, tid, resource, language, content_type, data, version=None):
+        """
+        Store the snapshot of a resource and return it.
 
-        if tid not in Cache.memory_cache_dict:
-            cls.memory_cache_dict[tid] = {}
+        The snapshot is not stored if a version is passed and the cache
+        of the tenant has been invalidated after it.
+        """
+        key = (tid, resource, language)
+        entry = (content_type, gzipdata(data), etagdata(data))
 
-        if resource not in Cache.memory_cache_dict[tid]:
-            cls.memory_cache_dict[tid][resource] = {}
+        if version is not None and version != cls.version.get(tid, 0):
+            return entry
 
-        entry = (content_type, data)
+        cls._remove(key)
 
-        cls.memory_cache_dict[tid][resource][language] = entry
+        entry_size = cls._entry_size(entry)
+        if entry_size > Settings.api_cache_tenant_size:
+            return entry
+
+        cls.memory_cache_dict[key] = entry
+        cls.tenant_size[tid] = cls.tenant_size.get(tid, 0) + entry_size
+        cls.size += entry_size
+
+        cls._evict(tid)
 
         return entry
 
     @classmethod
-    def invalidate(cls, tid=1):
-        if tid == 1:
+    def get_version(cls, tid):
+        """
+        Return the version of the snapshots of a tenant to be passed to set
+        """
+        # The version is recorded so that the invalidations propagating
+        # to every tenant can increment it
+        return cls.version.setdefault(tid, 0)
+
+    @classmethod
+    def _entry_size(cls, entry):
+        return len(entry[0]) + len(entry[1]) + len(entry[2])
+
+    @classmethod
+    def _remove(cls, key):
+        entry = cls.memory_cache_dict.pop(key, None)
+        if entry is None:
+            return
+
+        entry_size = cls._entry_size(entry)
+        cls.tenant_size[key[0]] -= entry_size
+        cls.size -= entry_size
+
+        if not cls.tenant_size[key[0]]:
+            del cls.tenant_size[key[0]]
+
+    @classmethod
+    def _evict(cls, tid):
+        if cls.tenant_size.get(tid, 0) > Settings.api_cache_tenant_size:
+            for key in [key for key in cls.memory_cache_dict if key[0] == tid]:
+                cls._remove(key)
+                cls.stats['evictions'] += 1
+                if cls.tenant_size.get(tid, 0) <= Settings.api_cache_tenant_size:
+                    break
+
+        while cls.size > Settings.api_cache_size:
+            cls._remove(next(iter(cls.memory_cache_dict)))
+            cls.stats['evictions'] += 1
+
+    @classmethod
+    def invalidate(cls, tid=1, propagate=True):
+        """
+        Drop the snapshots of a tenant.
+
+        Changes to the root tenant are usually inherited by every tenant and
+        so the invalidation of tid 1 drops the whole cache unless the change
+        is declared not to propagate.
+        """
+        if tid == 1 and propagate:
+            for x in cls.version:
+                cls.version[x] += 1
+
             cls.memory_cache_dict.clear()
+            cls.tenant_size.clear()
+            cls.size = 0
         else:
-            cls.memory_cache_dict.pop(tid, None)
+            cls.version[tid] = cls.version.get(tid, 0) + 1
+
+            for key in [key for key in cls.memory_cache_dict if key[0] == tid]:
+                cls._remove(key)
+
+    @classmethod
+    def get_stats(cls):
+        ret = dict(cls.stats)
+        ret.update({
+            'entries': len(cls.memory_cache_dict),
+            'size': cls.size,
+            'max_size': Settings.api_cache_size,
+            'tenant_max_size': Settings.api_cache_tenant_size,
+            'tenants': [{'id': tid, 'size': size} for tid, size in sorted(cls.tenant_size.items())]
+        })
+
+        return ret
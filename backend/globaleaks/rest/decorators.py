@@ -2,9 +2,10 @@
 import json
 
 from twisted.internet import defer
+from twisted.python.failure import Failure
 
 from globaleaks.rest import errors
-from globaleaks.rest.cache import Cache
+from globaleaks.rest.cache import Cache, etag_match
 from globaleaks.state import State
 
 
@@ -23,41 +24,86 @@ def decorator_authentication(f, roles):
     return wrapper
 
 
-def decorator_cache_get(f):
+def serve_cache_entry(request, entry, public):
+    content_type, data, etag = entry
+
+    request.setHeader(b'ETag', etag)
+
+    if public:
+        # Public resources could be stored by the clients and revalidated via If-None-Match
+        request.setHeader(b'Cache-control', b'no-cache')
+
+    if etag_match(request.headers.get(b'if-none-match'), etag):
+        request.setResponseCode(304)
+        return None
+
+    request.setHeader(b'Content-encoding', b'gzip')
+    request.setHeader(b'Content-type', content_type)
+
+    return data
+
+
+def decorator_cache_get(f, public=False):
     def wrapper(self, *args, **kwargs):
-        c = Cache.get(self.request.tid, self.request.path, self.request.language)
-        if c is None:
-            d = defer.maybeDeferred(f, self, *args, **kwargs)
+        key = (self.request.tid, self.get_cache_resource(), self.request.language)
 
-            def callback(data):
-                if isinstance(data, (dict, list)):
-                    self.request.setHeader(b'content-type', b'application/json')
-                    data = json.dumps(data)
+        c = Cache.get(*key)
+        if c is not None:
+            return serve_cache_entry(self.request, c, public)
 
-                self.request.setHeader(b'Content-encoding', b'gzip')
+        # Concurrent misses on the same resource wait for the snapshot being built
+        if key in Cache.pending:
+            Cache.stats['coalesced'] += 1
+            d = defer.Deferred()
+            Cache.pending[key].append(d)
+            return d.addCallback(lambda c: serve_cache_entry(self.request, c, public))
 
-                c = self.request.responseHeaders.getRawHeaders(b'Content-type', [b'application/json'])[0]
-                return Cache.set(self.request.tid, self.request.path, self.request.language, c, data)[1]
+        waiting = Cache.pending[key] = []
+        version = Cache.get_version(key[0])
 
-            d.addCallback(callback)
+        def callback(data):
+            if isinstance(data, (dict, list)):
+                self.request.setHeader(b'content-type', b'application/json')
+                data = json.dumps(data, separators=(',', ':'))
 
-            return d
+            c = self.request.responseHeaders.getRawHeaders(b'Content-type', [b'application/json'])[0]
+            return Cache.set(key[0], key[1], key[2], c, data, version)
 
-        else:
-            self.request.setHeader(b'Content-encoding', b'gzip')
-            self.request.setHeader(b'Content-type', c[0])
+        def release(result):
+            del Cache.pending[key]
 
-        return c[1]
+            for d in waiting:
+                if isinstance(result, Failure):
+                    d.errback(result)
+                else:
+                    d.callback(result)
+
+            return result
+
+        d = defer.maybeDeferred(f, self, *args, **kwargs)
+        d.addCallback(callback)
+        d.addBoth(release)
+
+        return d.addCallback(lambda c: serve_cache_entry(self.request, c, public))
 
     return wrapper
 
 
 def decorator_cache_invalidate(f):
     def wrapper(self, *args, **kwargs):
-        if self.invalidate_cache:
-            Cache.invalidate(self.request.tid)
+        if not self.invalidate_cache:
+            return f(self, *args, **kwargs)
+
+        Cache.invalidate(self.request.tid, self.propagate_cache_invalidation)
+
+        d = defer.maybeDeferred(f, self, *args, **kwargs)
 
-        return f(self, *args, **kwargs)
+        def callback(data):
+            # Drop also the snapshots possibly rebuilt while the change was being committed
+            Cache.invalidate(self.request.tid, self.propagate_cache_invalidation)
+            return data
+
+        return d.addCallback(callback)
 
     return wrapper
 
@@ -85,7 +131,7 @@ def decorate_method(h, method):
     if State.settings.enable_api_cache:
         if method == 'get':
             if h.cache_resource:
-                f = decorator_cache_get(f)
+                f = decorator_cache_get(f, '*' in value)
         else:
             if h.invalidate_cache:
                 f = decorator_cache_invalidate(f)
@@ -189,3 +189,15 @@ class AccessLocationInvalid(GLException):
     reason = "IP Address not allows to login from this location"
     error_code = 16
     status_code = 401
+
+
+class RangeNotSatisfiable(GLException):
+    reason = "The requested range is not satisfiable"
+    error_code = 17
+    status_code = 416  # Range Not Satisfiable
+
+
+class ServiceOverloaded(GLException):
+    reason = "The service is overloaded, retry later"
+    error_code = 18
+    status_code = 503  # Service not available
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# Dispatcher of the request paths to the API handlers
+import re
+import threading
+
+from collections import OrderedDict
+
+# The characters that can be part of the literal prefix of a route pattern
+literal_characters = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-/')
+
+
+def get_route_segment(pattern):
+    """
+    Return the first segment of the paths matched by a route pattern
+
+    :param pattern: a pattern starting with ^ and ending with $
+    :return: the segment or None if the pattern could match paths with
+             different first segments
+    """
+    # alternatives at the top level of the pattern could match any path
+    depth = 0
+    escaped = False
+    for c in pattern:
+        if escaped:
+            escaped = False
+        elif c == '\\':
+            escaped = True
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == '|' and depth == 0:
+            return None
+
+    i = 1
+    while i < len(pattern) and pattern[i] in literal_characters:
+        i += 1
+
+    prefix = pattern[1:i]
+
+    # a quantifier makes optional the last character of the prefix
+    if i < len(pattern) and pattern[i] in '?*+{':
+        return None
+
+    if not prefix.startswith('/'):
+        return None
+
+    segment, sep, _ = prefix[1:].partition('/')
+    if sep or pattern[i:] == '$':
+        return segment
+
+    return None
+
+
+class Router(object):
+    """
+    Dispatcher of the request paths to the handlers of the routes
+
+    The routes are indexed by the first segment of the paths they match so
+    that only the patterns of the routes of the segment requested and the
+    ones that could match any path are evaluated, preserving the order of
+    the routes. The recent resolutions are kept in an LRU cache.
+    """
+    def __init__(self, cache_size=1024):
+        self.routes = []
+        self.segments = {}
+        self.generic_routes = []
+
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+        # The cache is accessed only by the reactor thread but the lock
+        # keeps the router usable by any thread
+        self.lock = threading.Lock()
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0
+        }
+
+    def add(self, pattern, handler, args):
+        if not pattern.startswith("^"):
+            pattern = "^" + pattern
+
+        if not pattern.endswith("$"):
+            pattern += "$"
+
+        route = (re.compile(pattern), handler, args)
+        self.routes.append(route)
+
+        segment = get_route_segment(pattern)
+        if segment is None:
+            self.generic_routes.append(route)
+            for routes in self.segments.values():
+                routes.append(route)
+        else:
+            if segment not in self.segments:
+                self.segments[segment] = list(self.generic_routes)
+
+            self.segments[segment].append(route)
+
+        self.clear()
+
+    def match(self, path):
+        """
+        Resolve a path
+
+        :return: the handler, its arguments and the groups matched or None
+        """
+        with self.lock:
+            ret = self.cache.pop(path, False)
+            if ret is not False:
+                self.cache[path] = ret
+                self.stats['hits'] += 1
+                return ret
+
+            self.stats['misses'] += 1
+
+        ret = None
+
+        segment = path[1:].split('/', 1)[0]
+        for regexp, handler, args in self.segments.get(segment, self.generic_routes):
+            try:
+                match = regexp.match(path)
+            except UnicodeDecodeError:
+                match = None
+
+            if match:
+                ret = (handler, args, match.groups())
+                break
+
+        with self.lock:
+            self.cache[path] = ret
+
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return ret
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+    def get_stats(self):
+        with self.lock:
+            ret = dict(self.stats)
+            ret['entries'] = len(self.cache)
+            return ret
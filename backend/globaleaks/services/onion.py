@@ -10,7 +10,7 @@ from twisted.internet import reactor, defer
 from globaleaks import models
 from globaleaks.db import refresh_memory_variables
 from globaleaks.models.config import ConfigFactory
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest.cache import Cache
 from globaleaks.services.service import Service
 from globaleaks.state import State
@@ -31,7 +31,7 @@ def db_get_onion_service_info(session, tid):
     return tid, hostname, key
 
 
-@transact
+@transact_ro
 def get_onion_service_info(session, tid):
     return db_get_onion_service_info(session, tid)
 
@@ -43,7 +43,7 @@ def set_onion_service_info(session, tid, hostname, key):
     node.set_val(u'tor_onion_key', key)
 
 
-@transact
+@transact_ro
 def list_onion_service_info(session):
     return [db_get_onion_service_info(session, x[0])
         for x in session.query(models.Tenant.id).filter(models.Tenant.active == True,
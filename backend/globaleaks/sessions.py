@@ -6,6 +6,8 @@ from globaleaks.utils.tempdict import TempDict
 
 
 class Session(object):
+    __slots__ = ('id', 'tid', 'user_id', 'user_role', 'pcn', 'cc', 'expiration')
+
     def __init__(self, tid, user_id, user_role, pcn, cc):
         self.id = generateRandomKey(42)
         self.tid = tid
@@ -13,10 +15,10 @@ class Session(object):
         self.user_role = user_role
         self.pcn = pcn
         self.cc = cc
-        self.expireCall = None
+        self.expiration = 0
 
     def getTime(self):
-        return self.expireCall.getTime() if self.expireCall else 0
+        return self.expiration
 
     def serialize(self):
         return {
@@ -31,10 +33,47 @@ class Session(object):
 class SessionsFactory(TempDict):
     """Extends TempDict to provide session management functions ontop of temp session keys"""
 
+    def __init__(self, *args, **kwargs):
+        # Index of the ids of the sessions of each (tid, user_id)
+        self.user_sessions = {}
+        TempDict.__init__(self, *args, **kwargs)
+
+    def _unindex(self, session_id, session):
+        key = (session.tid, session.user_id)
+        if key in self.user_sessions:
+            session_ids = self.user_sessions[key]
+            session_ids.discard(session_id)
+            if not session_ids:
+                del self.user_sessions[key]
+
+    def __setitem__(self, session_id, session):
+        TempDict.__setitem__(self, session_id, session)
+        self.user_sessions.setdefault((session.tid, session.user_id), set()).add(session_id)
+
+    def __delitem__(self, session_id):
+        session = TempDict.__getitem__(self, session_id)
+        TempDict.__delitem__(self, session_id)
+        self._unindex(session_id, session)
+
+    def pop(self, session_id, *args):
+        if session_id not in self:
+            return TempDict.pop(self, session_id, *args)
+
+        session = TempDict.pop(self, session_id)
+        self._unindex(session_id, session)
+        return session
+
+    def clear(self):
+        TempDict.clear(self)
+        self.user_sessions.clear()
+
     def revoke(self, tid, user_id):
-        for k, v in list(self.items()):
-            if v.tid == tid and v.user_id == user_id:
-                del self[k]
+        key = (tid, user_id)
+        if key not in self.user_sessions:
+            return
+
+        for session_id in list(self.user_sessions[key]):
+            del self[session_id]
 
     def new(self, tid, user_id, user_role, pcn, cc):
         self.revoke(tid, user_id)
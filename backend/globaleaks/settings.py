@@ -26,6 +26,20 @@ possible_client_paths = [
 ]
 
 
+def get_default_kdf_workers():
+    """
+    Return the number of Argon2 computations that can run concurrently
+    using at most a quarter of the physical memory
+    """
+    try:
+        memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return 2
+
+    # Every computation uses 128MB of memory
+    return max(1, min(8, memory // (4 * 128 * 1024 * 1024)))
+
+
 external_counted_events = {
     'new_submission': 0,
     'finalized_submission': 0,
@@ -105,6 +119,15 @@ class SettingsClass(object):
         self.notification_limit = 30
         self.jobs_operation_limit = 20
 
+        # Number of files encrypted concurrently by the delivery
+        self.delivery_workers = 4
+
+        # Number of passwords hashed concurrently
+        self.kdf_workers = get_default_kdf_workers()
+
+        # Number of threads generating the tip exports
+        self.export_workers = 2
+
         self.user = getpass.getuser()
         self.group = getpass.getuser()
 
@@ -144,10 +167,23 @@ class SettingsClass(object):
         self.mail_timeout = 15  # seconds
         self.mail_attempts_limit = 3  # per mail limit
 
+        # Spooling of the notification mails
+        self.notification_page_size = 100  # mails fetched at every run
+        self.notification_concurrency = 4  # SMTP servers contacted concurrently
+        self.notification_sessions = 2  # concurrent sessions per SMTP server
+        self.notification_backoff = 60  # seconds, doubled at every failure
+        self.notification_backoff_limit = 3600  # seconds
+
         self.acme_directory_url = 'https://acme-v02.api.letsencrypt.org/directory'
 
         self.enable_api_cache = True
 
+        # Memory budgets of the API cache
+        self.api_cache_size = 64 * 1024 * 1024  # 64MB
+        self.api_cache_tenant_size = 4 * 1024 * 1024  # 4MB
+
+        self.archived_schema_cache_size = 16 * 1024 * 1024  # 16MB
+
         self.eval_paths()
 
     def eval_paths(self):
@@ -224,6 +260,24 @@ class SettingsClass(object):
 
         self.orm_debug = self.cmdline_options.orm_debug
 
+        if self.cmdline_options.delivery_workers < 1:
+            self.print_msg("Error: the number of delivery workers must be positive")
+            sys.exit(1)
+
+        self.delivery_workers = self.cmdline_options.delivery_workers
+
+        if self.cmdline_options.kdf_workers < 1:
+            self.print_msg("Error: the number of kdf workers must be positive")
+            sys.exit(1)
+
+        self.kdf_workers = self.cmdline_options.kdf_workers
+
+        if self.cmdline_options.export_workers < 1:
+            self.print_msg("Error: the number of export workers must be positive")
+            sys.exit(1)
+
+        self.export_workers = self.cmdline_options.export_workers
+
         if self.cmdline_options.working_path:
             self.working_path = self.cmdline_options.working_path
 
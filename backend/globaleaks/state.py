@@ -18,15 +18,16 @@ from globaleaks.transactions import db_schedule_email
 from globaleaks.utils.agent import get_tor_agent, get_web_agent
 from globaleaks.utils.crypto import sha256
 from globaleaks.utils.log import log
-from globaleaks.utils.mail import sendmail
+from globaleaks.utils.mail import sendmail_batch
 from globaleaks.utils.objectdict import ObjectDict
-from globaleaks.utils.pgp import PGPContext
+from globaleaks.utils.pgp import PGPKeyring
 from globaleaks.utils.singleton import Singleton
 from globaleaks.utils.sni import SNIMap
 from globaleaks.utils.tempdict import TempDict
 from globaleaks.utils.templating import Templating
 from globaleaks.utils.token import TokenList
 from globaleaks.utils.tor_exit_set import TorExitSet
+from globaleaks.utils.upload import TempUploadDict
 from globaleaks.utils.utility import datetime_now
 
 
@@ -78,8 +79,12 @@ class StateClass(ObjectDict):
         self.tenant_cache = {}
         self.tenant_hostname_id_map = {}
 
-        self.set_orm_tp(ThreadPool(4, 16))
-        self.TempUploadFiles = TempDict(timeout=3600)
+        self.set_orm_tp(ThreadPool(orm.POOL_SIZE, orm.POOL_SIZE + orm.POOL_MAX_OVERFLOW),
+                        ThreadPool(1, 1, 'orm-writer'))
+        self.delivery_tp = ThreadPool(0, self.settings.delivery_workers, 'delivery')
+        self.kdf_tp = ThreadPool(0, self.settings.kdf_workers, 'kdf')
+        self.export_tp = ThreadPool(0, self.settings.export_workers, 'export')
+        self.TempUploadFiles = TempUploadDict(timeout=3600)
 
         self.shutdown = False
 
@@ -91,9 +96,13 @@ class StateClass(ObjectDict):
 
         self.tokens = TokenList(self.settings.tmp_path)
 
-    def set_orm_tp(self, orm_tp):
+        self.pgp_keyring = PGPKeyring(self.settings.tmp_path)
+
+    def set_orm_tp(self, orm_tp, orm_write_tp):
         self.orm_tp = orm_tp
+        self.orm_write_tp = orm_write_tp
         orm.set_thread_pool(orm_tp)
+        orm.set_write_thread_pool(orm_write_tp)
 
     def get_agent(self):
         if self.tenant_cache[1].anonymize_outgoing_connections:
@@ -183,29 +192,48 @@ class StateClass(ObjectDict):
 
         self.stats_collection_start_time = datetime_now()
 
-    def sendmail(self, tid, to_address, subject, body):
+    def get_mail_tid(self, tid):
+        """
+        Return the tenant whose SMTP configuration is used to send the mails of tenant tid
+        """
+        if self.tenant_cache[tid].mode == u'whistleblowing.it':
+            return 1
+
+        return tid
+
+    def sendmail_batch(self, tid, mails):
         if self.settings.testing:
-            # during unit testing do not try to send the mail
-            return defer.succeed(True)
+            # during unit testing do not try to send the mails
+            return defer.succeed({mail['id']: True for mail in mails})
+
+        tid = self.get_mail_tid(tid)
+
+        mails = [dict(mail, subject=self.tenant_cache[tid].name + ' - ' + mail['subject']) for mail in mails]
+
+        return sendmail_batch(tid,
+                              self.tenant_cache[tid].notification.smtp_server,
+                              self.tenant_cache[tid].notification.smtp_port,
+                              self.tenant_cache[tid].notification.smtp_security,
+                              self.tenant_cache[tid].notification.smtp_authentication,
+                              self.tenant_cache[tid].notification.smtp_username,
+                              self.tenant_cache[tid].notification.smtp_password,
+                              self.tenant_cache[tid].notification.smtp_source_name,
+                              self.tenant_cache[tid].notification.smtp_source_email,
+                              mails,
+                              self.tenant_cache[1].anonymize_outgoing_connections,
+                              self.settings.socks_host,
+                              self.settings.socks_port,
+                              self.settings.notification_sessions)
 
-        if self.tenant_cache[tid].mode == u'whistleblowing.it':
-            tid = 1
-
-        return sendmail(tid,
-                        self.tenant_cache[tid].notification.smtp_server,
-                        self.tenant_cache[tid].notification.smtp_port,
-                        self.tenant_cache[tid].notification.smtp_security,
-                        self.tenant_cache[tid].notification.smtp_authentication,
-                        self.tenant_cache[tid].notification.smtp_username,
-                        self.tenant_cache[tid].notification.smtp_password,
-                        self.tenant_cache[tid].notification.smtp_source_name,
-                        self.tenant_cache[tid].notification.smtp_source_email,
-                        to_address,
-                        self.tenant_cache[tid].name + ' - ' + subject,
-                        body,
-                        self.tenant_cache[1].anonymize_outgoing_connections,
-                        self.settings.socks_host,
-                        self.settings.socks_port)
+    def sendmail(self, tid, to_address, subject, body):
+        mail = {
+            'id': 0,
+            'address': to_address,
+            'subject': subject,
+            'body': body
+        }
+
+        return self.sendmail_batch(tid, [mail]).addCallback(lambda results: results[0])
 
     def schedule_exception_email(self, exception_text, *args):
         if not hasattr(self.tenant_cache[1], 'notification'):
@@ -243,9 +271,7 @@ class StateClass(ObjectDict):
             # Opportunisticly encrypt the mail body. NOTE that mails will go out
             # unencrypted if one address in the list does not have a public key set.
             if pgp_key_public:
-                pgpctx = PGPContext(self.settings.tmp_path)
-                fingerprint = pgpctx.load_key(pgp_key_public)['fingerprint']
-                mail_body = pgpctx.encrypt_message(fingerprint, mail_body)
+                mail_body = self.pgp_keyring.encrypt_message_with_key(pgp_key_public, mail_body)
 
             # avoid waiting for the notification to send and instead rely on threads to handle it
             tw(db_schedule_email, 1, mail_address, mail_subject, mail_body)
@@ -262,16 +288,12 @@ class StateClass(ObjectDict):
         subject, body = Templating().get_mail_subject_and_body(template_vars)
 
         if user_desc.get('pgp_key_public', ''):
-            pgpctx = PGPContext(self.settings.tmp_path)
-            fingerprint = pgpctx.load_key(user_desc['pgp_key_public'])['fingerprint']
-            body = pgpctx.encrypt_message(fingerprint, body)
+            body = self.pgp_keyring.encrypt_message_with_key(user_desc['pgp_key_public'], body)
 
         db_schedule_email(session, tid, user_desc['mail_address'], subject, body)
 
     def get_tmp_file_by_name(self, filename):
-        for k, v in self.TempUploadFiles.items():
-            if os.path.basename(v.filepath) == filename:
-                return self.TempUploadFiles.pop(k)
+        return self.TempUploadFiles.pop_by_filename(filename)
 
 
 def mail_exception_handler(etype, value, tback):
@@ -7,6 +7,7 @@ from twisted.internet.defer import inlineCallbacks
 
 from globaleaks import models
 from globaleaks.handlers.admin import questionnaire
+from globaleaks.handlers.submission import QuestionnaireSchemaCache
 from globaleaks.models import Questionnaire
 from globaleaks.orm import transact
 from globaleaks.rest import errors
@@ -52,6 +53,18 @@ class TestQuestionnaireInstance(helpers.TestInstanceHandler):
         }
     }
 
+    @inlineCallbacks
+    def test_delete_invalidates_the_schemas(self):
+        q = yield questionnaire.create_questionnaire(1, self.get_dummy_request(), u'en')
+
+        QuestionnaireSchemaCache.set(1, q['id'], u'hash', [])
+
+        handler = self.request(role='admin')
+        yield handler.delete(q['id'])
+
+        self.assertIsNone(QuestionnaireSchemaCache.get(1, q['id']))
+        yield self.test_model_count(models.Questionnaire, 1)
+
 
 class TestQuestionnareDuplication(helpers.TestHandlerWithPopulatedDB):
     _handler = questionnaire.QuestionnareDuplication
@@ -2,10 +2,19 @@
 from twisted.internet.defer import inlineCallbacks
 
 from globaleaks import anomaly
+from globaleaks.handlers import export
 from globaleaks.handlers.admin import statistics
+from globaleaks.handlers.receiver import get_receivertip_list
+from globaleaks.handlers.submission import ArchivedSchemaCache, QuestionnaireSchemaCache
+from globaleaks.jobs import delivery, notification
+from globaleaks.jobs.delivery import Delivery
+from globaleaks.jobs.notification import Notification
 from globaleaks.jobs.anomalies import Anomalies
 from globaleaks.jobs.statistics import Statistics
+from globaleaks.orm import get_db_uri
+from globaleaks.rest.cache import Cache
 from globaleaks.tests import helpers
+from globaleaks.utils import kdf, upload
 
 
 class TestStatsCollection(helpers.TestHandler):
@@ -84,3 +93,71 @@ class TestJobsTiming(helpers.TestHandler):
         handler = self.request({}, role='admin')
 
         yield handler.get()
+
+
+class TestCacheStats(helpers.TestHandler):
+    _handler = statistics.CacheStats
+
+    def test_get(self):
+        Cache.invalidate()
+        Cache.set(1, u'/public', u'en', 'application/json', u'{}')
+        Cache.get(1, u'/public', u'en')
+
+        handler = self.request({}, role='admin')
+
+        response = handler.get()
+        self.assertEqual(response['entries'], 1)
+        self.assertTrue(response['hits'] >= 1)
+        self.assertEqual(response['tenants'][0]['id'], 1)
+        self.assertEqual(response['tenants'][0]['size'], response['size'])
+
+
+class TestPerformanceStats(helpers.TestHandlerWithPopulatedDB):
+    _handler = statistics.PerformanceStats
+
+    @inlineCallbacks
+    def test_get(self):
+        QuestionnaireSchemaCache.invalidate()
+        ArchivedSchemaCache.clear()
+        delivery.executor.reset()
+        kdf.executor.reset()
+        upload.monitor.reset()
+        export.monitor.reset()
+        notification.spooler.reset()
+        notification.generation.reset()
+
+        yield self.perform_full_submission_actions()
+        yield Delivery().run()
+        yield Notification().run()
+
+        for _ in range(2):
+            yield get_receivertip_list(1, self.dummyReceiver_1['id'], u'en')
+
+        handler = self.request({}, role='admin')
+
+        response = handler.get()
+
+        self.assertTrue(response['orm'][get_db_uri()]['readwrite']['checkouts'] > 0)
+
+        self.assertEqual(response['questionnaires']['entries'], 1)
+
+        self.assertTrue(response['schemas']['entries'] > 0)
+        self.assertTrue(response['schemas']['hit_rate'] > 0)
+
+        self.assertEqual(response['delivery']['queued'], 0)
+        self.assertTrue(response['delivery']['files'] > 0)
+
+        self.assertEqual(response['kdf']['running'], 0)
+        self.assertTrue(response['kdf']['count'] > 0)
+
+        self.assertEqual(response['uploads']['active'], 0)
+        self.assertEqual(response['uploads']['buffered_high_water'], 0)
+
+        self.assertEqual(response['exports']['active'], 0)
+
+        self.assertEqual(response['mails']['queued'], 0)
+        self.assertEqual(response['mails']['sent'], 24)
+        self.assertEqual(response['mails']['failed'], 0)
+
+        self.assertEqual(sorted(response['triggers'].keys()), ['Comment', 'Message', 'ReceiverFile', 'ReceiverTip'])
+        self.assertEqual(sum(x['mails'] for x in response['triggers'].values()), 24)
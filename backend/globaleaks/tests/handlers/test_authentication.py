@@ -1,15 +1,21 @@
 # -*- coding: utf-8 -*-
 from twisted.internet.address import IPv4Address
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import inlineCallbacks, returnValue
 
+from globaleaks import models
+from globaleaks.db import refresh_memory_variables
 from globaleaks.handlers import authentication
 from globaleaks.handlers.user import UserInstance
 from globaleaks.handlers.wbtip import WBTipInstance
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import errors
 from globaleaks.sessions import Sessions
 from globaleaks.settings import Settings
 from globaleaks.state import State
 from globaleaks.tests import helpers
+from globaleaks.utils import kdf
+from globaleaks.utils.crypto import GCE
+from globaleaks.utils.utility import datetime_null
 
 
 class TestAuthentication(helpers.TestHandlerWithPopulatedDB):
@@ -95,6 +101,34 @@ class TestAuthentication(helpers.TestHandlerWithPopulatedDB):
 
         yield self.assertFailure(handler.post(), errors.InvalidAuthentication)
 
+    @transact
+    def disable_user(self, session, username):
+        session.query(models.User).filter(models.User.username == username).update({'state': u'disabled'})
+
+    @inlineCallbacks
+    def test_invalid_login_of_user_disabled_during_the_login(self):
+        get_user_credentials = authentication.get_user_credentials
+
+        @inlineCallbacks
+        def get_user_credentials_and_disable_user(tid, username):
+            credentials = yield get_user_credentials(tid, username)
+
+            yield self.disable_user(username)
+
+            returnValue(credentials)
+
+        self.patch(authentication, 'get_user_credentials', get_user_credentials_and_disable_user)
+
+        handler = self.request({
+            'tid': 1,
+            'username': 'admin',
+            'password': helpers.VALID_PASSWORD1,
+            'authcode': ''
+        })
+
+        yield self.assertFailure(handler.post(), errors.InvalidAuthentication)
+        self.assertEqual(len(Sessions), 0)
+
     @inlineCallbacks
     def test_failed_login_counter(self):
         handler = self.request({
@@ -205,6 +239,54 @@ class TestReceiptAuth(helpers.TestHandlerWithPopulatedDB):
         self.assertTrue('session_id' in response)
         self.assertEqual(len(Sessions), 1)
 
+    @transact
+    def set_legacy_receipt_hash(self, session, receipt):
+        salt = State.tenant_cache[1].receipt_salt
+        wbtip = session.query(models.WhistleblowerTip) \
+                       .filter(models.WhistleblowerTip.receipt_hash == GCE.hash_password(receipt, salt)).one()
+        wbtip.hash_alg = u'SCRYPT'
+        wbtip.receipt_hash = GCE.hash_password(receipt, salt, u'SCRYPT')
+
+    @inlineCallbacks
+    def test_whistleblower_login_hashes_with_the_current_algorithm(self):
+        yield self.perform_full_submission_actions()
+
+        State.tenant_cache[1].receipt_hash_algorithms = {GCE.HASH, u'SCRYPT'}
+
+        kdf.executor.reset()
+
+        session = yield authentication.login_whistleblower(1, self.dummySubmission['receipt'])
+        self.assertEqual(session.user_role, 'whistleblower')
+
+        # a single hash is computed for the receipt and one for the key of the whistleblower
+        self.assertEqual(kdf.executor.get_stats()['count'], 2 if State.tenant_cache[1].encryption else 1)
+
+    @inlineCallbacks
+    def test_whistleblower_login_with_legacy_algorithm(self):
+        yield self.perform_full_submission_actions()
+        yield self.set_legacy_receipt_hash(self.dummySubmission['receipt'])
+        yield refresh_memory_variables()
+
+        self.assertTrue(u'SCRYPT' in State.tenant_cache[1].receipt_hash_algorithms)
+
+        session = yield authentication.login_whistleblower(1, self.dummySubmission['receipt'])
+        self.assertEqual(session.user_role, 'whistleblower')
+
+    @transact_ro
+    def get_wb_last_access(self, session):
+        return [itip.wb_last_access for itip in session.query(models.InternalTip)]
+
+    @inlineCallbacks
+    def test_whistleblower_login_updates_the_last_access(self):
+        yield self.perform_full_submission_actions()
+        yield self.force_wbtip_expiration()
+
+        yield self.assertFailure(authentication.login_whistleblower(1, u'INVALIDRECEIPT'), errors.InvalidAuthentication)
+        self.assertEqual(set((yield self.get_wb_last_access())), {datetime_null()})
+
+        yield authentication.login_whistleblower(1, self.dummySubmission['receipt'])
+        self.assertEqual(len([x for x in (yield self.get_wb_last_access()) if x != datetime_null()]), 1)
+
     @inlineCallbacks
     def test_accept_whistleblower_login_in_https(self):
         yield self.perform_full_submission_actions()
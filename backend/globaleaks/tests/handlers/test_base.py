@@ -5,7 +5,9 @@ from six import text_type
 
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.rest.errors import InputValidationError
+from globaleaks.settings import Settings
 from globaleaks.tests import helpers
+from globaleaks.utils.securetempfile import SecureTemporaryFile
 
 FUTURE = 100
 
@@ -71,3 +73,29 @@ class TestBaseHandler(helpers.TestHandlerWithPopulatedDB):
     def test_validate_regexp_valid(self):
         self.assertTrue(BaseHandler.validate_regexp('Foca', '\w+'))
         self.assertFalse(BaseHandler.validate_regexp('Foca', '\d+'))
+
+    def test_process_file_upload_appends_the_chunks_to_the_flow(self):
+        content = b'antani' * 10000
+
+        for i in range(3):
+            # The chunks are written by the streaming parser to a file of the request
+            chunk = SecureTemporaryFile(Settings.tmp_path)
+            with chunk.open('w'):
+                chunk.write(content)
+
+            handler = self.request()
+            handler.request.args = {
+                b'flowFilename': [b'antani.txt'],
+                b'flowIdentifier': [b'antani'],
+                b'flowChunkNumber': [str(i + 1).encode()],
+                b'flowTotalChunks': [b'3'],
+                b'flowTotalSize': [str(len(content) * 3).encode()],
+                b'file': [chunk]
+            }
+
+            handler.process_file_upload()
+
+        self.assertEqual(handler.uploaded_file['size'], len(content) * 3)
+
+        with handler.uploaded_file['body'].open('r') as f:
+            self.assertEqual(f.read(), content * 3)
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import Deferred, inlineCallbacks
 
-from globaleaks.rest.cache import Cache, gzipdata
+from globaleaks.handlers.base import BaseHandler
+from globaleaks.rest import decorators
+from globaleaks.rest.cache import Cache, etag_match, etagdata, gzipdata
+from globaleaks.settings import Settings
+from globaleaks.state import State
 from globaleaks.tests import helpers
 
 
@@ -20,14 +24,103 @@ class TestCache(helpers.TestGL):
         Cache.set(1, "passante_di_professione", "it", 'text/plain', 'ititit')
         Cache.set(1, "passante_di_professione", "en", 'text/plain', 'enenen')
         Cache.set(2, "passante_di_professione", "ca", 'text/plain', 'cacaca')
-        self.assertTrue("passante_di_professione" in Cache.memory_cache_dict[1])
-        self.assertTrue("passante_di_professione" in Cache.memory_cache_dict[2])
-        self.assertIsNone(Cache.get(1, "passante_di_professione", "ca"))
-        self.assertTrue("it" in Cache.memory_cache_dict[1]['passante_di_professione'])
-        self.assertTrue("en" in Cache.memory_cache_dict[1]['passante_di_professione'])
+        self.assertTrue((1, "passante_di_professione", "it") in Cache.memory_cache_dict)
+        self.assertTrue((1, "passante_di_professione", "en") in Cache.memory_cache_dict)
+        self.assertTrue((2, "passante_di_professione", "ca") in Cache.memory_cache_dict)
         self.assertIsNone(Cache.get(1, "passante_di_professione", "ca"))
         self.assertEqual(Cache.get(1, "passante_di_professione", "it")[1], gzipdata('ititit'))
         self.assertEqual(Cache.get(1, "passante_di_professione", "en")[1], gzipdata('enenen'))
         self.assertEqual(Cache.get(2, "passante_di_professione", "ca")[1], gzipdata('cacaca'))
+        self.assertEqual(Cache.get(1, "passante_di_professione", "it")[2], etagdata('ititit'))
+        self.assertNotEqual(Cache.get(1, "passante_di_professione", "it")[2],
+                            Cache.get(1, "passante_di_professione", "en")[2])
+        Cache.invalidate(2)
+        self.assertIsNone(Cache.get(2, "passante_di_professione", "ca"))
+        self.assertIsNotNone(Cache.get(1, "passante_di_professione", "it"))
         Cache.invalidate()
         self.assertEqual(Cache.memory_cache_dict, {})
+
+    def test_invalidate_without_propagation(self):
+        Cache.set(1, "passante_di_professione", "it", 'text/plain', 'ititit')
+        Cache.set(2, "passante_di_professione", "it", 'text/plain', 'ititit')
+        Cache.invalidate(1, False)
+        self.assertIsNone(Cache.get(1, "passante_di_professione", "it"))
+        self.assertIsNotNone(Cache.get(2, "passante_di_professione", "it"))
+
+    def test_stale_snapshot_is_not_stored(self):
+        version = Cache.get_version(2)
+        Cache.invalidate(2)
+        entry = Cache.set(2, "passante_di_professione", "it", 'text/plain', 'ititit', version)
+        self.assertEqual(entry[1], gzipdata('ititit'))
+        self.assertIsNone(Cache.get(2, "passante_di_professione", "it"))
+
+        # the invalidation of a tenant does not discard the snapshots of the others
+        version = Cache.get_version(2)
+        Cache.invalidate(3)
+        Cache.set(2, "passante_di_professione", "it", 'text/plain', 'ititit', version)
+        self.assertIsNotNone(Cache.get(2, "passante_di_professione", "it"))
+
+        # the invalidation of the root tenant discards the snapshots of every tenant
+        version = Cache.get_version(2)
+        Cache.invalidate(1)
+        Cache.set(2, "passante_di_professione", "it", 'text/plain', 'ititit', version)
+        self.assertIsNone(Cache.get(2, "passante_di_professione", "it"))
+
+    def test_lru_eviction(self):
+        self.patch(Settings, 'api_cache_tenant_size', 200)
+        self.patch(Settings, 'api_cache_size', 300)
+
+        evictions = Cache.stats['evictions']
+        Cache.set(1, "a", "it", 'text/plain', 'a' * 10)
+        Cache.set(1, "b", "it", 'text/plain', 'b' * 10)
+        Cache.get(1, "a", "it")
+        Cache.set(1, "c", "it", 'text/plain', 'c' * 10)
+
+        # the tenant budget evicts the least recently used entry of the tenant
+        self.assertIsNone(Cache.get(1, "b", "it"))
+        self.assertIsNotNone(Cache.get(1, "a", "it"))
+        self.assertIsNotNone(Cache.get(1, "c", "it"))
+        self.assertTrue(Cache.tenant_size[1] <= 200)
+
+        # the global budget evicts the least recently used entry of any tenant
+        Cache.set(2, "a", "it", 'text/plain', 'a' * 10)
+        Cache.set(2, "b", "it", 'text/plain', 'b' * 10)
+        self.assertIsNone(Cache.get(1, "a", "it"))
+        self.assertTrue(Cache.size <= 300)
+        self.assertEqual(Cache.size, sum(Cache.tenant_size.values()))
+        self.assertTrue(Cache.stats['evictions'] > evictions)
+
+    def test_etag_match(self):
+        etag = etagdata('ititit')
+        self.assertTrue(etag_match(etag, etag))
+        self.assertTrue(etag_match(b'W/' + etag, etag))
+        self.assertTrue(etag_match(b'"antani", ' + etag, etag))
+        self.assertTrue(etag_match(b'*', etag))
+        self.assertFalse(etag_match(None, etag))
+        self.assertFalse(etag_match(etagdata('enenen'), etag))
+
+    def test_cache_get_coalesces_concurrent_misses(self):
+        pending = []
+
+        def f(handler):
+            d = Deferred()
+            pending.append(d)
+            return d
+
+        get = decorators.decorator_cache_get(f)
+
+        results = []
+        for _ in range(3):
+            request = helpers.forge_request(uri=b'https://www.globaleaks.org/public')
+            request.language = u'en'
+            get(BaseHandler(State, request)).addCallback(results.append)
+
+        self.assertEqual(len(pending), 1)
+        self.assertEqual(results, [])
+
+        pending[0].callback({'antani': 'sblinda'})
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(Cache.pending, {})
+        self.assertIsNotNone(Cache.get(1, request.path, u'en'))
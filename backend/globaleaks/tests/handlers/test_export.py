@@ -1,9 +1,38 @@
 # -*- coding: utf-8 -*-
+from io import BytesIO
+from zipfile import ZipFile
 
+from globaleaks import models
 from globaleaks.handlers import export
 from globaleaks.jobs.delivery import Delivery
+from globaleaks.orm import transact_ro
+from globaleaks.rest import errors
 from globaleaks.tests import helpers
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks, returnValue
+
+
+def pull_consumer(request):
+    """
+    Emulate a consumer asking for data to the producer after every write
+    """
+    write = request.write
+
+    def registerProducer(producer, streaming):
+        request.producer = producer
+        reactor.callLater(0, producer.resumeProducing)
+
+    def unregisterProducer():
+        request.producer = None
+
+    def write_and_resume(data):
+        write(data)
+        if request.producer is not None:
+            reactor.callLater(0, request.producer.resumeProducing)
+
+    request.registerProducer = registerProducer
+    request.unregisterProducer = unregisterProducer
+    request.write = write_and_resume
 
 
 class TestExportHandler(helpers.TestHandlerWithPopulatedDB):
@@ -23,12 +52,101 @@ class TestExportHandler(helpers.TestHandlerWithPopulatedDB):
         # creates the receiver files
         yield Delivery().run()
 
+        self.rtips_desc = yield self.get_rtips()
+
+    @inlineCallbacks
+    def export(self, headers=None):
+        handler = self.request({}, user_id=self.rtips_desc[0]['receiver_id'], role='receiver', headers=headers)
+
+        pull_consumer(handler.request)
+
+        yield handler.get(self.rtips_desc[0]['id'])
+
+        returnValue(handler.request)
+
+    @transact_ro
+    def get_downloads(self, session):
+        return set(rfile.downloads for rfile in
+                   session.query(models.ReceiverFile).filter(models.ReceiverFile.receivertip_id == self.rtips_desc[0]['id']))
+
     @inlineCallbacks
     def test_export(self):
-        rtips_desc = yield self.get_rtips()
+        export.monitor.reset()
+
+        request = yield self.export()
+
+        body = request.getResponseBody()
+        self.assertEqual(len(body), int(request.responseHeaders.getRawHeaders(b'Content-Length')[0]))
+
+        with ZipFile(BytesIO(body), 'r') as f:
+            self.assertIsNone(f.testzip())
+            self.assertTrue('data.txt' in f.namelist())
+
+        self.assertEqual((yield self.get_downloads()), {1})
+
+        stats = export.monitor.get_stats()
+        self.assertEqual(stats['active'], 0)
+        self.assertEqual(stats['count'], 1)
+        self.assertEqual(stats['bytes'], len(body))
+
+    @inlineCallbacks
+    def test_export_range(self):
+        request = yield self.export()
+
+        body = request.getResponseBody()
+        etag = request.responseHeaders.getRawHeaders(b'ETag')[0]
+
+        for value in [b'bytes=1000-', b'bytes=100-199', b'bytes=-100']:
+            request = yield self.export({'range': value, 'if-range': etag})
+            self.assertEqual(request.responseCode, 206)
+
+            first, last = export.parse_range(value, len(body))
+            self.assertEqual(request.getResponseBody(), body[first:last + 1])
+            self.assertEqual(request.responseHeaders.getRawHeaders(b'Content-Range')[0],
+                             b'bytes %d-%d/%d' % (first, last, len(body)))
+
+        # the requests resuming the export are not accounted as downloads
+        self.assertEqual((yield self.get_downloads()), {1})
+
+        # the range is ignored if the export changed
+        request = yield self.export({'range': b'bytes=1000-', 'if-range': b'"antani"'})
+        self.assertIsNone(request.responseHeaders.getRawHeaders(b'Content-Range'))
+        self.assertEqual(request.getResponseBody(), body)
+
+        yield self.assertFailure(self.export({'range': b'bytes=%d-' % len(body)}),
+                                 errors.RangeNotSatisfiable)
+
+    @inlineCallbacks
+    def test_export_aborted(self):
+        zip_streams = []
+
+        prepare_tip_export = export.prepare_tip_export
+
+        def prepare_tip_export_and_keep_it(cc, tip_export):
+            zip_stream, etag = prepare_tip_export(cc, tip_export)
+
+            # the download is aborted while archiving the first file
+            zip_stream.files.insert(0, {'fo': BytesIO(b'a' * 1000000), 'name': 'a.txt', 'size': 1000000})
+            zip_stream.files.append({'fo': BytesIO(b'b'), 'name': 'b.txt', 'size': 1})
+
+            zip_streams.append(zip_stream)
+            return zip_stream, etag
+
+        self.patch(export, 'prepare_tip_export', prepare_tip_export_and_keep_it)
+
+        handler = self.request({}, user_id=self.rtips_desc[0]['receiver_id'], role='receiver')
+
+        # the connection is lost after the first chunk
+        def registerProducer(producer, streaming):
+            handler.request.producer = producer
+            reactor.callLater(0, producer.resumeProducing)
+
+        handler.request.registerProducer = registerProducer
+        handler.request.write = lambda data: handler.request.producer.stopProducing()
 
-        handler = self.request({}, role='receiver')
-        handler.current_user.user_id = rtips_desc[0]['receiver_id']
+        yield handler.get(self.rtips_desc[0]['id'])
 
-        yield handler.get(rtips_desc[0]['id'])
-        self.assertNotEqual(handler.request.getResponseBody(), b'')
+        # the files of the export are closed
+        for f in zip_streams[0].files:
+            if 'fo' in f:
+                self.assertTrue(f['fo'].closed if isinstance(f['fo'], BytesIO) else f['fo'].fd is None)
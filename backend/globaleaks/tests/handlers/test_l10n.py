@@ -1,4 +1,9 @@
 # -*- coding: utf-8 -*-
+import gzip
+import json
+
+from io import BytesIO
+
 from globaleaks.handlers import l10n
 from globaleaks.handlers.admin import l10n as admin_l10n
 from globaleaks.rest import errors
@@ -13,6 +18,9 @@ custom_texts = {
 class TestL10NHandler(helpers.TestHandler):
     _handler = l10n.L10NHandler
 
+    def decode(self, response):
+        return json.loads(gzip.GzipFile(fileobj=BytesIO(response)).read().decode('utf-8'))
+
     @inlineCallbacks
     def test_get(self):
         handler = self.request()
@@ -20,7 +28,7 @@ class TestL10NHandler(helpers.TestHandler):
 
         handler = self.request()
         response = yield handler.get(lang=u'en')
-        self.assertNotIn('12345', response)
+        self.assertNotIn('12345', self.decode(response))
 
         self._handler = admin_l10n.AdminL10NHandler
         handler = self.request(custom_texts, role='admin')
@@ -29,5 +37,38 @@ class TestL10NHandler(helpers.TestHandler):
         self._handler = l10n.L10NHandler
         handler = self.request()
         response = yield handler.get(lang=u'en')
+        response = self.decode(response)
         self.assertIn('12345', response)
         self.assertEqual('54321', response['12345'])
+
+    @inlineCallbacks
+    def test_get_cached(self):
+        handler = self.request()
+        response = yield handler.get(lang=u'en')
+        etag = handler.request.responseHeaders.getRawHeaders(b'ETag')[0]
+
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders(b'Content-encoding'), [b'gzip'])
+
+        handler = self.request()
+        self.assertEqual((yield handler.get(lang=u'en')), response)
+        self.assertEqual(l10n.L10NCache.get_stats()['entries'], 1)
+
+        handler = self.request(headers={'if-none-match': etag})
+        self.assertEqual((yield handler.get(lang=u'en')), None)
+        self.assertEqual(handler.request.responseCode, 304)
+
+        # the customization of another language does not invalidate the texts
+        self._handler = admin_l10n.AdminL10NHandler
+        handler = self.request(custom_texts, role='admin')
+        yield handler.put(lang=u'it')
+        self.assertEqual(l10n.L10NCache.get_stats()['entries'], 1)
+
+        handler = self.request(custom_texts, role='admin')
+        yield handler.put(lang=u'en')
+        self.assertEqual(l10n.L10NCache.get_stats()['entries'], 0)
+
+        self._handler = l10n.L10NHandler
+        handler = self.request(headers={'if-none-match': etag})
+        response = yield handler.get(lang=u'en')
+        self.assertEqual(self.decode(response)['12345'], '54321')
+        self.assertNotEqual(handler.request.responseHeaders.getRawHeaders(b'ETag')[0], etag)
@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
 import json
 
+from sqlalchemy import event
+
 from globaleaks.handlers import public
-from globaleaks.rest import requests
+from globaleaks.handlers.admin import questionnaire
+from globaleaks.orm import transact_ro
+from globaleaks.rest import decorators, requests
+from globaleaks.rest.cache import Cache
 from globaleaks.tests import helpers
 from twisted.internet.defer import inlineCallbacks
 
@@ -16,3 +21,56 @@ class TestPublicResource(helpers.TestHandlerWithPopulatedDB):
         response = yield handler.get()
 
         self._handler.validate_message(json.dumps(response), requests.PublicResourcesDesc)
+
+    @inlineCallbacks
+    def test_get_with_etag(self):
+        Cache.invalidate()
+
+        get = decorators.decorator_cache_get(self._handler.get, True)
+
+        handler = self.request()
+        yield get(handler)
+        etag = handler.request.responseHeaders.getRawHeaders(b'ETag')[0]
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders(b'Cache-control')[0], b'no-cache')
+
+        handler = self.request(headers={'if-none-match': etag})
+        response = yield get(handler)
+        self.assertIsNone(response)
+        self.assertEqual(handler.request.responseCode, 304)
+
+        handler = self.request(headers={'if-none-match': b'"antani"'})
+        response = yield get(handler)
+        self.assertEqual(response, Cache.get(1, handler.get_cache_resource(), handler.request.language)[1])
+
+
+class TestQuestionnaireSerialization(helpers.TestGLWithPopulatedDB):
+    complex_field_population = True
+
+    @transact_ro
+    def serialize_questionnaires(self, session):
+        queries = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            queries.append(statement)
+
+        engine = session.get_bind()
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            ret = questionnaire.db_get_questionnaire_list(session, 1, u'en')
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+        return ret, len(queries)
+
+    @inlineCallbacks
+    def test_queries_do_not_depend_on_the_number_of_fields(self):
+        yield questionnaire.duplicate_questionnaire(1, u'default', u'copy')
+        ret1, count1 = yield self.serialize_questionnaires()
+
+        for i in range(4):
+            yield questionnaire.duplicate_questionnaire(1, u'default', u'copy %d' % i)
+
+        ret2, count2 = yield self.serialize_questionnaires()
+
+        self.assertEqual(len(ret2), len(ret1) + 4)
+        self.assertEqual(count1, count2)
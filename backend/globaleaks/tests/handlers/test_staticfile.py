@@ -1,4 +1,9 @@
 # -*- coding: utf-8 -*-
+import gzip
+import os
+import re
+
+from io import BytesIO
 from six import text_type
 from twisted.internet.defer import inlineCallbacks
 
@@ -23,3 +28,49 @@ class TestStaticFileHandler(helpers.TestHandler):
         handler = self.request(kwargs={'path': Settings.client_path})
 
         return self.assertRaises(errors.ResourceNotFound, handler.get, u'unexistent')
+
+    @inlineCallbacks
+    def test_get_versioned_asset(self):
+        handler = self.request(kwargs={'path': Settings.client_path})
+        yield handler.get('')
+
+        index = text_type(handler.request.getResponseBody(), 'utf-8')
+        version = re.search('href="css/main.css\?v=([0-9a-f]+)"', index).group(1)
+
+        handler = self.request(kwargs={'path': Settings.client_path})
+        handler.request.args = {b'v': [version.encode()]}
+        yield handler.get('css/main.css')
+
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders(b'Cache-control')[0],
+                         b'public, max-age=31536000, immutable')
+
+    @inlineCallbacks
+    def test_get_with_accept_encoding(self):
+        for encoding in [None, b'gzip', b'gzip;q=0, deflate']:
+            headers = {'accept-encoding': encoding} if encoding else {}
+            handler = self.request(kwargs={'path': Settings.client_path}, headers=headers)
+            yield handler.get('css/main.css')
+
+            content_encoding = handler.request.responseHeaders.getRawHeaders(b'Content-encoding')
+            body = handler.request.getResponseBody()
+            if encoding == b'gzip':
+                self.assertEqual(content_encoding, [b'gzip'])
+                body = gzip.GzipFile(fileobj=BytesIO(body)).read()
+            else:
+                self.assertIsNone(content_encoding)
+
+            with open(os.path.join(Settings.client_path, 'css/main.css'), 'rb') as f:
+                self.assertEqual(body, f.read())
+
+    @inlineCallbacks
+    def test_get_not_modified(self):
+        handler = self.request(kwargs={'path': Settings.client_path})
+        yield handler.get('css/main.css')
+
+        etag = handler.request.responseHeaders.getRawHeaders(b'ETag')[0]
+
+        handler = self.request(kwargs={'path': Settings.client_path}, headers={'if-none-match': etag})
+        yield handler.get('css/main.css')
+
+        self.assertEqual(handler.request.responseCode, 304)
+        self.assertEqual(handler.request.written, [])
@@ -1,13 +1,20 @@
 # -*- coding: utf-8 -*-
+import time
+
 from twisted.internet.defer import inlineCallbacks, returnValue
 
+from globaleaks import models
 from globaleaks.handlers import authentication, wbtip
-from globaleaks.handlers.submission import SubmissionInstance
+from globaleaks.handlers.admin.step import update_step
+from globaleaks.handlers.submission import ArchivedSchemaCache, QuestionnaireSchemaCache, SubmissionInstance
 from globaleaks.jobs import delivery
 from globaleaks.models.config import db_set_config_variable
-from globaleaks.orm import tw
+from globaleaks.orm import transact, tw
 from globaleaks.rest import errors
+from globaleaks.settings import Settings
 from globaleaks.tests import helpers
+from globaleaks.utils import kdf
+from globaleaks.utils.log import log
 
 
 class TestSubmissionEncryptedScenario(helpers.TestHandlerWithPopulatedDB):
@@ -52,6 +59,25 @@ class TestSubmissionEncryptedScenario(helpers.TestHandlerWithPopulatedDB):
         self.submission_desc = yield self.get_dummy_submission(self.dummyContext['id'])
         yield self.create_submission(self.submission_desc)
 
+    @transact
+    def set_score_threshold_receipt(self, session, score_threshold_receipt):
+        session.query(models.Context).update({'score_threshold_receipt': score_threshold_receipt})
+
+    @inlineCallbacks
+    def test_create_submission_without_receipt(self):
+        yield self.set_score_threshold_receipt(2)
+        self.state.tenant_cache[1].enable_scoring_system = True
+
+        kdf.executor.reset()
+
+        self.submission_desc = yield self.get_dummy_submission(self.dummyContext['id'])
+        receipt = yield self.create_submission(self.submission_desc)
+
+        # No receipt is hashed for the submissions not issuing it
+        self.assertEqual(receipt, '')
+        self.assertEqual(kdf.executor.get_stats()['count'], 0)
+        yield self.test_model_count(models.WhistleblowerTip, 0)
+
     @inlineCallbacks
     def test_create_submission_attach_files_finalize_and_verify_file_creation(self):
         self.submission_desc = yield self.get_dummy_submission(self.dummyContext['id'])
@@ -159,3 +185,101 @@ class TestSubmissionPlaintextScenario(TestSubmissionEncryptedScenario):
         'encrypted': 0,
         'reference': 6
     }
+
+
+class TestArchivedSchemaCache(helpers.TestGLWithPopulatedDB):
+    @inlineCallbacks
+    def setUp(self):
+        yield helpers.TestGLWithPopulatedDB.setUp(self)
+        yield self.perform_full_submission_actions()
+        ArchivedSchemaCache.clear()
+
+    @transact
+    def get_questionnaire(self, session, language):
+        hash = session.query(models.ArchivedSchema.hash).first()[0]
+        return ArchivedSchemaCache.get_questionnaire(session, hash, language)
+
+    @inlineCallbacks
+    def test_get_questionnaire(self):
+        stats = ArchivedSchemaCache.get_stats()
+
+        x = yield self.get_questionnaire(u'en')
+        y = yield self.get_questionnaire(u'en')
+        self.assertIs(x, y)
+
+        z = yield self.get_questionnaire(u'it')
+        self.assertIsNot(x, z)
+
+        self.assertEqual(ArchivedSchemaCache.get_stats()['hits'], stats['hits'] + 1)
+        self.assertEqual(ArchivedSchemaCache.get_stats()['misses'], stats['misses'] + 2)
+        self.assertEqual(ArchivedSchemaCache.get_stats()['entries'], 2)
+
+    @inlineCallbacks
+    def test_memory_limit(self):
+        yield self.get_questionnaire(u'en')
+
+        size = ArchivedSchemaCache.get_stats()['size']
+        evictions = ArchivedSchemaCache.get_stats()['evictions']
+
+        self.patch(Settings, 'archived_schema_cache_size', size)
+
+        yield self.get_questionnaire(u'it')
+
+        stats = ArchivedSchemaCache.get_stats()
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['evictions'], evictions + 1)
+        self.assertEqual(stats['size'], size)
+
+
+class TestSubmissionThroughput(helpers.TestGLWithPopulatedDB):
+    """
+    Benchmark of the throughput of the submissions with and without the
+    cache of the questionnaire schemas
+    """
+    submissions = 10
+
+    @inlineCallbacks
+    def perform_submissions(self, invalidate):
+        start = time.time()
+
+        for _ in range(self.submissions):
+            if invalidate:
+                QuestionnaireSchemaCache.invalidate()
+
+            yield self.perform_submission_actions(self.perform_submission_start())
+
+        elapsed = time.time() - start
+
+        log.info("%d submissions in %.3f seconds (%.2f submissions/s, cache %s)",
+                 self.submissions, elapsed, self.submissions / elapsed, 'disabled' if invalidate else 'enabled')
+
+    @inlineCallbacks
+    def test_submission_throughput(self):
+        yield self.perform_submissions(True)
+
+        stats = dict(QuestionnaireSchemaCache.stats)
+
+        yield self.perform_submissions(False)
+
+        # in the steady state the questionnaire is neither serialized nor archived
+        self.assertEqual(QuestionnaireSchemaCache.stats['misses'], stats['misses'])
+        self.assertEqual(QuestionnaireSchemaCache.stats['hits'], stats['hits'] + self.submissions)
+
+        yield self.test_model_count(models.ArchivedSchema, 1)
+
+    @inlineCallbacks
+    def test_invalidation_on_questionnaire_change(self):
+        yield self.perform_submission_actions(self.perform_submission_start())
+        yield self.perform_submission_actions(self.perform_submission_start())
+
+        self.assertIsNotNone(QuestionnaireSchemaCache.get(1, self.dummyContext['questionnaire_id']))
+
+        step = self.dummyQuestionnaire['steps'][1]
+        step['label'] = u'new label'
+        yield update_step(1, step['id'], step, u'en')
+
+        self.assertIsNone(QuestionnaireSchemaCache.get(1, self.dummyContext['questionnaire_id']))
+
+        yield self.perform_submission_actions(self.perform_submission_start())
+
+        yield self.test_model_count(models.ArchivedSchema, 2)
@@ -50,8 +50,9 @@ from globaleaks.handlers.admin.questionnaire import get_questionnaire, db_get_qu
 from globaleaks.handlers.admin.step import create_step
 from globaleaks.handlers.admin.tenant import create as create_tenant
 from globaleaks.handlers.admin.user import create_user
+from globaleaks.handlers.l10n import L10NCache
 from globaleaks.handlers.wizard import db_wizard
-from globaleaks.handlers.submission import create_submission
+from globaleaks.handlers.submission import create_submission, QuestionnaireSchemaCache
 from globaleaks.models.config import db_set_config_variable
 from globaleaks.rest import decorators
 from globaleaks.sessions import Sessions
@@ -168,6 +169,10 @@ def init_state():
         dir_util.remove_tree(Settings.working_path, 0)
 
     orm.set_thread_pool(FakeThreadPool())
+    orm.set_write_thread_pool(FakeThreadPool())
+    State.delivery_tp = FakeThreadPool()
+    State.kdf_tp = FakeThreadPool()
+    State.export_tp = FakeThreadPool()
 
     State.settings.enable_api_cache = False
     State.tenant_cache[1] = ObjectDict()
@@ -178,6 +183,9 @@ def init_state():
 
     Sessions.clear()
 
+    QuestionnaireSchemaCache.invalidate()
+    L10NCache.invalidate()
+
 
 @transact
 def mock_users_keys(session):
@@ -293,7 +301,7 @@ def get_dummy_file(filename=None, content=None):
         f.write(content)
         f.finalize_write()
 
-    State.TempUploadFiles[os.path.basename(temporary_file.filepath)] = temporary_file
+    State.TempUploadFiles.set(os.path.basename(temporary_file.filepath), temporary_file)
 
     return {
         'date': datetime_now(),
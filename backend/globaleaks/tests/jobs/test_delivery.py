@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+import os
+
+from twisted.internet.defer import inlineCallbacks
+
+from globaleaks import models
+from globaleaks.handlers import rtip
+from globaleaks.jobs import delivery
+from globaleaks.orm import transact
+from globaleaks.settings import Settings
+from globaleaks.state import State
+from globaleaks.tests import helpers
+from globaleaks.utils.pgp import PGPContext
+
+
+class TestDelivery(helpers.TestGL):
+    content = b'antani' * 100000
+
+    def get_receiverfiles_map(self, receivers):
+        dummy_file = helpers.get_dummy_file(content=self.content)
+
+        return dummy_file['body'], {
+            'tid': 1,
+            'crypto_tip_pub_key': b'',
+            'id': u'id',
+            'filename': dummy_file['filename'],
+            'plaintext_file_needed': False,
+            'rfiles': [{
+                'id': u'id%d' % i,
+                'status': u'processing',
+                'filename': dummy_file['filename'],
+                'size': len(self.content),
+                'receiver': receiver
+            } for i, receiver in enumerate(receivers)]
+        }
+
+    def get_receiver(self, key_name):
+        if not key_name:
+            return {'name': u'receiver', 'pgp_key_public': u'', 'pgp_key_fingerprint': u''}
+
+        key = helpers.PGPKEYS[key_name]
+
+        return {
+            'name': u'receiver',
+            'pgp_key_public': key,
+            'pgp_key_fingerprint': PGPContext().load_key(key)['fingerprint']
+        }
+
+    def test_process_receiverfile_fans_out_plaintext(self):
+        receivers = [self.get_receiver('VALID_PGP_KEY1_PUB'),
+                     self.get_receiver('VALID_PGP_KEY2_PUB'),
+                     self.get_receiver(None)]
+
+        sf, receiverfiles_map = self.get_receiverfiles_map(receivers)
+
+        size = delivery.process_receiverfile(receiverfiles_map, sf, True, State.pgp_keyring)
+
+        self.assertEqual(size, len(self.content))
+
+        rfiles = receiverfiles_map['rfiles']
+        self.assertEqual([rf['status'] for rf in rfiles], [u'encrypted', u'encrypted', u'reference'])
+        self.assertTrue(receiverfiles_map['plaintext_file_needed'])
+
+        # The receivers with a PGP key share a file encrypted for all of them
+        self.assertEqual(rfiles[0]['filename'], rfiles[1]['filename'])
+
+        # The keys used are released once the file is encrypted
+        self.assertEqual(State.pgp_keyring.pins, {})
+
+        for key_name in ['VALID_PGP_KEY1_PRV', 'VALID_PGP_KEY2_PRV']:
+            pgpctx = PGPContext()
+            pgpctx.load_key(helpers.PGPKEYS[key_name])
+
+            with open(os.path.join(Settings.attachments_path, rfiles[0]['filename']), 'rb') as f:
+                self.assertEqual(pgpctx.gnupg.decrypt_file(f).data, self.content)
+
+        with open(os.path.join(Settings.attachments_path, rfiles[2]['filename']), 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_process_receiverfile_with_expired_key(self):
+        receivers = [self.get_receiver('VALID_PGP_KEY1_PUB'),
+                     self.get_receiver('EXPIRED_PGP_KEY_PUB')]
+
+        sf, receiverfiles_map = self.get_receiverfiles_map(receivers)
+
+        delivery.process_receiverfile(receiverfiles_map, sf, False, State.pgp_keyring)
+
+        rfiles = receiverfiles_map['rfiles']
+        self.assertEqual([rf['status'] for rf in rfiles], [u'encrypted', u'unavailable'])
+        self.assertFalse(receiverfiles_map['plaintext_file_needed'])
+
+    def test_process_receiverfile_with_plaintext_failure(self):
+        receivers = [self.get_receiver('VALID_PGP_KEY1_PUB'),
+                     self.get_receiver(None)]
+
+        sf, receiverfiles_map = self.get_receiverfiles_map(receivers)
+
+        def write(sink, chunk):
+            raise IOError()
+
+        self.patch(delivery.PlaintextFileSink, 'write', write)
+
+        delivery.process_receiverfile(receiverfiles_map, sf, True, State.pgp_keyring)
+
+        rfiles = receiverfiles_map['rfiles']
+        self.assertEqual([rf['status'] for rf in rfiles], [u'encrypted', u'unavailable'])
+
+    def test_executor_stats(self):
+        executor = delivery.DeliveryExecutor()
+
+        sf, receiverfiles_map = self.get_receiverfiles_map([self.get_receiver(None)])
+
+        d = executor.run(helpers.FakeThreadPool(), delivery.process_receiverfile, receiverfiles_map, sf, True, State.pgp_keyring)
+
+        def check(_):
+            stats = executor.get_stats()
+            self.assertEqual(stats['queued'], 0)
+            self.assertEqual(stats['running'], 0)
+            self.assertEqual(stats['files'], 1)
+            self.assertEqual(stats['bytes'], len(self.content))
+
+        return d.addCallback(check)
+
+
+class TestDeliveryJob(helpers.TestGLWithPopulatedDB):
+    @transact
+    def get_files(self, session):
+        return [(ifile.filename, [rfile.status for rfile in
+                                  session.query(models.ReceiverFile).filter(models.ReceiverFile.internalfile_id == ifile.id)])
+                for ifile in session.query(models.InternalFile)]
+
+    @inlineCallbacks
+    def test_delivery_of_missing_files(self):
+        yield self.perform_minimal_submission()
+
+        files = yield self.get_files()
+        self.assertTrue(files)
+
+        # The temporary files of the uploads are lost before the delivery
+        for key in list(State.TempUploadFiles.files):
+            State.TempUploadFiles.delete(key)
+
+        yield self.assertFailure(delivery.Delivery().operation(), Exception)
+
+        # The failed files are not renamed and are marked as unavailable
+        for (filename, _), (new_filename, statuses) in zip(files, (yield self.get_files())):
+            self.assertEqual(new_filename, filename)
+            self.assertTrue(statuses)
+            self.assertEqual(set(statuses), {u'unavailable'})
+
+    @transact
+    def get_wbfiles_new(self, session):
+        return [wbfile.new for wbfile in session.query(models.WhistleblowerFile)]
+
+    @inlineCallbacks
+    def test_delivery_of_whistleblower_files_with_failure(self):
+        yield self.perform_full_submission_actions()
+
+        for rtip_desc in (yield self.get_rtips()):
+            yield rtip.register_wbfile_on_db(1, rtip_desc['id'], helpers.get_dummy_file())
+
+        def process_whistleblowerfile(whistleblowerfiles_map, sf):
+            raise Exception('failure')
+
+        process = delivery.process_whistleblowerfile
+        self.patch(delivery, 'process_whistleblowerfile', process_whistleblowerfile)
+
+        yield self.assertFailure(delivery.Delivery().operation(), Exception)
+        self.flushLoggedErrors()
+
+        # The files failed are left new and are retried at the next run
+        wbfiles_new = yield self.get_wbfiles_new()
+        self.assertTrue(wbfiles_new)
+        self.assertEqual(set(wbfiles_new), {True})
+
+        self.patch(delivery, 'process_whistleblowerfile', process)
+
+        yield delivery.Delivery().operation()
+
+        wbfiles_new = yield self.get_wbfiles_new()
+        self.assertEqual(set(wbfiles_new), {False})
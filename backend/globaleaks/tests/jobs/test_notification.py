@@ -3,8 +3,21 @@ from twisted.internet.defer import inlineCallbacks, succeed
 
 from globaleaks import models
 from globaleaks.jobs.delivery import Delivery
-from globaleaks.jobs.notification import Notification
+from globaleaks.jobs.notification import MailGenerator, Notification
+from globaleaks.orm import transact
+from globaleaks.state import State
 from globaleaks.tests import helpers
+from globaleaks.utils.utility import datetime_now
+
+
+@transact
+def get_due_mails_count(session):
+    return session.query(models.Mail).filter(models.Mail.next_attempt <= datetime_now()).count()
+
+
+@transact
+def expire_mails_backoff(session):
+    session.query(models.Mail).update({'next_attempt': datetime_now()})
 
 
 class TestNotification(helpers.TestGLWithPopulatedDB):
@@ -34,16 +47,50 @@ class TestNotification(helpers.TestGLWithPopulatedDB):
         notification = Notification()
         notification.skip_sleep = True
 
-        def sendmail_failure(_):
-            # simulate the failure just returning with no action
-            return succeed(None)
+        def sendmail_failure(tid, mails):
+            # simulate the failure of all the mails of the batch
+            return succeed({})
 
         notification.sendmail = sendmail_failure
 
-        for _ in range(10):
+        for i in range(10):
             yield notification.run()
             yield self.test_model_count(models.Mail, 24)
 
+            # failed mails are not retried before their backoff expires
+            count = yield get_due_mails_count()
+            self.assertEqual(count, 0)
+
+            yield expire_mails_backoff()
+
         yield notification.run()
 
         yield self.test_model_count(models.Mail, 0)
+
+    @inlineCallbacks
+    def test_generate_stats(self):
+        yield Delivery().run()
+
+        stats = yield MailGenerator(State).generate()
+
+        self.assertEqual(sorted(stats.keys()), ['Comment', 'Message', 'ReceiverFile', 'ReceiverTip'])
+        self.assertEqual(sum(x['mails'] for x in stats.values()), 24)
+        yield self.test_model_count(models.Mail, 24)
+
+        # all the triggers have been marked as notified
+        stats = yield MailGenerator(State).generate()
+        self.assertEqual(sum(x['count'] for x in stats.values()), 0)
+
+    @inlineCallbacks
+    def test_generate_for_silent_tenant(self):
+        yield Delivery().run()
+
+        State.tenant_cache[1].notification.disable_receiver_notification_emails = True
+
+        try:
+            stats = yield MailGenerator(State).generate()
+        finally:
+            State.tenant_cache[1].notification.disable_receiver_notification_emails = False
+
+        self.assertEqual(sum(x['count'] for x in stats.values()), 0)
+        yield self.test_model_count(models.Mail, 0)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from globaleaks import models
+from globaleaks.orm import transact
+from globaleaks.tests import helpers
+
+
+class TestIndexes(helpers.TestGL):
+    def explain(self, session, query):
+        statement = query.statement.compile(session.get_bind(), compile_kwargs={'literal_binds': True})
+        return ' '.join(x[-1] for x in session.execute('EXPLAIN QUERY PLAN %s' % statement))
+
+    def assertUsesIndex(self, session, query, index):
+        self.assertIn('USING INDEX %s' % index, self.explain(session, query))
+
+    @transact
+    def _test_foreign_keys_indexes(self, session):
+        for model, column, index in [
+            (models.Comment, 'internaltip_id', 'idx_comment_internaltip_id'),
+            (models.InternalFile, 'internaltip_id', 'idx_internalfile_internaltip_id'),
+            (models.Message, 'receivertip_id', 'idx_message_receivertip_id'),
+            (models.ReceiverFile, 'internalfile_id', 'idx_receiverfile_internalfile_id'),
+            (models.ReceiverFile, 'receivertip_id', 'idx_receiverfile_receivertip_id'),
+            (models.ReceiverTip, 'internaltip_id', 'idx_receivertip_internaltip_id'),
+            (models.ReceiverTip, 'receiver_id', 'idx_receivertip_receiver_id'),
+            (models.WhistleblowerFile, 'receivertip_id', 'idx_whistleblowerfile_receivertip_id')]:
+            query = session.query(model).filter(getattr(model, column) == u'id')
+            self.assertUsesIndex(session, query, index)
+
+    @transact
+    def _test_new_flag_indexes(self, session):
+        for model in [models.Comment, models.InternalFile, models.Message,
+                      models.ReceiverFile, models.ReceiverTip, models.WhistleblowerFile]:
+            query = session.query(model).filter(model.new == True)
+            self.assertUsesIndex(session, query, 'idx_%s_new' % model.__tablename__)
+
+    @transact
+    def _test_config_indexes(self, session):
+        query = session.query(models.Config).filter(models.Config.tid == 1,
+                                                    models.Config.var_name == u'name')
+        self.assertUsesIndex(session, query, 'sqlite_autoindex_config_1')
+
+        query = session.query(models.ConfigL10N).filter(models.ConfigL10N.tid == 1,
+                                                        models.ConfigL10N.lang == u'en',
+                                                        models.ConfigL10N.var_name == u'header_title_homepage')
+        self.assertUsesIndex(session, query, 'sqlite_autoindex_config_l10n_1')
+
+    def test_foreign_keys_indexes(self):
+        return self._test_foreign_keys_indexes()
+
+    def test_new_flag_indexes(self):
+        return self._test_new_flag_indexes()
+
+    def test_config_indexes(self):
+        return self._test_config_indexes()
@@ -1,12 +1,16 @@
 # -*- coding: utf-8 -*-
+import time
+
 from twisted.internet.address import IPv4Address
 from twisted.internet.defer import inlineCallbacks
 
 from globaleaks.db import refresh_memory_variables
 from globaleaks.handlers.admin.node import db_update_enabled_languages
 from globaleaks.orm import tw
+from globaleaks.rest import router
 from globaleaks.state import State
 from globaleaks.tests.helpers import TestGL, forge_request
+from globaleaks.utils.log import log
 
 
 class TestAPI(TestGL):
@@ -42,6 +46,13 @@ class TestAPI(TestGL):
                                               'custodian'], check_roles))
             self.assertTrue(len(rest) == 0)
 
+    def test_is_upload_path(self):
+        self.assertTrue(self.api.is_upload_path(b'/wbtip/rfile'))
+        self.assertTrue(self.api.is_upload_path(b'/t/2/wbtip/rfile?flowChunkNumber=1'))
+        self.assertFalse(self.api.is_upload_path(b'/wbtip'))
+        self.assertFalse(self.api.is_upload_path(b'/unexistent'))
+        self.assertFalse(self.api.is_upload_path(b'/\xff'))
+
     def test_get_with_no_language_header(self):
         request = forge_request()
         self.assertEqual(self.api.detect_language(request), 'en')
@@ -115,3 +126,87 @@ class TestAPI(TestGL):
         self.api.render(request)
         self.assertTrue(request.client_using_tor)
         self.assertEqual(request.responseCode, 200)
+
+
+class TestRouter(TestGL):
+    paths = [
+        u'/',
+        u'/index.html',
+        u'/js/scripts.min.js',
+        u'/authentication',
+        u'/public',
+        u'/rtip/7ce765d6-1c5f-4dc7-8b98-a9f58ba3ba1e/comments',
+        u'/wbtip/comments',
+        u'/admin',
+        u'/admin/node',
+        u'/admin/users/7ce765d6-1c5f-4dc7-8b98-a9f58ba3ba1e',
+        u'/admin/tenants/12',
+        u'/admin/l10n/en',
+        u'/admin/files/logo',
+        u'/admin/files/antani',
+        u'/admin/antani',
+        u'/l10n/it',
+        u'/robots.txt',
+        u'/robotsxtxt',
+        u'/s/favicon',
+        u'/.well-known/acme-challenge/antani',
+        u'/signup/antani',
+        u'/antani/antani',
+        u'/%%%'
+    ]
+
+    @inlineCallbacks
+    def setUp(self):
+        yield TestGL.setUp(self)
+
+        from globaleaks.rest import api
+        self.router = api.APIResourceWrapper().router
+
+    def linear_match(self, path):
+        for regexp, handler, args in self.router.routes:
+            match = regexp.match(path)
+            if match:
+                return handler, args, match.groups()
+
+    def test_match(self):
+        for path in self.paths:
+            self.assertEqual(self.router.match(path), self.linear_match(path))
+
+            # the resolution is cached
+            self.assertEqual(self.router.match(path), self.linear_match(path))
+
+        stats = self.router.get_stats()
+        self.assertEqual(stats['entries'], len(self.paths))
+        self.assertEqual(stats['hits'], len(self.paths))
+
+    def test_get_route_segment(self):
+        self.assertEqual(router.get_route_segment(u'^/admin/files$'), u'admin')
+        self.assertEqual(router.get_route_segment(u'^/wizard$'), u'wizard')
+        self.assertEqual(router.get_route_segment(u'^/l10n/(en|it)$'), u'l10n')
+        self.assertIsNone(router.get_route_segment(u'^/robots.txt$'))
+        self.assertIsNone(router.get_route_segment(u'^/admins?$'))
+        self.assertIsNone(router.get_route_segment(u'^/admin/node|/wizard$'))
+        self.assertIsNone(router.get_route_segment(u'^(/admin|/login)$'))
+
+    def test_benchmark(self):
+        n = 1000
+
+        for cache_size in [0, 1024]:
+            self.router.cache_size = cache_size
+            self.router.clear()
+
+            start = time.time()
+            for _ in range(n):
+                for path in self.paths:
+                    self.router.match(path)
+
+            log.info("Dispatch with cache size %d: %fus",
+                     cache_size, (time.time() - start) * 1000000 / (n * len(self.paths)))
+
+        start = time.time()
+        for _ in range(n):
+            for path in self.paths:
+                self.linear_match(path)
+
+        log.info("Dispatch by linear scan: %fus",
+                 (time.time() - start) * 1000000 / (n * len(self.paths)))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import time
+
+from globaleaks.db.appdata import AppDataCache, load_appdata
+from globaleaks.settings import Settings
+from globaleaks.tests import helpers
+from globaleaks.utils.log import log
+from globaleaks.utils.utility import read_json_file
+
+
+class TestAppData(helpers.TestGL):
+    def test_load_appdata(self):
+        AppDataCache.invalidate()
+        stats = AppDataCache.get_stats()
+
+        appdata = load_appdata()
+        self.assertTrue(load_appdata() is appdata)
+        self.assertEqual(appdata['node'], read_json_file(Settings.appdata_file)['node'])
+
+        self.assertEqual(AppDataCache.get_stats()['loads'], stats['loads'] + 1)
+        self.assertEqual(AppDataCache.get_stats()['hits'], stats['hits'] + 1)
+
+    def test_reload_on_change(self):
+        path = os.path.join(Settings.tmp_path, 'appdata.json')
+        shutil.copyfile(Settings.appdata_file, path)
+
+        appdata = AppDataCache.get(path)
+
+        # a file touched but not changed is not parsed again
+        os.utime(path, (0, 0))
+        self.assertTrue(AppDataCache.get(path) is appdata)
+
+        with open(path, 'a') as f:
+            f.write(' ')
+
+        self.assertFalse(AppDataCache.get(path) is appdata)
+
+    def test_get_texts(self):
+        appdata = load_appdata()
+
+        texts = appdata.get_texts('templates', 'en')
+        self.assertTrue(appdata.get_texts('templates', 'en') is texts)
+
+        for key, value in appdata['templates'].items():
+            self.assertEqual(texts[key], value['en'])
+
+    def test_benchmark(self):
+        n = 100
+
+        AppDataCache.invalidate()
+
+        start = time.time()
+        load_appdata()
+        first = time.time() - start
+
+        start = time.time()
+        for _ in range(n):
+            load_appdata()
+        following = (time.time() - start) / n
+
+        log.info("Load of the appdata: first %fms, following %fms", first * 1000, following * 1000)
+
+        self.assertTrue(following < first)
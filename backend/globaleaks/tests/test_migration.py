@@ -8,13 +8,16 @@ for each version one an empty and a populated db must be sessiond in directories
 import os
 import shutil
 
+from twisted.internet.defer import inlineCallbacks
 from twisted.trial import unittest
 
 from globaleaks import DATABASE_VERSION, FIRST_DATABASE_VERSION_SUPPORTED, models
 from globaleaks.db import update_db
+from globaleaks.db.appdata import load_appdata
+from globaleaks.db.migration import get_data_fingerprint, perform_data_update
 from globaleaks.db.migrations import update_37
 from globaleaks.models import config
-from globaleaks.orm import get_session, make_db_uri, set_db_uri
+from globaleaks.orm import get_session, make_db_uri, set_db_uri, transact
 from globaleaks.settings import Settings
 from globaleaks.tests import helpers
 
@@ -90,6 +93,42 @@ class TestMigrationRoutines(unittest.TestCase):
         session.close()
 
 
+class TestDataUpdate(helpers.TestGL):
+    @transact
+    def set_val(self, session, var_name, value, fingerprint):
+        session.query(models.ConfigL10N).filter(models.ConfigL10N.tid == 1,
+                                                models.ConfigL10N.lang == u'en',
+                                                models.ConfigL10N.var_name == var_name).one().value = value
+
+        if fingerprint is not None:
+            config.ConfigFactory(session, 1).set_val(u'data_fingerprint', fingerprint)
+
+    @transact
+    def get_val(self, session, var_name):
+        return config.ConfigL10NFactory(session, 1).get_val(var_name, u'en')
+
+    @inlineCallbacks
+    def test_perform_data_update(self):
+        default = load_appdata()['node']['whistleblowing_button']['en']
+
+        perform_data_update(Settings.db_file_path)
+
+        # the update is skipped if the data did not change
+        yield self.set_val(u'whistleblowing_button', u'antani', None)
+        perform_data_update(Settings.db_file_path)
+        self.assertEqual((yield self.get_val(u'whistleblowing_button')), u'antani')
+
+        yield self.set_val(u'whistleblowing_button', u'antani', u'')
+        perform_data_update(Settings.db_file_path)
+        self.assertEqual((yield self.get_val(u'whistleblowing_button')), default)
+
+        session = get_session(make_db_uri(Settings.db_file_path))
+        fingerprint = config.ConfigFactory(session, 1).get_val(u'data_fingerprint')
+        session.close()
+
+        self.assertEqual(fingerprint, get_data_fingerprint())
+
+
 def test(path, version):
     return lambda self: self._test(path, version)
 
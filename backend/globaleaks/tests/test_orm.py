@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
+from sqlalchemy.exc import OperationalError
+
 from globaleaks.models import Tenant
-from globaleaks.orm import get_session, transact
+from globaleaks.orm import WRITE_QUEUE_SIZE, get_db_uri, get_pool_stats, get_pooled_engine, get_session, \
+    get_write_queue, transact, transact_ro
+from globaleaks.rest import errors
 from globaleaks.tests import helpers
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import DeferredList, inlineCallbacks
 
 
 class TestORM(helpers.TestGL):
@@ -14,6 +18,7 @@ class TestORM(helpers.TestGL):
         self.assertEqual(session.execute("PRAGMA foreign_keys").fetchone()[0], 1)  # ON
         self.assertEqual(session.execute("PRAGMA secure_delete").fetchone()[0], 1)  # ON
         self.assertEqual(session.execute("PRAGMA auto_vacuum").fetchone()[0], 1)   # FULL
+        self.assertEqual(session.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
 
     @transact
     def _transact_with_success(self, session):
@@ -24,6 +29,14 @@ class TestORM(helpers.TestGL):
         self.db_add_config(session)
         raise Exception("antani")
 
+    @transact_ro
+    def _transact_ro_with_write(self, session):
+        self.db_add_config(session)
+
+    @transact_ro
+    def _transact_ro_count(self, session):
+        return session.query(Tenant).count()
+
     def db_add_config(self, session):
         session.add(Tenant())
 
@@ -50,9 +63,52 @@ class TestORM(helpers.TestGL):
 
         self.assertEqual(count1, count2)
 
+    @inlineCallbacks
+    def test_transact_ro(self):
+        count = yield self._transact_ro_count()
+        self.assertEqual(count, 1)
+
+        yield self.assertFailure(self._transact_ro_with_write(), OperationalError)
+
+        count = yield self._transact_ro_count()
+        self.assertEqual(count, 1)
+
+    @inlineCallbacks
+    def test_pooled_engine_is_reused(self):
+        engine = get_pooled_engine()
+
+        yield self._transact_with_success()
+        yield self._transact_with_success()
+
+        self.assertIs(get_pooled_engine(), engine)
+
+        stats = get_pool_stats()[get_db_uri()]['readwrite']
+        self.assertEqual(stats['connects'], 1)
+        self.assertEqual(stats['waits'], 0)
+        self.assertTrue(stats['checkouts'] >= 2)
+
     def test_transact_decorate_function(self):
         @transact
         def transaction(session):
             self.assertTrue(getattr(session, 'query'))
 
         return transaction()
+
+    @inlineCallbacks
+    def test_write_queue_rejects_the_transactions_exceeding_its_size(self):
+        queue = get_write_queue()
+
+        # the slots are all taken by transactions in progress
+        tokens = queue.tokens
+        for _ in range(tokens):
+            queue.acquire()
+
+        try:
+            dl = [self._transact_with_success() for _ in range(WRITE_QUEUE_SIZE)]
+
+            yield self.assertFailure(self._transact_with_success(), errors.ServiceOverloaded)
+        finally:
+            for _ in range(tokens):
+                queue.release()
+
+        yield DeferredList(dl, fireOnOneErrback=True)
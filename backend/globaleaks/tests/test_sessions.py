@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from globaleaks.sessions import Session, Sessions
+from globaleaks.tests import helpers
+
+
+class TestSessions(helpers.TestGL):
+    def test_new_revokes_the_previous_session_of_the_user(self):
+        first = Sessions.new(1, u'user', 'receiver', False, '')
+        other = Sessions.new(1, u'other', 'receiver', False, '')
+        second = Sessions.new(1, u'user', 'receiver', False, '')
+
+        self.assertTrue(Sessions.get(first.id) is None)
+        self.assertTrue(Sessions.get(second.id) is second)
+        self.assertTrue(Sessions.get(other.id) is other)
+        self.assertEqual(Sessions.user_sessions[(1, u'user')], {second.id})
+
+    def test_regenerate(self):
+        session = Sessions.new(1, u'user', 'receiver', False, '')
+        old_id = session.id
+
+        Sessions.regenerate(session.id)
+
+        self.assertTrue(Sessions.get(old_id) is None)
+        self.assertTrue(Sessions.get(session.id) is session)
+        self.assertEqual(Sessions.user_sessions[(1, u'user')], {session.id})
+
+    def test_index_is_updated_on_delete_and_expiration(self):
+        session = Sessions.new(1, u'user', 'receiver', False, '')
+        del Sessions[session.id]
+        self.assertEqual(Sessions.user_sessions, {})
+
+        Sessions.new(1, u'user', 'receiver', False, '')
+        self.test_reactor.advance(Sessions.get_timeout() + 1)
+        self.assertEqual(len(Sessions), 0)
+        self.assertEqual(Sessions.user_sessions, {})
+
+    def test_session_slots(self):
+        session = Session(1, u'user', 'receiver', False, '')
+        self.assertFalse(hasattr(session, '__dict__'))
@@ -77,3 +77,4 @@ class TestCryptoUtils(helpers.TestGL):
 
         self.assertFalse(filecmp.cmp(a, b, False))
         self.assertTrue(filecmp.cmp(a, c, False))
+        self.assertEqual(GCE.streaming_encryption_size(b), os.path.getsize(a))
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from twisted.internet import defer, reactor
+from twisted.mail import smtp
+from twisted.trial import unittest
+from zope.interface import implementer
+
+from globaleaks.utils.mail import sendmail_batch
+
+
+@implementer(smtp.IMessage)
+class Message(object):
+    def __init__(self, server, fail=False):
+        self.server = server
+        self.fail = fail
+
+    def lineReceived(self, line):
+        pass
+
+    def eomReceived(self):
+        if self.fail:
+            return defer.fail(Exception('message rejected'))
+
+        self.server.messages += 1
+        return defer.succeed(None)
+
+    def connectionLost(self):
+        pass
+
+
+@implementer(smtp.IMessageDelivery)
+class MessageDelivery(object):
+    def __init__(self, server):
+        self.server = server
+
+    def receivedHeader(self, helo, origin, recipients):
+        return b'Received: test'
+
+    def validateFrom(self, helo, origin):
+        return origin
+
+    def validateTo(self, user):
+        if user.dest.local.startswith(b'reject'):
+            raise smtp.SMTPBadRcpt(user)
+
+        return lambda: Message(self.server, user.dest.local.startswith(b'fail'))
+
+
+class SMTPServerFactory(smtp.SMTPFactory):
+    def __init__(self):
+        smtp.SMTPFactory.__init__(self)
+        self.connections = 0
+        self.messages = 0
+
+    def buildProtocol(self, addr):
+        self.connections += 1
+        p = smtp.ESMTP()
+        p.factory = self
+        p.delivery = MessageDelivery(self)
+        return p
+
+
+class TestSendmailBatch(unittest.TestCase):
+    def setUp(self):
+        self.server = SMTPServerFactory()
+        self.port = reactor.listenTCP(0, self.server, interface='127.0.0.1')
+        self.portnum = self.port.getHost().port
+
+    def tearDown(self):
+        return self.port.stopListening()
+
+    def sendmail_batch(self, mails, sessions):
+        return sendmail_batch(1, u'127.0.0.1', self.portnum, u'PLAIN', False, u'', u'',
+                              u'GlobaLeaks', u'globaleaks@example.net', mails,
+                              anonymize=False, sessions=sessions)
+
+    @defer.inlineCallbacks
+    def test_sendmail_batch(self):
+        mails = [{
+            'id': i,
+            'address': u'reject@example.net' if i == 3 else u'receiver%d@example.net' % i,
+            'subject': u'subject',
+            'body': u'body'
+        } for i in range(10)]
+
+        results = yield self.sendmail_batch(mails, 2)
+
+        self.assertEqual(results, {i: i != 3 for i in range(10)})
+        self.assertEqual(self.server.messages, 9)
+
+        # the mails are delivered reusing the sessions
+        self.assertEqual(self.server.connections, 2)
+
+    @defer.inlineCallbacks
+    def test_sendmail_batch_rejections(self):
+        addresses = {3: u'reject@example.net', 6: u'fail@example.net'}
+
+        mails = [{
+            'id': i,
+            'address': addresses.get(i, u'receiver%d@example.net' % i),
+            'subject': u'subject',
+            'body': u'body'
+        } for i in range(10)]
+
+        # a mail that can not be built
+        mails[8]['subject'] = None
+
+        results = yield self.sendmail_batch(mails, 1)
+
+        # the rejection of a recipient or of a message affects only that mail
+        self.assertEqual(results, {i: i not in addresses and i != 8 for i in range(10)})
+        self.assertEqual(self.server.messages, 7)
+        self.assertEqual(self.server.connections, 1)
+
+        # the test server logs the rejection of the message
+        self.flushLoggedErrors(Exception)
+
+    @defer.inlineCallbacks
+    def test_sendmail_batch_connection_refused(self):
+        yield self.port.stopListening()
+
+        results = yield self.sendmail_batch([{'id': 0, 'address': u'receiver@example.net', 'subject': u'subject', 'body': u'body'}], 2)
+
+        self.assertEqual(results, {0: False})
@@ -3,7 +3,7 @@ import os
 from datetime import datetime
 
 from globaleaks.tests import helpers
-from globaleaks.utils.pgp import PGPContext
+from globaleaks.utils.pgp import PGPContext, PGPKeyring
 
 
 class TestPGP(helpers.TestGL):
@@ -55,3 +55,73 @@ class TestPGP(helpers.TestGL):
 
         self.assertEqual(pgpctx.load_key(helpers.PGPKEYS['EXPIRED_PGP_KEY_PUB'])['expiration'],
                          datetime.utcfromtimestamp(1391012793))
+
+
+class TestPGPKeyring(helpers.TestGL):
+    def test_load_key_imports_once(self):
+        keyring = PGPKeyring()
+
+        k1 = keyring.load_key(helpers.PGPKEYS['VALID_PGP_KEY1_PUB'])
+        k2 = keyring.load_key(helpers.PGPKEYS['VALID_PGP_KEY1_PUB'])
+
+        self.assertEqual(k1, k2)
+        self.assertEqual(len(keyring.keys), 1)
+        self.assertEqual(len(keyring.get_context().gnupg.list_keys()), 1)
+
+    def test_lru_eviction(self):
+        keyring = PGPKeyring(size=1)
+
+        keyring.release_key(keyring.load_key(helpers.PGPKEYS['VALID_PGP_KEY1_PUB'])['fingerprint'])
+        k = keyring.load_key(helpers.PGPKEYS['VALID_PGP_KEY2_PUB'])
+
+        self.assertEqual(len(keyring.keys), 1)
+        self.assertEqual([x['fingerprint'] for x in keyring.get_context().gnupg.list_keys()], [k['fingerprint']])
+
+    def test_eviction_of_pinned_key(self):
+        keyring = PGPKeyring(size=1)
+
+        k1 = keyring.load_key(helpers.PGPKEYS['VALID_PGP_KEY1_PUB'])
+        k2 = keyring.load_key(helpers.PGPKEYS['VALID_PGP_KEY2_PUB'])
+
+        # The key evicted is not deleted while in use
+        self.assertEqual(len(keyring.keys), 1)
+        self.assertEqual(len(keyring.get_context().gnupg.list_keys()), 2)
+
+        keyring.release_key(k1['fingerprint'])
+        self.assertEqual([x['fingerprint'] for x in keyring.get_context().gnupg.list_keys()], [k2['fingerprint']])
+
+        keyring.release_key(k2['fingerprint'])
+        self.assertEqual(keyring.pins, {})
+        self.assertEqual(len(keyring.get_context().gnupg.list_keys()), 1)
+
+    def test_evict_expired(self):
+        keyring = PGPKeyring()
+
+        for k in ['VALID_PGP_KEY1_PUB', 'EXPIRED_PGP_KEY_PUB']:
+            keyring.release_key(keyring.load_key(helpers.PGPKEYS[k])['fingerprint'])
+
+        self.assertEqual(len(keyring.keys), 2)
+
+        keyring.evict_expired()
+        self.assertEqual(len(keyring.keys), 1)
+        self.assertEqual(len(keyring.get_context().gnupg.list_keys()), 1)
+
+    def test_encrypt_file_for_many_keys(self):
+        file_src = os.path.join(os.getcwd(), 'test_plaintext_file.txt')
+        file_dst = os.path.join(os.getcwd(), 'test_encrypted_file.txt')
+
+        keyring = PGPKeyring()
+        fingerprints = [keyring.load_key(helpers.PGPKEYS[k])['fingerprint'] for k in ['VALID_PGP_KEY1_PUB', 'VALID_PGP_KEY2_PUB']]
+
+        with open(file_src, 'wb+') as f:
+            f.write(b'antani')
+            f.seek(0)
+
+            keyring.encrypt_file(fingerprints, f, file_dst)
+
+        for k in ['VALID_PGP_KEY1_PRV', 'VALID_PGP_KEY2_PRV']:
+            pgpctx = PGPContext()
+            pgpctx.load_key(helpers.PGPKEYS[k])
+
+            with open(file_dst, 'rb') as f:
+                self.assertEqual(pgpctx.gnupg.decrypt_file(f).data, b'antani')
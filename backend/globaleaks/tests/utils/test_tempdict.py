@@ -1,5 +1,8 @@
+import time
+
 from globaleaks.tests import helpers
-from globaleaks.utils.tempdict import TempDict
+from globaleaks.utils.log import log
+from globaleaks.utils.tempdict import TempDict, TimerWheel
 
 
 class TestObject(object):
@@ -53,3 +56,77 @@ class TestTempDict(helpers.TestGL):
                 self.assertEqual(len(xxx), size_limit)
                 self.assertEqual(xxx.get(x - size_limit + 1).id, x - size_limit + 1)
                 self.assertEqual(xxx.get(x - size_limit), None)
+
+
+class TestTimerWheel(helpers.TestGL):
+    def test_schedule(self):
+        expired = []
+
+        wheel = TimerWheel(expired.append)
+
+        for x in range(10):
+            wheel.schedule(x, 10 + x)
+
+        # a single delayed call is used for all the keys
+        self.assertEqual(len(self.test_reactor.getDelayedCalls()), 1)
+
+        # postponing the expiration does not touch the reactor
+        wheel.schedule(0, 100)
+        self.assertEqual(len(self.test_reactor.getDelayedCalls()), 1)
+
+        wheel.cancel(1)
+
+        self.test_reactor.advance(15)
+        self.assertEqual(expired, [2, 3, 4, 5])
+
+        self.test_reactor.advance(10)
+        self.assertEqual(expired, [2, 3, 4, 5, 6, 7, 8, 9])
+        self.assertEqual(len(wheel), 1)
+
+        self.test_reactor.advance(100)
+        self.assertEqual(expired, [2, 3, 4, 5, 6, 7, 8, 9, 0])
+        self.assertEqual(len(wheel), 0)
+        self.assertEqual(len(self.test_reactor.getDelayedCalls()), 0)
+
+
+class TestTempDictBenchmark(helpers.TestGL):
+    """
+    Benchmark of the reactor overhead of 100k live sessions and tokens
+    """
+    items = 100000
+
+    def test_live_items(self):
+        xxx = TempDict(timeout=3600)
+
+        start = time.time()
+
+        for x in range(self.items):
+            xxx.set(x, TestObject(x))
+
+        self.test_reactor.advance(1)
+
+        for x in range(self.items):
+            self.assertEqual(xxx.get(x).id, x)
+
+        elapsed = time.time() - start
+
+        log.info("%d items set and accessed in %.3f seconds (%d delayed calls)",
+                 self.items, elapsed, len(self.test_reactor.getDelayedCalls()))
+
+        # a single delayed call is scheduled for all the items and the access
+        # to the items does not mutate the delayed calls of the reactor
+        self.assertEqual(len(self.test_reactor.getDelayedCalls()), 1)
+
+        self.test_reactor.advance(3601)
+        self.assertEqual(len(xxx), 0)
+        self.assertEqual(len(self.test_reactor.getDelayedCalls()), 0)
+
+    def test_lazy_expiration(self):
+        xxx = TempDict(timeout=10)
+
+        xxx.set(1, TestObject(1))
+
+        # the item expired is not returned even if the sweep has not run yet
+        self.test_reactor.seconds = lambda: 11
+        self.assertEqual(xxx.get(1), None)
+        self.assertEqual(len(xxx), 0)
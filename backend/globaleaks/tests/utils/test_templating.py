@@ -1,15 +1,57 @@
 # -*- coding: utf-8 -*-
-from twisted.internet.defer import inlineCallbacks
+import time
+
+from twisted.internet.defer import inlineCallbacks, returnValue
 from globaleaks.handlers import admin, rtip, user
 from globaleaks.jobs.delivery import Delivery
 from globaleaks.orm import tw
 from globaleaks.tests import helpers
-from globaleaks.utils.templating import Templating, supported_template_types
+from globaleaks.utils.log import log
+from globaleaks.utils.templating import CompiledTemplate, TemplateCache, \
+    Templating, supported_template_types
+
+
+class KeywordCounter(object):
+    def __init__(self):
+        self.calls = 0
+
+    def TipNum(self):
+        self.calls += 1
+        return u'42'
+
+    def Comments(self):
+        return u'{Blank}'
+
+
+class TestCompiledTemplate(helpers.TestGL):
+    def test_evaluate(self):
+        converter = KeywordCounter()
+
+        template = CompiledTemplate(u'{TipNum} {TipNumber} {TipNum}\n{Comments}\nEnd\n{Comments}\n\n',
+                                    [u'{TipNum}', u'{Comments}'])
+
+        self.assertEqual(template.evaluate(converter), u'42 {TipNumber} 42\nEnd')
+
+        # the value of a keyword is computed once per evaluation
+        self.assertEqual(converter.calls, 1)
+
+    def test_cache(self):
+        TemplateCache.invalidate()
+
+        for _ in range(3):
+            TemplateCache.get(u'tip', u'{TipNum}')
+
+        stats = TemplateCache.get_stats()
+        self.assertEqual(stats['entries'], 1)
+        self.assertTrue(stats['hits'] >= 2)
+
+        TemplateCache.invalidate()
+        self.assertEqual(TemplateCache.get_stats()['entries'], 0)
 
 
 class notifTemplateTest(helpers.TestGLWithPopulatedDB):
     @inlineCallbacks
-    def test_keywords_conversion(self):
+    def get_data(self):
         yield self.perform_full_submission_actions()
         yield Delivery().run()
 
@@ -36,7 +78,64 @@ class notifTemplateTest(helpers.TestGLWithPopulatedDB):
         files = yield rtip.receiver_get_rfile_list(data['tip']['id'])
         data['file'] = files[0]
 
+        returnValue(data)
+
+    @inlineCallbacks
+    def test_keywords_conversion(self):
+        data = yield self.get_data()
+
         for key in ['tip', 'comment', 'message', 'file']:
             data['type'] = key
             template = ''.join(supported_template_types[key].keyword_list)
             Templating().format_template(template, data)
+
+    @inlineCallbacks
+    def test_admin_anomaly_mail_template(self):
+        data = yield self.get_data()
+
+        data['type'] = u'admin_anomaly'
+        data['alert'] = {
+            'alarm_levels': {'disk_space': 1, 'activity': 1},
+            'event_matrix': {'failed_logins': 42},
+            'measured_freespace': 1024 * 1024,
+            'measured_totalspace': 1024 * 1024 * 1024
+        }
+
+        TemplateCache.invalidate()
+
+        body = Templating().format_template(data['notification']['admin_anomaly_mail_template'], data)
+
+        # only the template is cached and not the values of its keywords
+        self.assertEqual(TemplateCache.get_stats()['entries'], 1)
+
+        # the keywords of the details of the anomalies are expanded
+        for keyword in ['{AnomalyDetailDisk}', '{AnomalyDetailActivities}', '{FreeMemory}', '{TotalMemory}', '{ActivityDump}']:
+            self.assertNotIn(keyword, body)
+
+        self.assertIn(u'failed_logins', body)
+
+    @inlineCallbacks
+    def test_benchmark(self):
+        data = yield self.get_data()
+
+        n = 1000
+
+        start = time.time()
+        for _ in range(n):
+            TemplateCache.invalidate()
+            for key, keyword_converter in supported_template_types.items():
+                TemplateCache.get(key, ''.join(keyword_converter.keyword_list))
+
+        log.info("Compilation of the %d template types: %fms",
+                 len(supported_template_types), (time.time() - start) * 1000 / n)
+
+        for key in ['tip', 'comment', 'message', 'file']:
+            data['type'] = key
+
+            start = time.time()
+            for _ in range(n):
+                subject, body = Templating().get_mail_subject_and_body(data)
+
+            log.info("Rendering of the %s mail: %fms", key, (time.time() - start) * 1000 / n)
+
+            self.assertFalse(u'{TipNum}' in subject)
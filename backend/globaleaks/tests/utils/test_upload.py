@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+import os
+
+from globaleaks.rest import errors
+from globaleaks.settings import Settings
+from globaleaks.tests import helpers
+from globaleaks.utils import upload
+from globaleaks.utils.securetempfile import SecureTemporaryFile
+
+
+def get_multipart_body(boundary, fields, filename, content):
+    body = b''
+    for name, value in fields:
+        body += b'--' + boundary + b'\r\n'
+        body += b'Content-Disposition: form-data; name="' + name + b'"\r\n\r\n'
+        body += value + b'\r\n'
+
+    body += b'--' + boundary + b'\r\n'
+    body += b'Content-Disposition: form-data; name="file"; filename="' + filename + b'"\r\n'
+    body += b'Content-Type: application/octet-stream\r\n\r\n'
+    body += content + b'\r\n'
+    body += b'--' + boundary + b'--\r\n'
+
+    return body
+
+
+class TestMultipartParser(helpers.TestGL):
+    boundary = b'----WebKitFormBoundary7MA4YWxkTrZu0gW'
+    content = os.urandom(300000) + b'\r\n--' + boundary[:-1]
+
+    def parse(self, body, chunk_size, max_size=1024 * 1024, open_file=None):
+        if open_file is None:
+            open_file = lambda args: SecureTemporaryFile(Settings.tmp_path)
+
+        parser = upload.MultipartParser(self.boundary, max_size, open_file)
+
+        for i in range(0, len(body), chunk_size):
+            parser.feed(body[i:i + chunk_size])
+
+        parser.finish()
+
+        return parser
+
+    def read(self, f):
+        with f.open('w'):
+            f.finalize_write()
+
+        with f.open('r') as f:
+            return f.read()
+
+    def test_parse(self):
+        upload.monitor.reset()
+
+        body = get_multipart_body(self.boundary,
+                                  [(b'flowChunkNumber', b'1'), (b'flowIdentifier', b'antani')],
+                                  b'antani.txt', self.content)
+
+        for chunk_size in [7, 1000, 65536]:
+            parser = self.parse(body, chunk_size)
+
+            self.assertEqual(parser.args[b'flowChunkNumber'], [b'1'])
+            self.assertEqual(parser.args[b'flowIdentifier'], [b'antani'])
+            self.assertEqual(self.read(parser.args[b'file'][0]), self.content)
+
+        stats = upload.monitor.get_stats()
+        self.assertEqual(stats['active'], 0)
+        self.assertEqual(stats['buffered'], 0)
+
+        # the memory used is bounded by the size of the chunks received
+        self.assertTrue(stats['buffered_high_water'] < 65536 + 2 * len(self.boundary) + 1024)
+
+    def test_parse_appends_to_the_file_of_the_flow(self):
+        f = SecureTemporaryFile(Settings.tmp_path)
+
+        for i in range(3):
+            body = get_multipart_body(self.boundary, [], b'antani.txt', self.content)
+            parser = self.parse(body, 1000, open_file=lambda args: f)
+            self.assertTrue(parser.args[b'file'][0] is f)
+
+        self.assertEqual(self.read(f), self.content * 3)
+
+    def test_file_too_big(self):
+        upload.monitor.reset()
+
+        body = get_multipart_body(self.boundary, [], b'antani.txt', self.content)
+
+        self.assertRaises(errors.FileTooBig, self.parse, body, 1000, 1000)
+
+        stats = upload.monitor.get_stats()
+        self.assertEqual(stats['active'], 0)
+        self.assertEqual(stats['buffered'], 0)
+        self.assertEqual(stats['rejected'], 1)
+
+    def test_invalid_body(self):
+        body = get_multipart_body(self.boundary, [], b'antani.txt', self.content)
+
+        self.assertRaises(errors.InputValidationError, self.parse, body[:-100], 1000)
+
+        self.assertEqual(upload.monitor.get_stats()['active'], 0)
+
+
+class TestTempUploadDict(helpers.TestGL):
+    def test_lookup_by_filename(self):
+        files = upload.TempUploadDict(timeout=3600)
+
+        for i in range(10):
+            f = SecureTemporaryFile(Settings.tmp_path)
+            with f.open('w'):
+                f.write(b'antani' * i)
+
+            files.set(u'flow%d' % i, f)
+
+        self.assertEqual(len(files), 10)
+
+        f = files.get(u'flow3')
+        self.assertTrue(files.pop_by_filename(os.path.basename(f.filepath)) is f)
+        self.assertTrue(files.get(u'flow3') is None)
+        self.assertTrue(files.pop_by_filename(os.path.basename(f.filepath)) is None)
+
+        stats = files.get_stats()
+        self.assertEqual(stats['pending_files'], 9)
+        self.assertEqual(stats['pending_bytes'], 6 * (45 - 3))
+
+    def test_expiration(self):
+        files = upload.TempUploadDict(timeout=3600)
+
+        files.set(u'flow1', SecureTemporaryFile(Settings.tmp_path))
+        files.set(u'flow2', SecureTemporaryFile(Settings.tmp_path))
+
+        self.test_reactor.advance(1800)
+        self.assertEqual(files.get_stats()['oldest_age'], 1800)
+
+        # the access postpones the expiration
+        files.get(u'flow1')
+
+        self.test_reactor.advance(1800)
+        self.assertTrue(u'flow1' in files)
+        self.assertFalse(u'flow2' in files)
+
+        self.test_reactor.advance(1800)
+        self.assertEqual(len(files), 0)
+        self.assertEqual(files.filenames, {})
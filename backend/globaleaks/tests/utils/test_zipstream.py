@@ -7,7 +7,7 @@ from twisted.internet.defer import inlineCallbacks
 from zipfile import ZipFile
 
 from globaleaks.tests import helpers
-from globaleaks.utils.zipstream import ZipStream
+from globaleaks.utils.zipstream import ZipStream, ZIP_STORED
 
 
 class TestZipStream(helpers.TestGL):
@@ -40,3 +40,26 @@ class TestZipStream(helpers.TestGL):
                     self.assertTrue(ff.file_size == len(self.unicode_seq.encode()))
                 else:
                     self.assertTrue(ff.file_size == os.stat(os.path.abspath(__file__)).st_size)
+
+    def test_zipstream_stored(self):
+        files = [
+          {'name': __file__, 'path': os.path.abspath(__file__), 'size': os.stat(os.path.abspath(__file__)).st_size},
+          {'name': self.unicode_seq, 'fo': BytesIO(self.unicode_seq.encode('utf-8')), 'size': len(self.unicode_seq.encode('utf-8'))}
+        ]
+
+        zip_stream = ZipStream(files, ZIP_STORED, (2018, 1, 1, 0, 0, 0))
+
+        output = b''.join(zip_stream)
+        self.assertEqual(len(output), zip_stream.size())
+
+        with ZipFile(BytesIO(output), 'r') as f:
+            self.assertIsNone(f.testzip())
+
+        crc_cache = {}
+        for offset in [0, 100, len(output) - 10]:
+            files[1]['fo'] = BytesIO(self.unicode_seq.encode('utf-8'))
+            zip_stream = ZipStream(files, ZIP_STORED, (2018, 1, 1, 0, 0, 0), crc_cache)
+            self.assertEqual(b''.join(zip_stream.iterate(offset)), output[offset:])
+
+        # the CRCs of the files are cached by path
+        self.assertEqual(list(crc_cache.keys()), [os.path.abspath(__file__)])
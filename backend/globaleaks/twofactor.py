@@ -7,7 +7,7 @@ class TwoFactorToken(object):
     def __init__(self, user_id):
         self.id = user_id
         self.token = generate2FA()
-        self.expireCall = None
+        self.expiration = 0
 
 
 class TwoFactorTokensFactory(TempDict):
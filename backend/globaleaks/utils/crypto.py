@@ -313,3 +313,28 @@ class GCE(object):
         @staticmethod
         def streaming_encryption_open(mode, user_key, filepath):
             return _StreamingEncryptionObject(mode, user_key, filepath)
+
+        @staticmethod
+        def streaming_encryption_size(filepath):
+            """
+            Return the size of the plaintext of a file encrypted in streaming
+            by reading only the headers of the chunks
+            """
+            size = 0
+
+            with open(filepath, 'rb') as fd:
+                fd.seek(80 + 16)
+
+                while True:
+                    header = fd.read(5)
+                    if len(header) < 5:
+                        break
+
+                    last, chunk_len = struct.unpack('>BI', header)
+                    size += chunk_len
+                    if last:
+                        break
+
+                    fd.seek(chunk_len + 16, os.SEEK_CUR)
+
+            return size
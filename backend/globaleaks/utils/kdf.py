@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Executor of the password hashing and key derivation functions
+import threading
+import time
+
+from twisted.internet import reactor
+from twisted.internet.threads import deferToThreadPool
+
+
+class KDFExecutor(object):
+    """
+    Executor running the password hashing and key derivation functions on a
+    dedicated thread pool
+
+    Argon2 takes hundreds of milliseconds and 128MB of memory for every
+    computation; running it out of the database transactions on a pool
+    sized on the available memory prevents a burst of logins from holding
+    the threads of the ORM. The executor keeps track of the time spent by
+    the computations waiting for a worker and of the compute time.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.queued = 0
+            self.running = 0
+            self.count = 0
+            self.wait_time = 0.0
+            self.compute_time = 0.0
+            self.last_wait_time = 0.0
+            self.last_compute_time = 0.0
+
+    def run(self, thread_pool, function, *args):
+        with self.lock:
+            self.queued += 1
+
+        return deferToThreadPool(reactor, thread_pool, self._run, time.time(), function, *args)
+
+    def _run(self, submission_time, function, *args):
+        start = time.time()
+
+        with self.lock:
+            self.queued -= 1
+            self.running += 1
+
+        try:
+            return function(*args)
+        finally:
+            end = time.time()
+
+            with self.lock:
+                self.running -= 1
+                self.count += 1
+                self.wait_time += start - submission_time
+                self.compute_time += end - start
+                self.last_wait_time = start - submission_time
+                self.last_compute_time = end - start
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'queued': self.queued,
+                'running': self.running,
+                'count': self.count,
+                'wait_time': self.wait_time / self.count if self.count else 0.0,
+                'compute_time': self.compute_time / self.count if self.count else 0.0,
+                'last_wait_time': self.last_wait_time,
+                'last_compute_time': self.last_compute_time
+            }
+
+
+executor = KDFExecutor()
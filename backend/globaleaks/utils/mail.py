@@ -2,6 +2,7 @@
 # GlobaLeaks Utility used to handle Mail, format, exception, etc
 import six
 
+from collections import deque
 from io import BytesIO
 
 from email import utils  # pylint: disable=no-name-in-module
@@ -9,9 +10,9 @@ from email.header import Header
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
-from twisted.internet import reactor, defer
+from twisted.internet import defer, protocol, reactor
 from twisted.internet.endpoints import TCP4ClientEndpoint
-from twisted.mail.smtp import ESMTPSenderFactory
+from twisted.mail.smtp import ESMTPSender, ESMTPSenderFactory, SMTPClient, SMTPTimeoutError, SUCCESS
 from twisted.protocols import tls
 
 from globaleaks.utils.socks import SOCKS5ClientEndpoint
@@ -51,29 +52,139 @@ def MIME_mail_build(src_name, src_mail, dest_name, dest_mail, title, mail_body):
     return BytesIO(multipart_as_bytes)  # pylint: disable=no-member
 
 
-def sendmail(tid, smtp_host, smtp_port, security, authentication, username, password, from_name, from_address, to_address, subject, body, anonymize=True, socks_host='127.0.0.1', socks_port=9050):
+class MailBatch(object):
     """
-    Send an email using SMTPS/SMTP+TLS and maybe torify the connection.
+    Queue of mails shared by the SMTP sessions opened toward the same server
+    """
+    def __init__(self, mails):
+        self.queue = deque(mails)
+        self.results = {mail['id']: False for mail in mails}
 
-    @param to_address: the 'To:' field of the email
-    @param subject: the mail subject
-    @param body: the mail body
+    def pop(self):
+        return self.queue.popleft() if self.queue else None
 
-    @return: a {Deferred} that returns a success {bool} if the message was passed
-             to the server.
+    def done(self, mail, success):
+        self.results[mail['id']] = success
+
+
+class MultiESMTPSender(ESMTPSender):
+    """
+    ESMTP client that keeps the session open delivering every mail of the
+    batch until the batch is exhausted
+
+    The failures related to a single mail, like the rejection of its
+    recipient or of its content, are accounted to that mail and the session
+    goes on with the next one after a RSET; only the errors of the session
+    end it.
+    """
+    mail = None
+    mail_data = None
+
+    def getMailFrom(self):
+        while True:
+            self.mail = self.factory.batch.pop()
+            if self.mail is None:
+                self.factory.sendFinished = True
+                return None
+
+            try:
+                self.mail_data = MIME_mail_build(self.factory.from_name,
+                                                 self.factory.from_address,
+                                                 self.mail['address'],
+                                                 self.mail['address'],
+                                                 self.mail['subject'],
+                                                 self.mail['body'])
+            except Exception as excep:
+                log.err("Unable to build the mail (Exception: %s)", excep, tid=self.factory.tid)
+                self.factory.batch.done(self.mail, False)
+                continue
+
+            return str(self.factory.fromEmail)
+
+    def getMailTo(self):
+        return [self.mail['address'].encode('utf-8')]
+
+    def getMailData(self):
+        return self.mail_data
+
+    def sendError(self, exc):
+        SMTPClient.sendError(self, exc)
+
+        if isinstance(exc, SMTPTimeoutError):
+            # the server is not answering, do not wait for the reply to QUIT
+            self.transport.abortConnection()
+
+        log.err("SMTP session failed (Exception: %s)", exc, tid=self.factory.tid)
+
+        if self.mail is not None:
+            self.factory.batch.done(self.mail, False)
+            self.mail = None
+
+    def sentMail(self, code, resp, numOk, addresses, smtp_log):
+        """
+        Account the result of the current mail
+
+        This is called also when the recipient or the content of the mail
+        are rejected, before the RSET that prepares the session for the
+        next mail.
+        """
+        if code not in SUCCESS:
+            log.err("SMTP server rejected the mail (Code: %d)", code, tid=self.factory.tid)
+
+        self.factory.batch.done(self.mail, code in SUCCESS)
+        self.mail = None
+        self.mail_data = None
+
+    def connectionLost(self, reason=protocol.connectionDone):
+        ESMTPSender.connectionLost(self, reason)
+
+        if self.mail is not None:
+            self.factory.batch.done(self.mail, False)
+            self.mail = None
+
+        self.factory.session_closed()
+
+
+class MultiESMTPSenderFactory(ESMTPSenderFactory):
+    protocol = MultiESMTPSender
+
+    def __init__(self, tid, batch, from_name, from_address, *args, **kwargs):
+        ESMTPSenderFactory.__init__(self, *args, **kwargs)
+        self.tid = tid
+        self.batch = batch
+        self.from_name = from_name
+        self.from_address = from_address
+
+    def session_closed(self):
+        if hasattr(self, 'result'):
+            self.result.callback(None)
+
+    def _processConnectionError(self, connector, err):
+        # Retries and results are handled at batch level
+        self.currentProtocol = None
+
+
+def sendmail_batch(tid, smtp_host, smtp_port, security, authentication, username, password, from_name, from_address, mails, anonymize=True, socks_host='127.0.0.1', socks_port=9050, sessions=1):
+    """
+    Send a batch of emails using SMTPS/SMTP+TLS and maybe torify the connections.
+
+    The mails are spooled over at most `sessions` concurrent SMTP sessions
+    each one delivering mails until the batch is exhausted.
+
+    @param mails: a list of dicts with the 'id', 'address', 'subject' and
+                  'body' of the mails to be sent
+    @param sessions: the maximum number of concurrent sessions to the server
+
+    @return: a {Deferred} that returns a {dict} mapping each mail id to a
+             success {bool} telling if the message was passed to the server.
     """
+    batch = MailBatch(mails)
+
     try:
         timeout = 30
 
-        message = MIME_mail_build(from_name,
-                                  from_address,
-                                  to_address,
-                                  to_address,
-                                  subject,
-                                  body)
-
-        log.debug('Sending email to %s using SMTP server [%s:%d] [%s]',
-                  to_address,
+        log.debug('Sending %d emails using SMTP server [%s:%d] [%s]',
+                  len(mails),
                   smtp_host,
                   smtp_port,
                   security,
@@ -81,51 +192,75 @@ def sendmail(tid, smtp_host, smtp_port, security, authentication, username, pass
 
         context_factory = TLSClientContextFactory()
 
-        smtp_deferred = defer.Deferred()
-
-        factory = ESMTPSenderFactory(
-            username.encode('utf-8') if authentication else None,
-            password.encode('utf-8') if authentication else None,
-            from_address,
-            to_address,
-            message,
-            smtp_deferred,
-            contextFactory=context_factory,
-            requireAuthentication=authentication,
-            requireTransportSecurity=(security == 'TLS'),
-            retries=0,
-            timeout=timeout)
-
-        if security == "SSL":
-            factory = tls.TLSMemoryBIOFactory(context_factory, True, factory)
-
-        if anonymize:
-            socksProxy = TCP4ClientEndpoint(reactor, socks_host, socks_port, timeout=timeout)
-            endpoint = SOCKS5ClientEndpoint(smtp_host.encode('utf-8'), smtp_port, socksProxy)
-        else:
-            endpoint = TCP4ClientEndpoint(reactor, smtp_host.encode('utf-8'), smtp_port, timeout=timeout)
-
-        conn_deferred = endpoint.connect(factory)
-
-        final = defer.DeferredList([conn_deferred, smtp_deferred], fireOnOneErrback=True, consumeErrors=True)
-
-        def failure_cb(failure):
-            """
-            @param failure {Failure {twisted.internet.FirstError {Failure}}}
-            """
-            log.err("SMTP connection failed (Exception: %s)", failure.value.subFailure.value, tid=tid)
-            log.debug(failure)
-            return False
-
-        def success_cb(results):
-            """
-            @param results {list of (success, return_val) tuples}
-            """
-            return True
-
-        return final.addCallbacks(success_cb, failure_cb)
+        dl = []
+
+        for _ in range(max(1, min(sessions, len(mails)))):
+            smtp_deferred = defer.Deferred()
+
+            factory = MultiESMTPSenderFactory(
+                tid,
+                batch,
+                from_name,
+                from_address,
+                username.encode('utf-8') if authentication else None,
+                password.encode('utf-8') if authentication else None,
+                from_address,
+                [],
+                None,
+                smtp_deferred,
+                contextFactory=context_factory,
+                requireAuthentication=authentication,
+                requireTransportSecurity=(security == 'TLS'),
+                retries=0,
+                timeout=timeout)
+
+            if security == "SSL":
+                factory = tls.TLSMemoryBIOFactory(context_factory, True, factory)
+
+            if anonymize:
+                socksProxy = TCP4ClientEndpoint(reactor, socks_host, socks_port, timeout=timeout)
+                endpoint = SOCKS5ClientEndpoint(smtp_host.encode('utf-8'), smtp_port, socksProxy)
+            else:
+                endpoint = TCP4ClientEndpoint(reactor, smtp_host.encode('utf-8'), smtp_port, timeout=timeout)
+
+            conn_deferred = endpoint.connect(factory)
+
+            session = defer.DeferredList([conn_deferred, smtp_deferred], fireOnOneErrback=True, consumeErrors=True)
+
+            def failure_cb(failure):
+                """
+                @param failure {Failure {twisted.internet.FirstError {Failure}}}
+                """
+                log.err("SMTP connection failed (Exception: %s)", failure.value.subFailure.value, tid=tid)
+                log.debug(failure)
+
+            dl.append(session.addErrback(failure_cb))
+
+        return defer.DeferredList(dl).addCallback(lambda _: batch.results)
 
     except Exception as excep:
         # avoids raising an exception inside email logic to avoid chained errors
         log.err("Unexpected exception in sendmail: %s", str(excep), tid=tid)
-        return defer.succeed(False)
+        return defer.succeed(batch.results)
+
+
+def sendmail(tid, smtp_host, smtp_port, security, authentication, username, password, from_name, from_address, to_address, subject, body, anonymize=True, socks_host='127.0.0.1', socks_port=9050):
+    """
+    Send an email using SMTPS/SMTP+TLS and maybe torify the connection.
+
+    @param to_address: the 'To:' field of the email
+    @param subject: the mail subject
+    @param body: the mail body
+
+    @return: a {Deferred} that returns a success {bool} if the message was passed
+             to the server.
+    """
+    mail = {
+        'id': 0,
+        'address': to_address,
+        'subject': subject,
+        'body': body
+    }
+
+    return sendmail_batch(tid, smtp_host, smtp_port, security, authentication, username, password,
+                          from_name, from_address, [mail], anonymize, socks_host, socks_port).addCallback(lambda results: results[0])
@@ -1,14 +1,18 @@
 # -*- coding: utf-8 -*-
+import hashlib
 import os
 import shutil
 import tempfile
+import threading
 
+from collections import OrderedDict
 from datetime import datetime
 
 from gnupg import GPG
 
 from globaleaks.rest import errors
 from globaleaks.utils.log import log
+from globaleaks.utils.utility import datetime_now, datetime_null
 
 
 class PGPContext(object):
@@ -69,9 +73,14 @@ class PGPContext(object):
 
     def encrypt_file(self, key_fingerprint, input_file, output_path):
         """
-        Encrypt a file with the specified PGP key
+        Encrypt a file with the specified PGP key or list of PGP keys
         """
-        encrypted_obj = self.gnupg.encrypt_file(input_file, str(key_fingerprint), output=output_path)
+        if isinstance(key_fingerprint, (list, tuple)):
+            recipients = [str(x) for x in key_fingerprint]
+        else:
+            recipients = str(key_fingerprint)
+
+        encrypted_obj = self.gnupg.encrypt_file(input_file, recipients, output=output_path)
 
         if not encrypted_obj.ok:
             raise errors.InputValidationError
@@ -94,3 +103,116 @@ class PGPContext(object):
             shutil.rmtree(self.gnupg.gnupghome)
         except Exception as excep:
             log.err("Unable to clean temporary PGP environment: %s: %s", self.gnupg.gnupghome, excep)
+
+
+class PGPKeyring(object):
+    """
+    Long lived GnuPG home caching the imported keys by fingerprint
+
+    Keys are imported once and then reused by every encryption until they
+    expire or are evicted as least recently used.
+
+    Every key loaded is pinned until released with release_key so that
+    an eviction happening in the meanwhile does not delete from the
+    GnuPG home a key still in use; the deletion is then performed at the
+    last release.
+    """
+    def __init__(self, tempdirprefix=None, size=256):
+        self.tempdirprefix = tempdirprefix
+        self.size = size
+        self.lock = threading.Lock()
+        self.pgpctx = None
+
+        # key digest -> {'fingerprint': ..., 'expiration': ...}
+        self.keys = OrderedDict()
+
+        # fingerprint -> number of the users of the key
+        self.pins = {}
+
+    def get_context(self):
+        with self.lock:
+            if self.pgpctx is None:
+                self.pgpctx = PGPContext(self.tempdirprefix)
+
+            return self.pgpctx
+
+    def _delete(self, fingerprint):
+        if fingerprint in self.pins or fingerprint in [x['fingerprint'] for x in self.keys.values()]:
+            return
+
+        try:
+            self.pgpctx.gnupg.delete_keys(fingerprint)
+        except Exception as excep:
+            log.err("Error in PGP delete_keys: %s", excep)
+
+    def _remove(self, digest):
+        self._delete(self.keys.pop(digest)['fingerprint'])
+
+    def evict_expired(self, now=None):
+        if now is None:
+            now = datetime_now()
+
+        with self.lock:
+            for digest, k in list(self.keys.items()):
+                if datetime_null() < k['expiration'] < now:
+                    self._remove(digest)
+
+    def load_key(self, key):
+        """
+        Import a key in the keyring unless already present and pin it
+
+        Every key loaded needs to be released with release_key once used.
+
+        @param key: the armored PGP key
+        @return: a dict with the expiration date and the key fingerprint
+        """
+        digest = hashlib.sha256(key.encode() if not isinstance(key, bytes) else key).digest()
+
+        self.evict_expired()
+
+        pgpctx = self.get_context()
+
+        with self.lock:
+            if digest in self.keys:
+                k = self.keys[digest] = self.keys.pop(digest)
+            else:
+                k = self.keys[digest] = pgpctx.load_key(key)
+
+            self.pins[k['fingerprint']] = self.pins.get(k['fingerprint'], 0) + 1
+
+            while len(self.keys) > self.size:
+                self._remove(next(iter(self.keys)))
+
+            return dict(k)
+
+    def release_key(self, fingerprint):
+        """
+        Release a key loaded with load_key deleting it if evicted meanwhile
+
+        @param fingerprint: the fingerprint of the key
+        """
+        with self.lock:
+            self.pins[fingerprint] -= 1
+            if self.pins[fingerprint]:
+                return
+
+            del self.pins[fingerprint]
+
+            self._delete(fingerprint)
+
+    def encrypt_file(self, key_fingerprint, input_file, output_path):
+        return self.get_context().encrypt_file(key_fingerprint, input_file, output_path)
+
+    def encrypt_message(self, key_fingerprint, plaintext):
+        return self.get_context().encrypt_message(key_fingerprint, plaintext)
+
+    def encrypt_message_with_key(self, key, plaintext):
+        """
+        Encrypt a text message with the specified armored PGP key
+        """
+        fingerprint = self.load_key(key)['fingerprint']
+
+        try:
+            return self.encrypt_message(fingerprint, plaintext)
+        finally:
+            self.release_key(fingerprint)
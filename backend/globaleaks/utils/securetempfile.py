@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import os
+from distutils.version import LooseVersion as V  # pylint: disable=no-name-in-module,import-error
 
+import cryptography
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
@@ -10,9 +12,16 @@ from globaleaks.utils.crypto import generateRandomKey
 
 crypto_backend = default_backend()
 
+# update_into is available since cryptography 1.8
+update_into_available = V(cryptography.__version__) >= V('1.8')
+
 
 class SecureTemporaryFile(object):
     file = None
+    fd = None
+
+    # Size of the buffer reused to encrypt the data written to the file
+    buffer_size = 65536
 
     def __init__(self, filesdir):
         """
@@ -25,6 +34,8 @@ class SecureTemporaryFile(object):
         self.filepath = os.path.join(filesdir, "%s.aes" % self.key_id)
         self.enc = self.cipher.encryptor()
         self.dec = None
+        self.buffer = None
+        self.size = 0
 
     def open(self, mode):
         if self.file is None:
@@ -40,7 +51,28 @@ class SecureTemporaryFile(object):
         if isinstance(data, text_type):
             data = data.encode('utf-8')
 
-        self.fd.write(self.enc.update(data))
+        self.size += len(data)
+
+        if not update_into_available:
+            self.fd.write(self.enc.update(data))
+            return
+
+        if self.buffer is None:
+            # the output of CTR mode may be one block minus one byte longer than the input
+            self.buffer = bytearray(self.buffer_size + 15)
+
+        buffer = memoryview(self.buffer)
+
+        # update_into accepts only bytes as input and not a memoryview, so
+        # the data is sliced only when larger than the buffer
+        if len(data) <= self.buffer_size:
+            n = self.enc.update_into(data, self.buffer)
+            self.fd.write(buffer[:n])
+            return
+
+        for i in range(0, len(data), self.buffer_size):
+            n = self.enc.update_into(data[i:i + self.buffer_size], self.buffer)
+            self.fd.write(buffer[:n])
 
     def finalize_write(self):
         self.fd.write(self.enc.finalize())
@@ -61,6 +93,8 @@ class SecureTemporaryFile(object):
             self.fd.close()
             self.fd = None
 
+        self.buffer = None
+
     def __enter__(self):
         return self
 
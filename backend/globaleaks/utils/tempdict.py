@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import math
 import six
 from collections import OrderedDict
 
@@ -9,12 +10,109 @@ from twisted.internet import reactor as _reactor
 reactor = _reactor
 
 
+class TimerWheel(object):
+    """
+    Timer expiring the keys registered with a single delayed call
+
+    The keys are hashed in buckets by their expiration tick; the buckets are
+    swept by one delayed call scheduled at the time of the earliest bucket,
+    so that scheduling or postponing an expiration does not touch the
+    reactor.
+    """
+    def __init__(self, callback, resolution=1):
+        """
+        :param callback: the function called with each expired key
+        :param resolution: the duration in seconds of a tick
+        """
+        self.callback = callback
+        self.resolution = resolution
+        self.buckets = {}
+        self.ticks = {}
+        self.call = None
+        self.clock = None
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def schedule(self, key, timeout):
+        tick = int(math.ceil((reactor.seconds() + timeout) / self.resolution))
+
+        old_tick = self.ticks.get(key)
+        if old_tick == tick:
+            return
+
+        if old_tick is not None:
+            self._discard(key, old_tick)
+
+        self.ticks[key] = tick
+        self.buckets.setdefault(tick, set()).add(key)
+
+        # the reactor is compared in order to allow UT override
+        if self.call is None or self.clock is not reactor or not self.call.active():
+            self._arm(tick * self.resolution)
+        elif tick * self.resolution < self.call.getTime():
+            self.call.reset(tick * self.resolution - reactor.seconds())
+
+    def cancel(self, key):
+        tick = self.ticks.pop(key, None)
+        if tick is not None:
+            self._discard(key, tick)
+
+    def clear(self):
+        if self.call is not None and self.call.active():
+            self.call.cancel()
+
+        self.buckets.clear()
+        self.ticks.clear()
+        self.call = None
+
+    def get_time(self, key):
+        """
+        Return the expiration time of a key or 0 if the key is not registered
+        """
+        tick = self.ticks.get(key)
+        return tick * self.resolution if tick is not None else 0
+
+    def _discard(self, key, tick):
+        bucket = self.buckets.get(tick)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self.buckets[tick]
+
+    def _arm(self, time):
+        self.clock = reactor
+        self.call = reactor.callLater(max(0, time - reactor.seconds()), self.sweep)
+
+    def sweep(self):
+        self.call = None
+
+        now = reactor.seconds()
+
+        for tick in sorted(t for t in self.buckets if t * self.resolution <= now):
+            for key in self.buckets.pop(tick):
+                # the callbacks may have already removed or rescheduled the key
+                if self.ticks.get(key) == tick:
+                    del self.ticks[key]
+                    self.callback(key)
+
+        if self.buckets and self.call is None:
+            self._arm(min(self.buckets) * self.resolution)
+
+
 class TempDict(OrderedDict):
+    """
+    Dictionary of items expiring after timeout seconds since their last use
+
+    The expirations are handled by a TimerWheel and verified lazily on
+    access so that the access to an item does not touch the reactor.
+    """
     expireCallback = None
 
     def __init__(self, timeout=None, size_limit=None):
         self.timeout = timeout
         self.size_limit = size_limit
+        self.wheel = TimerWheel(self._expire)
         OrderedDict.__init__(self)
 
         self._check_size_limit()
@@ -29,26 +127,43 @@ class TempDict(OrderedDict):
 
     def set(self, key, item):
         self._check_size_limit()
-        timeout = self.get_timeout()
-        item.expireCall = reactor.callLater(timeout, self._expire, key)
+        self.wheel.schedule(key, self.get_timeout())
+        item.expiration = self.wheel.get_time(key)
         self[key] = item
 
     def get(self, key):
-        if key not in self:
+        item = OrderedDict.get(self, key)
+        if item is None:
             return
 
-        if self[key].expireCall is not None:
-            self[key].expireCall.reset(self.get_timeout())
+        expiration = self.wheel.get_time(key)
+        if expiration:
+            if expiration <= reactor.seconds():
+                self._expire(key)
+                return
+
+            self.wheel.schedule(key, self.get_timeout())
+            item.expiration = self.wheel.get_time(key)
 
-        return self[key]
+        return item
 
     def delete(self, key):
         if key not in self:
             return
 
-        item = self.pop(key)
-        item.expireCall.cancel()  # pylint: disable=no-member
-        self._expire(key)
+        self.pop(key)
+
+    def __delitem__(self, key):
+        OrderedDict.__delitem__(self, key)
+        self.wheel.cancel(key)
+
+    def pop(self, key, *args):
+        self.wheel.cancel(key)
+        return OrderedDict.pop(self, key, *args)
+
+    def clear(self):
+        OrderedDict.clear(self)
+        self.wheel.clear()
 
     def _check_size_limit(self):
         size_limit = self.get_size_limit()
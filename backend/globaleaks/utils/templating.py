@@ -4,6 +4,8 @@
 # mainly in mail notifications.
 import collections
 import copy
+import re
+import threading
 
 from datetime import timedelta
 
@@ -680,33 +682,128 @@ supported_template_types = {
 }
 
 
-class Templating(object):
-    def format_template(self, raw_template, data):
-        keyword_converter = supported_template_types[data['type']](data)
-        for _ in range(3):
-            count = 0
+class CompiledTemplate(object):
+    """
+    Template split in the list of its literal texts and keywords
+
+    The value of every keyword is computed only if the keyword is used and
+    only once per evaluation; the values being templates themselves, like
+    the details of the anomalies, are expanded up to max_depth levels.
+    """
+    max_depth = 2
+
+    def __init__(self, raw_template, keyword_list):
+        self.keyword_list = keyword_list
+        self.tokens = []
+
+        # the keywords are matched as whole tokens so that the ones being
+        # the prefix of other keywords are never mistaken
+        regexp = re.compile('|'.join(re.escape(kw) for kw in sorted(set(keyword_list), key=len, reverse=True)))
+
+        start = 0
+        for match in regexp.finditer(raw_template):
+            self.tokens.append((raw_template[start:match.start()], match.group()[1:-1]))
+            start = match.end()
+
+        self.tokens.append((raw_template[start:], None))
+
+    def render(self, keyword_converter, values, depth):
+        output = []
+
+        for text, keyword in self.tokens:
+            output.append(text)
+
+            if keyword is not None:
+                if keyword not in values:
+                    # if {SomeKeyword} matches, call keyword_converter.SomeKeyword function
+                    value = getattr(keyword_converter, keyword)()
+
+                    # the values are compiled without the TemplateCache as
+                    # they carry the contents of the single tips
+                    if depth < self.max_depth and '{' in value:
+                        value = CompiledTemplate(value, self.keyword_list).render(keyword_converter, values, depth + 1)
+
+                    values[keyword] = value
+
+                output.append(values[keyword])
+
+        return ''.join(output)
+
+    def evaluate(self, keyword_converter):
+        raw_template = self.render(keyword_converter, {}, 0)
 
-            for kw in keyword_converter.keyword_list:
-                if raw_template.count(kw):
-                    # if %SomeKeyword% matches, call keyword_converter.SomeKeyword function
-                    variable_content = getattr(keyword_converter, kw[1:-1])()
-                    raw_template = raw_template.replace(kw, variable_content)
+        # remove lines with only {Blank}
+        raw_template = raw_template.replace('\n{Blank}\n', '\n')
 
-                    count += 1
+        # remove remaining {Blank} tokens
+        raw_template = raw_template.replace('\n{Blank}', '')
 
-            # remove lines with only {Blank}
-            raw_template = raw_template.replace('\n{Blank}\n', '\n')
+        return raw_template.rstrip()
 
-            # remove remaining $Blank% tokens
-            raw_template = raw_template.replace('\n{Blank}', '')
 
-            raw_template = raw_template.rstrip()
+class TemplateCache(object):
+    """
+    In memory LRU cache of the compiled templates
+
+    The templates are cached by template type and text so that a change of
+    the notification texts of a tenant or of a language results in a new
+    entry; the cache is anyhow invalidated when the texts are updated to
+    release the memory of the entries not used anymore.
+    """
+    memory_cache_dict = collections.OrderedDict()
+    size = 1024
+
+    # The cache is accessed by the threads of the ORM pool
+    lock = threading.Lock()
+
+    stats = {
+        'hits': 0,
+        'misses': 0,
+        'evictions': 0
+    }
+
+    @classmethod
+    def get(cls, template_type, raw_template):
+        key = (template_type, raw_template)
+
+        with cls.lock:
+            template = cls.memory_cache_dict.pop(key, None)
+            if template is not None:
+                cls.memory_cache_dict[key] = template
+                cls.stats['hits'] += 1
+                return template
+
+            cls.stats['misses'] += 1
+
+        template = CompiledTemplate(raw_template, supported_template_types[template_type].keyword_list)
 
-            if count == 0:
-                # finally!
-                break
+        with cls.lock:
+            cls.memory_cache_dict[key] = template
+
+            while len(cls.memory_cache_dict) > cls.size:
+                cls.memory_cache_dict.popitem(last=False)
+                cls.stats['evictions'] += 1
+
+        return template
+
+    @classmethod
+    def invalidate(cls):
+        with cls.lock:
+            cls.memory_cache_dict.clear()
+
+    @classmethod
+    def get_stats(cls):
+        with cls.lock:
+            ret = dict(cls.stats)
+            ret['entries'] = len(cls.memory_cache_dict)
+            return ret
+
+
+class Templating(object):
+    def format_template(self, raw_template, data):
+        keyword_converter = supported_template_types[data['type']](data)
 
-        return raw_template
+        return TemplateCache.get(data['type'], raw_template).evaluate(keyword_converter)
 
     def get_mail_subject_and_body(self, data):
         subject_template = ''
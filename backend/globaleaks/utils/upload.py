@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+# Streaming parser of the multipart/form-data file uploads
+import cgi
+import os
+
+from globaleaks.rest import errors
+from globaleaks.utils import tempdict
+
+
+class UploadMonitor(object):
+    """
+    Keep track of the uploads being received and of the memory they use
+
+    The memory accounted is the one of the data held by the parsers while
+    waiting to be written to the files.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.active = 0
+        self.active_high_water = 0
+        self.buffered = 0
+        self.buffered_high_water = 0
+        self.bytes = 0
+        self.rejected = 0
+
+    def start(self):
+        self.active += 1
+        self.active_high_water = max(self.active, self.active_high_water)
+
+    def stop(self):
+        self.active -= 1
+
+    def update(self, delta):
+        self.buffered += delta
+        self.buffered_high_water = max(self.buffered, self.buffered_high_water)
+
+    def get_stats(self):
+        return {
+            'active': self.active,
+            'active_high_water': self.active_high_water,
+            'buffered': self.buffered,
+            'buffered_high_water': self.buffered_high_water,
+            'bytes': self.bytes,
+            'rejected': self.rejected
+        }
+
+
+monitor = UploadMonitor()
+
+
+class MultipartParser(object):
+    """
+    Incremental parser of a multipart/form-data body
+
+    The form fields are collected in args while the content of the file
+    parts is written to the file returned by open_file as soon as it is
+    received so that the memory used does not depend on the size of the
+    upload.
+    """
+    max_field_size = 65536
+    max_headers_size = 8192
+
+    def __init__(self, boundary, max_size, open_file):
+        """
+        :param boundary: the boundary of the multipart body
+        :param max_size: the maximum size in bytes of the files
+        :param open_file: a function returning the file where to write a
+                          file part given the fields parsed until then
+        """
+        self.delimiter = b'\r\n--' + boundary
+        self.max_size = max_size
+        self.open_file = open_file
+        self.args = {}
+        self.size = 0
+
+        # the first boundary is not preceded by a line break
+        self.buffer = b'\r\n'
+        self.state = 'preamble'
+        self.name = None
+        self.field = None
+        self.file = None
+        self.buffered = 0
+
+        monitor.start()
+        self.account()
+
+    def account(self):
+        monitor.update(len(self.buffer) - self.buffered)
+        self.buffered = len(self.buffer)
+
+    def feed(self, data):
+        """
+        Parse a chunk of the body
+
+        :param data: the chunk received
+        """
+        self.buffer += data
+        self.account()
+
+        try:
+            while self.buffer and self.state != 'end':
+                if not getattr(self, 'parse_' + self.state)():
+                    break
+        except:
+            self.abort()
+            raise
+
+        self.account()
+
+    def finish(self):
+        """
+        Conclude the parsing once the whole body has been received
+        """
+        if self.state != 'end':
+            self.abort()
+            raise errors.InputValidationError("Invalid multipart body")
+
+        self.buffer = b''
+        self.account()
+        self.state = 'done'
+        monitor.stop()
+
+    def abort(self):
+        self.close_file()
+
+        if self.state not in ('aborted', 'done'):
+            self.buffer = b''
+            self.account()
+            self.state = 'aborted'
+            monitor.stop()
+
+    def close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def parse_preamble(self):
+        i = self.buffer.find(self.delimiter)
+        if i < 0:
+            self.buffer = self.buffer[-len(self.delimiter) + 1:]
+            return False
+
+        self.buffer = self.buffer[i + len(self.delimiter):]
+        self.state = 'boundary'
+        return True
+
+    def parse_boundary(self):
+        if len(self.buffer) < 2:
+            return False
+
+        if self.buffer.startswith(b'--'):
+            self.buffer = b''
+            self.state = 'end'
+        elif self.buffer.startswith(b'\r\n'):
+            self.buffer = self.buffer[2:]
+            self.state = 'headers'
+        else:
+            raise errors.InputValidationError("Invalid multipart body")
+
+        return True
+
+    def parse_headers(self):
+        i = self.buffer.find(b'\r\n\r\n')
+        if i < 0:
+            if len(self.buffer) > self.max_headers_size:
+                raise errors.InputValidationError("Invalid multipart body")
+
+            return False
+
+        headers, self.buffer = self.buffer[:i], self.buffer[i + 4:]
+
+        disposition = {}
+        for line in headers.split(b'\r\n'):
+            key, _, value = line.decode('iso-8859-1').partition(':')
+            if key.strip().lower() == 'content-disposition':
+                _, disposition = cgi.parse_header(value)
+
+        if 'name' not in disposition:
+            raise errors.InputValidationError("Invalid multipart body")
+
+        self.name = disposition['name'].encode('iso-8859-1')
+
+        if 'filename' in disposition:
+            self.file = self.open_file(self.args)
+            self.file.open('w')
+        else:
+            self.field = b''
+
+        self.state = 'body'
+        return True
+
+    def parse_body(self):
+        i = self.buffer.find(self.delimiter)
+        if i < 0:
+            # keep the bytes that could be the beginning of the delimiter
+            i = len(self.buffer) - len(self.delimiter) + 1
+            if i > 0:
+                self.write(self.buffer[:i])
+                self.buffer = self.buffer[i:]
+
+            return False
+
+        self.write(self.buffer[:i])
+        self.buffer = self.buffer[i + len(self.delimiter):]
+
+        if self.file is not None:
+            self.args.setdefault(self.name, []).append(self.file)
+            self.close_file()
+        else:
+            self.args.setdefault(self.name, []).append(self.field)
+            self.field = None
+
+        self.state = 'boundary'
+        return True
+
+    def write(self, data):
+        if self.file is None:
+            if len(self.field) + len(data) > self.max_field_size:
+                raise errors.InputValidationError("Invalid multipart body")
+
+            self.field += data
+            return
+
+        self.size += len(data)
+        if self.size > self.max_size:
+            monitor.rejected += 1
+            raise errors.FileTooBig(self.max_size // (1024 * 1024))
+
+        self.file.write(data)
+        monitor.bytes += len(data)
+
+
+class TempUploadDict(object):
+    """
+    Dictionary of the files being uploaded
+
+    The files are indexed by flow identifier and by filename on disk and
+    expire after timeout seconds since their last use.
+    """
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.files = {}
+        self.filenames = {}
+        self.creation_times = {}
+        self.wheel = tempdict.TimerWheel(self.pop)
+
+    def __len__(self):
+        return len(self.files)
+
+    def __contains__(self, key):
+        return key in self.files
+
+    def set(self, key, f):
+        self.pop(key)
+
+        self.files[key] = f
+        self.filenames[os.path.basename(f.filepath)] = key
+        self.creation_times[key] = tempdict.reactor.seconds()
+        self.wheel.schedule(key, self.timeout)
+
+    def get(self, key):
+        f = self.files.get(key)
+        if f is not None:
+            self.wheel.schedule(key, self.timeout)
+
+        return f
+
+    def pop(self, key):
+        f = self.files.pop(key, None)
+        if f is None:
+            return None
+
+        del self.filenames[os.path.basename(f.filepath)]
+        del self.creation_times[key]
+        self.wheel.cancel(key)
+
+        return f
+
+    def delete(self, key):
+        self.pop(key)
+
+    def pop_by_filename(self, filename):
+        """
+        Remove and return the file with the specified filename on disk
+        """
+        key = self.filenames.get(filename)
+        if key is None:
+            return None
+
+        return self.pop(key)
+
+    def get_stats(self):
+        now = tempdict.reactor.seconds()
+
+        return {
+            'pending_files': len(self.files),
+            'pending_bytes': sum(f.size for f in self.files.values()),
+            'oldest_age': max([now - t for t in self.creation_times.values()] + [0])
+        }
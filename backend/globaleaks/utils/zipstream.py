@@ -17,6 +17,7 @@ from six import text_type
 __all__ = ["ZipStream"]
 
 ZIP64_LIMIT= (1 << 31) - 1
+ZIP_STORED = 0
 ZIP_DEFLATED = 8
 
 # Here are some struct module formats for reading headers
@@ -139,13 +140,29 @@ class ZipInfo(object):
 
 
 class ZipStream(object):
-    def __init__(self, files):
+    def __init__(self, files, compression=ZIP_DEFLATED, date_time=None, crc_cache=None):
+        """
+        :param files: the list of the files to be archived
+        :param compression: ZIP_DEFLATED or ZIP_STORED; the size of the
+                            archives of STORED files is known in advance
+        :param date_time: the time of the files; the archives generated
+                          with the same time are identical
+        :param crc_cache: an optional dictionary of the CRCs of the files by
+                          path that allows to skip the files preceding the
+                          offset of the archive requested
+        """
         self.files = files
+        self.compression = compression
+        self.crc_cache = crc_cache
 
         self.filelist = []  # List of ZipInfo instances for archive
         self.data_ptr = 0   # Keep track of location inside archive
+        self.offset = 0
 
-        self.time = time.gmtime()[0:6]  # Security: Forced Time
+        if date_time is None:
+            date_time = time.gmtime()[0:6]  # Security: Forced Time
+
+        self.time = date_time
 
     def update_data_ptr(self, data):
         """
@@ -160,10 +177,13 @@ class ZipStream(object):
         return data
 
     def zipinfo_open(self, arcname):
-        zinfo = ZipInfo(arcname, self.time, ZIP_DEFLATED)
+        zinfo = ZipInfo(arcname, self.time, self.compression)
         zinfo.header_offset = self.data_ptr
 
-        cmpr = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        if self.compression == ZIP_DEFLATED:
+            cmpr = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        else:
+            cmpr = None
 
         header = zinfo.FileHeader()
 
@@ -177,7 +197,9 @@ class ZipStream(object):
         zinfo.file_size += len(chunk)
         zinfo.CRC = binascii.crc32(chunk, zinfo.CRC) & 0xffffffff
 
-        chunk = cmpr.compress(chunk)
+        if cmpr is not None:
+            chunk = cmpr.compress(chunk)
+
         zinfo.compress_size += len(chunk)
 
         self.update_data_ptr(chunk)
@@ -185,7 +207,7 @@ class ZipStream(object):
         return chunk
 
     def zipinfo_close(self, zinfo, cmpr):
-        buf = cmpr.flush()
+        buf = cmpr.flush() if cmpr is not None else b''
         zinfo.compress_size += len(buf)
         self.update_data_ptr(buf)
 
@@ -194,23 +216,32 @@ class ZipStream(object):
 
         return buf + trailer
 
-    def zip_fo(self, fo, arcname):
+    def zip_fo(self, fo, arcname, size=None, crc=None):
         zipinfo, cmpr, header = self.zipinfo_open(arcname)
 
         yield header
 
         with fo:
-            while True:
-                buf = fo.read(8 * 1024)
-                if not buf:
-                    break
+            if cmpr is None and crc is not None and self.data_ptr + size <= self.offset:
+                # the content of the file precedes the offset requested
+                zipinfo.CRC = crc
+                zipinfo.file_size = zipinfo.compress_size = size
+                self.data_ptr += size
+            else:
+                while True:
+                    buf = fo.read(8 * 1024)
+                    if not buf:
+                        break
 
-                yield self.zipinfo_update(zipinfo, cmpr, buf)
+                    yield self.zipinfo_update(zipinfo, cmpr, buf)
+
+        if size is not None and zipinfo.file_size != size:
+            raise ValueError("The size of %s differs from the expected one" % arcname)
 
         yield self.zipinfo_close(zipinfo, cmpr)
 
-    def zip_file(self, filepath, arcname):
-        return self.zip_fo(open(filepath, "rb"), arcname)
+    def zip_file(self, filepath, arcname, size=None, crc=None):
+        return self.zip_fo(open(filepath, "rb"), arcname, size, crc)
 
     def archive_footer(self):
         """
@@ -300,14 +331,65 @@ class ZipStream(object):
 
         return b''.join(data)
 
-    def __iter__(self):
+    def size(self):
+        """
+        Return the size of the archive of STORED files of known size
+        """
+        zs = ZipStream([], self.compression, self.time)
+
+        for f in self.files:
+            zinfo, _, _ = zs.zipinfo_open(f['name'])
+            zinfo.file_size = zinfo.compress_size = f['size']
+            zs.data_ptr += f['size'] + len(zinfo.DataDescriptor())
+
+        zs.archive_footer()
+
+        return zs.data_ptr
+
+    def close(self):
+        """
+        Close the file objects of the files of the archive
+        """
         for f in self.files:
             if 'fo' in f:
-                for data in self.zip_fo(f['fo'], f['name']):
-                    yield data
+                f['fo'].close()
+
+    def generate(self):
+        for f in self.files:
+            path = f.get('path')
+            crc = self.crc_cache.get(path) if self.crc_cache is not None and path else None
 
+            if 'fo' in f:
+                entry = self.zip_fo(f['fo'], f['name'], f.get('size'), crc)
             elif 'path' in f:
-                for data in self.zip_file(f['path'], f['name']):
-                    yield data
+                entry = self.zip_file(f['path'], f['name'], f.get('size'), crc)
+            else:
+                continue
+
+            for data in entry:
+                yield data
+
+            if self.crc_cache is not None and path:
+                self.crc_cache[path] = self.filelist[-1].CRC
 
         yield self.archive_footer()
+
+    def iterate(self, offset=0):
+        """
+        Generate the archive starting from the specified offset
+        """
+        self.offset = offset
+
+        for data in self.generate():
+            # every chunk ends at the current position of the archive
+            start = self.data_ptr - len(data)
+            if self.data_ptr <= offset:
+                continue
+
+            if start < offset:
+                data = data[offset - start:]
+
+            yield data
+
+    def __iter__(self):
+        return self.iterate()